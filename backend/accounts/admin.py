@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Profile
+from .models import User, Profile, Skill, SkillAlias
 
 
 @admin.register(User)
@@ -36,3 +36,16 @@ class ProfileAdmin(admin.ModelAdmin):
         ('Availability', {'fields': ('availability', 'time_slots')}),
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
+
+
+class SkillAliasInline(admin.TabularInline):
+    model = SkillAlias
+    extra = 1
+
+
+@admin.register(Skill)
+class SkillAdmin(admin.ModelAdmin):
+    list_display = ['display_name', 'name', 'created_at']
+    search_fields = ['name', 'display_name', 'aliases__alias']
+    readonly_fields = ['created_at']
+    inlines = [SkillAliasInline]
@@ -0,0 +1,195 @@
+"""
+Token authentication with a cache in front of the authtoken lookup.
+
+DRF's TokenAuthentication runs a Token + User query on every request.
+CachedTokenAuthentication caches recently used tokens for a short TTL:
+in Redis when TOKEN_AUTH_CACHE['REDIS_URL'] is set, so every worker
+shares hits and invalidations, and in a bounded in-process LRU
+otherwise. There is no local tier in front of Redis, so a token deleted
+on one worker is never served by another. Entries are dropped when a
+user is saved or a token is deleted (see accounts/signals.py), which
+covers password changes, logout and account deletion. WebSocket
+handshakes use the same cache through authenticate_token() (see
+chat/middleware.py).
+
+Entries are JSON (the user's fields, serialized with django.core.serializers)
+keyed and checked by a SHA-256 digest of the token, so neither raw keys
+nor pickles are stored.
+"""
+import datetime
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+logger = logging.getLogger(__name__)
+
+
+def token_digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class CredentialsEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder, but keeping datetimes to the microsecond"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_credentials(key, user, token):
+    return json.dumps({
+        'token': token_digest(key),
+        'created': token.created,
+        # Concrete fields only: serializing groups/permissions would query them
+        'user': serializers.serialize('python', [user], fields=[f.name for f in user._meta.concrete_fields])[0],
+    }, cls=CredentialsEncoder)
+
+
+def decode_credentials(key, payload):
+    """(user, token) from encode_credentials() output, or None if it does not belong to key"""
+    from rest_framework.authtoken.models import Token
+    try:
+        data = json.loads(payload)
+        if not hmac.compare_digest(data['token'], token_digest(key)):
+            return None
+        user = next(serializers.deserialize('python', [data['user']])).object
+        # Behave like an instance loaded from the database (save() updates it)
+        user._state.adding = False
+        user._state.db = 'default'
+    except (ValueError, KeyError, TypeError, StopIteration, DeserializationError):
+        logger.warning('Discarding unreadable token cache entry', exc_info=True)
+        return None
+    token = Token(key=key, user=user)
+    token.created = Token._meta.get_field('created').to_python(data['created'])
+    return user, token
+
+
+class TokenCache:
+    """Token key -> cached (user, token), in Redis when configured and a local LRU otherwise"""
+
+    redis_prefix = 'auth:token:'
+
+    def __init__(self, max_size=10000, ttl=60, redis_url=''):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(redis_url)
+            except ImportError:
+                logger.warning('redis is not installed; token cache is process-local only')
+
+    @classmethod
+    def from_settings(cls):
+        options = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+        return cls(
+            max_size=options.get('MAX_SIZE', 10000),
+            ttl=options.get('TTL', 60),
+            redis_url=options.get('REDIS_URL', ''),
+        )
+
+    def get(self, key):
+        if self._redis is not None:
+            payload = self._redis_call('get', self._redis_key(key))
+        else:
+            payload = self._get_local(key)
+        # Decode a fresh copy so requests never share a User instance
+        return decode_credentials(key, payload) if payload is not None else None
+
+    def set(self, key, value):
+        payload = encode_credentials(key, *value)
+        if self._redis is not None:
+            self._redis_call('set', self._redis_key(key), payload, ex=self.ttl)
+        else:
+            self._store_local(key, payload)
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        if self._redis is not None:
+            self._redis_call('delete', *[self._redis_key(key) for key in keys])
+        else:
+            with self._lock:
+                for key in keys:
+                    self._entries.pop(token_digest(key), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _redis_key(self, key):
+        return self.redis_prefix + token_digest(key)
+
+    def _get_local(self, key):
+        digest = token_digest(key)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(digest)
+                return payload
+            del self._entries[digest]
+            return None
+
+    def _store_local(self, key, payload):
+        digest = token_digest(key)
+        with self._lock:
+            self._entries[digest] = (time.monotonic() + self.ttl, payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _redis_call(self, method, *args, **kwargs):
+        try:
+            return getattr(self._redis, method)(*args, **kwargs)
+        except Exception:
+            # Redis is only an optimization; fall back to the database
+            logger.warning('Token cache Redis %s failed', method, exc_info=True)
+            return None
+
+
+token_cache = TokenCache.from_settings()
+
+
+def invalidate_user_tokens(user):
+    """Drop all cached credentials of a user"""
+    from rest_framework.authtoken.models import Token
+    keys = list(Token.objects.filter(user_id=user.pk).values_list('key', flat=True))
+    token_cache.delete(*keys)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, (user, token))
+        return (user, token)
+
+
+def authenticate_token(key):
+    """Return the active user owning a token key (through the cache), or None"""
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    return user
@@ -0,0 +1,60 @@
+"""
+Compact day × time-slot availability bitmasks.
+
+Profiles and posts store availability as JSON lists of day names and
+slot names. Their cross product is packed into a 21-bit integer
+(bit = day * 3 + slot) kept in `availability_mask`, so overlap between
+two users is a single bitwise AND the database can evaluate. Days
+without any selected slot count as available all day.
+"""
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+SLOTS = ['morning', 'afternoon', 'evening']
+
+ALL_SLOTS = (1 << len(SLOTS)) - 1
+
+
+def _day_index(day):
+    if not isinstance(day, str):
+        return None
+    # Accept both "monday" and abbreviations such as "Mon"
+    prefix = day.strip().lower()[:3]
+    for i, name in enumerate(DAYS):
+        if prefix and name.startswith(prefix):
+            return i
+    return None
+
+
+def _slot_index(slot):
+    if not isinstance(slot, str):
+        return None
+    slot = slot.strip().lower()
+    return SLOTS.index(slot) if slot in SLOTS else None
+
+
+def availability_mask(days, slots):
+    """Pack lists of day and slot names into a day × slot bitmask"""
+    slot_bits = 0
+    for slot in slots or []:
+        index = _slot_index(slot)
+        if index is not None:
+            slot_bits |= 1 << index
+    if not slot_bits:
+        slot_bits = ALL_SLOTS
+
+    mask = 0
+    for day in days or []:
+        index = _day_index(day)
+        if index is not None:
+            mask |= slot_bits << (index * len(SLOTS))
+    return mask
+
+
+def decode_mask(mask):
+    """Unpack a bitmask into [{'day': ..., 'slot': ...}] in calendar order"""
+    return [
+        {'day': day, 'slot': slot}
+        for d, day in enumerate(DAYS)
+        for s, slot in enumerate(SLOTS)
+        if mask & (1 << (d * len(SLOTS) + s))
+    ]
@@ -0,0 +1,56 @@
+from django.db.models import F
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from .availability import availability_mask, decode_mask
+from .models import Profile
+from .pagination import KeysetPagination
+from .serializers import UserDetailSerializer
+
+
+class AvailabilityOverlapView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Users whose profile availability overlaps a user's (?user_id=, default
+        the requesting user) or an explicit ?days=monday,friday&slots=evening.
+        """
+        params = request.query_params
+        exclude_user_ids = {request.user.pk}
+
+        if 'days' in params:
+            mask = availability_mask(params['days'].split(','), params.get('slots', '').split(','))
+        else:
+            user_id = params.get('user_id', request.user.pk)
+            try:
+                mask = Profile.objects.values_list('availability_mask', flat=True).get(user_id=user_id)
+            except (Profile.DoesNotExist, ValueError):
+                return Response(
+                    {'error': 'Profile not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            exclude_user_ids.add(int(user_id))
+
+        # Bitwise AND runs in the database as one scan; no index can serve it
+        profiles = Profile.objects.select_related('user').filter(availability_mask__gt=0).annotate(
+            overlap_mask=F('availability_mask').bitand(mask)
+        ).filter(overlap_mask__gt=0).exclude(user_id__in=exclude_user_ids).order_by('-created_at', '-id')
+
+        paginator = None
+        if KeysetPagination.is_requested(request):
+            paginator = KeysetPagination()
+            profiles = paginator.paginate_queryset(profiles, request, view=self)
+
+        results = [
+            {
+                'user': UserDetailSerializer(profile.user, context={'request': request}).data,
+                'overlap': decode_mask(profile.overlap_mask),
+            }
+            for profile in profiles
+        ]
+
+        if paginator:
+            return paginator.get_paginated_response(results)
+        return Response(results, status=status.HTTP_200_OK)
@@ -0,0 +1,200 @@
+"""
+Vectorized match scoring for every user at once.
+
+find_matches() scores one user at a time, which is right for request
+handling but far too slow for a nightly full recompute or platform-wide
+analytics. Here all posts are encoded as sparse post × skill matrices
+and every user as the union of their posts' skills, so the scores of
+all (user, post) pairs come out of a handful of sparse matrix products:
+
+  can_teach_them    = my_skills          @ post_wanted.T
+  they_can_teach_me = my_wanted          @ post_skills.T
+  partial_i_teach   = my_related_skills  @ post_wanted.T
+  partial_they_teach = my_related_wanted @ post_skills.T
+
+where "related" expands a skill set with every skill whose canonical
+name contains or is contained in one of them, minus the set itself.
+Points, the mutual bonus and the availability bonus are the same as in
+accounts/matching.py, and each candidate is represented by their newest
+matching post, so rankings agree with find_matches() apart from ties
+(broken here by the number of matched skill entries).
+
+numpy and scipy are imported lazily so web workers never load them.
+"""
+from dataclasses import dataclass
+
+from .matching import (
+    EXACT_MATCH_POINTS, PARTIAL_MATCH_POINTS, MUTUAL_EXCHANGE_BONUS, AVAILABILITY_BONUS,
+    get_skill_index,
+)
+from .skills import get_skill_dictionary
+
+
+def _import_scipy():
+    try:
+        import numpy as np
+        import scipy.sparse as sp
+    except ImportError as e:
+        raise ImportError('Batch match scoring requires numpy and scipy (see requirements.txt)') from e
+    return np, sp
+
+
+@dataclass
+class BatchMatch:
+    user_id: int
+    post_id: int
+    candidate_id: int
+    score: int
+
+
+class BatchScores:
+    """Scores of every user (rows) against every post (columns, newest first)"""
+
+    def __init__(self, user_ids, post_ids, post_user_ids, scores, matched):
+        self.user_ids = user_ids
+        self.post_ids = post_ids
+        self.post_user_ids = post_user_ids
+        # CSR matrices with identical sparsity: total points and matched skill count
+        self.scores = scores
+        self.matched = matched
+
+    def top_matches(self, row, limit=None):
+        """Ranked BatchMatches of one row, newest matching post per candidate"""
+        np, _ = _import_scipy()
+
+        start, end = self.scores.indptr[row], self.scores.indptr[row + 1]
+        columns = self.scores.indices[start:end]
+        scores = self.scores.data[start:end]
+        matched = self.matched.data[start:end]
+
+        user_id = self.user_ids[row]
+        owners = self.post_user_ids[columns]
+        own = owners == user_id
+        columns, owners, scores, matched = columns[~own], owners[~own], scores[~own], matched[~own]
+
+        # Columns are sorted newest first, so the first hit per owner is their newest post
+        _, first = np.unique(owners, return_index=True)
+        columns, owners, scores, matched = columns[first], owners[first], scores[first], matched[first]
+
+        # Best score, then most matched skills, then newest post
+        order = np.lexsort((columns, -matched, -scores))
+        if limit is not None:
+            order = order[:limit]
+        return [
+            BatchMatch(int(user_id), int(self.post_ids[columns[i]]), int(owners[i]), int(scores[i]))
+            for i in order
+        ]
+
+    def iter_top_matches(self, limit=None):
+        """Yield (user_id, ranked BatchMatches) for every user"""
+        for row, user_id in enumerate(self.user_ids):
+            yield int(user_id), self.top_matches(row, limit)
+
+    def top_pairs(self, limit=20):
+        """The highest scoring (user, candidate) pairs across the platform"""
+        np, _ = _import_scipy()
+
+        rows = np.repeat(np.arange(len(self.user_ids)), np.diff(self.scores.indptr))
+        users = self.user_ids[rows]
+        owners = self.post_user_ids[self.scores.indices]
+        scores = self.scores.data
+
+        keep = users != owners
+        users, owners, scores = users[keep], owners[keep], scores[keep]
+
+        order = np.argsort(-scores, kind='stable')
+        pairs = []
+        seen = set()
+        for i in order:
+            pair = (int(users[i]), int(owners[i]))
+            if pair in seen:
+                continue
+            seen.add(pair)
+            pairs.append((pair[0], pair[1], int(scores[i])))
+            if len(pairs) == limit:
+                break
+        return pairs
+
+
+def _binary(matrix):
+    """0/1 copy of a sparse matrix"""
+    matrix = matrix.tocsr(copy=True)
+    matrix.eliminate_zeros()
+    matrix.data[:] = 1
+    return matrix
+
+
+def compute_batch_scores(index=None, dictionary=None):
+    """Score every user against every post with sparse matrix products"""
+    np, sp = _import_scipy()
+
+    index = index or get_skill_index()
+    dictionary = dictionary or get_skill_dictionary()
+
+    posts = sorted(index.posts.values(), key=lambda p: (p.created_at, p.id), reverse=True)
+    post_ids = np.array([p.id for p in posts], dtype=np.int64)
+    post_user_ids = np.array([p.user_id for p in posts], dtype=np.int64)
+    user_ids = np.unique(post_user_ids)
+
+    skill_columns = {}
+    for post in posts:
+        for skill_id in list(post.skill_ids) + list(post.wanted_skill_ids):
+            skill_columns.setdefault(skill_id, len(skill_columns))
+    n_posts, n_users, n_skills = len(posts), len(user_ids), len(skill_columns)
+
+    def post_matrix(attribute):
+        rows, cols = [], []
+        for row, post in enumerate(posts):
+            for skill_id in set(getattr(post, attribute)):
+                rows.append(row)
+                cols.append(skill_columns[skill_id])
+        data = np.ones(len(rows), dtype=np.int32)
+        return sp.csr_matrix((data, (rows, cols)), shape=(n_posts, n_skills))
+
+    post_skills = post_matrix('skill_ids')
+    post_wanted = post_matrix('wanted_skill_ids')
+
+    # Users own posts; a user's skills are the union of their posts' skills
+    owner_rows = np.searchsorted(user_ids, post_user_ids)
+    ownership = sp.csr_matrix(
+        (np.ones(n_posts, dtype=np.int32), (owner_rows, np.arange(n_posts))), shape=(n_users, n_posts)
+    )
+    my_skills = _binary(ownership @ post_skills)
+    my_wanted = _binary(ownership @ post_wanted)
+
+    # Skill × skill partial-match relation
+    rows, cols = [], []
+    for skill_id, column in skill_columns.items():
+        for other_id in dictionary.related(skill_id):
+            if other_id in skill_columns:
+                rows.append(column)
+                cols.append(skill_columns[other_id])
+    related = sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n_skills, n_skills)
+    )
+
+    def related_only(skills):
+        expanded = _binary(skills @ related)
+        return _binary(expanded - expanded.multiply(skills))
+
+    can_teach_them = my_skills @ post_wanted.T
+    they_can_teach_me = my_wanted @ post_skills.T
+    partial_i_teach = related_only(my_skills) @ post_wanted.T
+    partial_they_teach = related_only(my_wanted) @ post_skills.T
+
+    matched = (can_teach_them + they_can_teach_me + partial_i_teach + partial_they_teach).tocsr()
+    scores = (
+        EXACT_MATCH_POINTS * (can_teach_them + they_can_teach_me)
+        + PARTIAL_MATCH_POINTS * (partial_i_teach + partial_they_teach)
+        + MUTUAL_EXCHANGE_BONUS * _binary(can_teach_them).multiply(_binary(they_can_teach_me))
+    ).tocsr()
+
+    for matrix in (matched, scores):
+        matrix.eliminate_zeros()
+        matrix.sort_indices()
+
+    # Both matrices are non-zero exactly where some skill matches, so their data lines up
+    has_availability = np.array([bool(p.availability) for p in posts], dtype=np.int32)
+    scores.data += AVAILABILITY_BONUS * has_availability[scores.indices]
+
+    return BatchScores(user_ids, post_ids, post_user_ids, scores, matched)
@@ -0,0 +1,147 @@
+"""
+Serializer-free read path for the hottest list endpoints.
+
+PostSerializer, MessageSerializer and ConversationSerializer build a
+nested UserDetailSerializer per row. For large lists that overhead
+dominates the request, so the list views can instead build the same dicts straight from
+.values() querysets. The serializers stay the reference implementation:
+the output here must be identical (see the tests), and views fall back to
+them when settings.FAST_READ_PATHS is False.
+"""
+from django.conf import settings
+from rest_framework import serializers
+
+from .media_urls import MediaURLResolver
+from .models import User, Post, PostImage, PostVideo
+
+USER_DETAIL_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'phone_number', 'profile_image')
+POST_FIELDS = (
+    'id', 'user', 'skills', 'wanted_skills', 'skill_ids', 'wanted_skill_ids', 'availability',
+    'time_slots', 'images', 'videos', 'media_status', 'created_at', 'updated_at',
+)
+POST_IMAGE_FIELDS = ('id', 'image', 'thumbnail', 'uploaded_at')
+POST_VIDEO_FIELDS = ('id', 'video', 'uploaded_at')
+
+# DRF's own formatting, so timestamps come out exactly as serializers render them
+format_datetime = serializers.DateTimeField().to_representation
+
+
+def fast_read_enabled():
+    return getattr(settings, 'FAST_READ_PATHS', True)
+
+
+_profile_image_storage = User._meta.get_field('profile_image').storage
+_image_storage = PostImage._meta.get_field('image').storage
+_thumbnail_storage = PostImage._meta.get_field('thumbnail').storage
+_video_storage = PostVideo._meta.get_field('video').storage
+
+
+def user_values_fields(prefix=''):
+    """values() lookups for a UserDetailSerializer payload, e.g. prefix='sender__'"""
+    return [prefix + field for field in USER_DETAIL_FIELDS]
+
+
+def user_detail(row, urls, prefix=''):
+    """UserDetailSerializer output from a values() row (or any mapping) holding user_values_fields(prefix)"""
+    return {
+        'id': row[prefix + 'id'],
+        'username': row[prefix + 'username'],
+        'email': row[prefix + 'email'],
+        'first_name': row[prefix + 'first_name'],
+        'last_name': row[prefix + 'last_name'],
+        'phone_number': row[prefix + 'phone_number'],
+        'profile_image': urls.url(_profile_image_storage, row[prefix + 'profile_image']),
+    }
+
+
+def user_detail_from_instance(user, urls):
+    return user_detail({
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'phone_number': user.phone_number,
+        'profile_image': user.profile_image.name,
+    }, urls)
+
+
+def _project(data, projection):
+    """Apply a parse_field_projection() tree the way FieldProjectionMixin does"""
+    if not projection:
+        return data
+    projected = {}
+    for name, value in data.items():
+        if name not in projection:
+            continue
+        nested = projection[name]
+        if nested and isinstance(value, dict):
+            value = _project(value, nested)
+        elif nested and isinstance(value, list):
+            value = [_project(item, nested) if isinstance(item, dict) else item for item in value]
+        projected[name] = value
+    return projected
+
+
+def _media_by_post(model, post_ids, fields, build):
+    media = {post_id: [] for post_id in post_ids}
+    rows = model.objects.filter(post_id__in=post_ids).order_by('id').values('post_id', *fields)
+    for row in rows:
+        media[row['post_id']].append(build(row))
+    return media
+
+
+def post_values_queryset(queryset, projection=None):
+    """values() over a Post queryset with everything post_rows() needs"""
+    fields = [field for field in POST_FIELDS if field not in ('user', 'images', 'videos')]
+    if not projection or 'user' in projection:
+        fields += user_values_fields('user__')
+    return queryset.values(*fields)
+
+
+def post_rows(rows, request, projection=None):
+    """PostSerializer(many=True, fields=projection) output for post_values_queryset() rows"""
+    urls = MediaURLResolver.for_request(request)
+    rows = list(rows)
+    post_ids = [row['id'] for row in rows]
+
+    images = {}
+    if post_ids and (not projection or 'images' in projection):
+        images = _media_by_post(PostImage, post_ids, POST_IMAGE_FIELDS, lambda row: {
+            'id': row['id'],
+            'image': urls.url(_image_storage, row['image']),
+            'thumbnail': urls.url(_thumbnail_storage, row['thumbnail']),
+            'uploaded_at': format_datetime(row['uploaded_at']),
+        })
+    videos = {}
+    if post_ids and (not projection or 'videos' in projection):
+        videos = _media_by_post(PostVideo, post_ids, POST_VIDEO_FIELDS, lambda row: {
+            'id': row['id'],
+            'video': urls.url(_video_storage, row['video']),
+            'uploaded_at': format_datetime(row['uploaded_at']),
+        })
+
+    posts = []
+    for row in rows:
+        post = {
+            'id': row['id'],
+            'user': user_detail(row, urls, 'user__') if 'user__id' in row else None,
+            'skills': row['skills'],
+            'wanted_skills': row['wanted_skills'],
+            'skill_ids': row['skill_ids'],
+            'wanted_skill_ids': row['wanted_skill_ids'],
+            'availability': row['availability'],
+            'time_slots': row['time_slots'],
+            'images': images.get(row['id'], []),
+            'videos': videos.get(row['id'], []),
+            'media_status': row['media_status'],
+            'created_at': format_datetime(row['created_at']),
+            'updated_at': format_datetime(row['updated_at']),
+        }
+        posts.append(_project(post, projection))
+    return posts
+
+
+def all_posts(request, projection=None):
+    """PostSerializer output for every post, in Post's default ordering"""
+    return post_rows(post_values_queryset(Post.objects.all(), projection), request, projection)
@@ -0,0 +1,97 @@
+import timeit
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from config import fast_json
+
+
+def _post(i):
+    """A post shaped like PostSerializer output"""
+    timestamp = f'2024-01-{i % 28 + 1:02d}T12:00:00.123456Z'
+    return {
+        'id': i,
+        'user': {
+            'id': i % 97,
+            'username': f'user{i % 97}',
+            'email': f'user{i % 97}@example.com',
+            'first_name': 'Ada',
+            'last_name': 'Lovelace',
+            'phone_number': None,
+            'profile_image': f'https://cdn.example.com/media/profiles/{i % 97}.jpg',
+        },
+        'skills': ['Python', 'Django', 'Guitar', 'Spanish'],
+        'wanted_skills': ['Piano', 'Rust', 'Photography'],
+        'skill_ids': [1, 2, 3, 4],
+        'wanted_skill_ids': [5, 6, 7],
+        'availability': ['monday', 'wednesday', 'saturday'],
+        'time_slots': ['evening'],
+        'images': [
+            {
+                'id': i * 3 + n,
+                'image': f'https://cdn.example.com/media/posts/{i}_{n}.jpg',
+                'thumbnail': f'https://cdn.example.com/media/posts/thumbs/{i}_{n}.jpg',
+                'uploaded_at': timestamp,
+            }
+            for n in range(3)
+        ],
+        'videos': [],
+        'media_status': 'ready',
+        'created_at': timestamp,
+        'updated_at': timestamp,
+    }
+
+
+ICE_FRAME = {
+    'channel': 'call',
+    'type': 'ice-candidate',
+    'candidate': {
+        'candidate': 'candidate:842163049 1 udp 1677729535 203.0.113.7 54321 typ srflx raddr 0.0.0.0 rport 0 generation 0',
+        'sdpMid': '0',
+        'sdpMLineIndex': 0,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare stdlib and orjson encoding of REST responses and WebSocket frames'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=500, help='Posts in the AllPostsView-sized payload')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing runs; the best one is reported')
+
+    def _best(self, func, number, repeat):
+        return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+    def handle(self, *args, **options):
+        if fast_json.orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; both columns use the stdlib'))
+
+        repeat = options['repeat']
+        posts = [_post(i) for i in range(options['posts'])]
+        posts_body = fast_json.dumps_bytes(posts)
+        frame_text = fast_json.dumps(ICE_FRAME)
+
+        with override_settings(FAST_JSON=False):
+            stdlib_renderer = JSONRenderer()
+            stdlib = {
+                'render posts': self._best(lambda: stdlib_renderer.render(posts), 20, repeat),
+                'parse posts': self._best(lambda: fast_json.loads(posts_body), 20, repeat),
+                'encode ICE frame': self._best(lambda: fast_json.dumps(ICE_FRAME), 20000, repeat),
+                'decode ICE frame': self._best(lambda: fast_json.loads(frame_text), 20000, repeat),
+            }
+
+        fast_renderer = fast_json.FastJSONRenderer()
+        fast = {
+            'render posts': self._best(lambda: fast_renderer.render(posts), 20, repeat),
+            'parse posts': self._best(lambda: fast_json.loads(posts_body), 20, repeat),
+            'encode ICE frame': self._best(lambda: fast_json.dumps(ICE_FRAME), 20000, repeat),
+            'decode ICE frame': self._best(lambda: fast_json.loads(frame_text), 20000, repeat),
+        }
+
+        self.stdout.write(f'{len(posts)} posts = {len(posts_body) / 1024:.0f} KiB, ICE frame = {len(frame_text)} bytes')
+        self.stdout.write(f'{"":<18}{"stdlib":>12}{"fast":>12}{"speedup":>10}')
+        for name, stdlib_time in stdlib.items():
+            fast_time = fast[name]
+            self.stdout.write(
+                f'{name:<18}{stdlib_time * 1e6:>10.1f}us{fast_time * 1e6:>10.1f}us{stdlib_time / fast_time:>9.1f}x'
+            )
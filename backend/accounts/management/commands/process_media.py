@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from accounts.media_queue import process_pending, requeue_stale_uploads, POLL_INTERVAL
+
+
+class Command(BaseCommand):
+    help = 'Process queued post image/video uploads (use with MEDIA_PROCESSING=external)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--interval', type=int, default=POLL_INTERVAL, help='Seconds between queue polls')
+
+    def handle(self, *args, **options):
+        while True:
+            requeue_stale_uploads()
+            processed = process_pending()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f'Processed {processed} upload(s)'))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
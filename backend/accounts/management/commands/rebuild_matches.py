@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from accounts.models import User
+from accounts.match_store import refresh_user_matches, rebuild_all_matches
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored match lists of all users (or only --user-id)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, action='append', help='Only rebuild this user (repeatable)')
+        parser.add_argument('--batch', action='store_true', help='Score all users at once with numpy/scipy')
+
+    def handle(self, *args, **options):
+        if options['batch'] and not options['user_id']:
+            def progress(count):
+                if count % 500 == 0:
+                    self.stdout.write(f'Rebuilt {count} users...')
+
+            users, total = rebuild_all_matches(progress)
+            self.stdout.write(self.style.SUCCESS(f'Stored {total} matches for {users} users'))
+            return
+
+        if options['user_id']:
+            user_ids = options['user_id']
+        else:
+            # Users with posts, plus users holding stale lists
+            user_ids = User.objects.filter(
+                Q(posts__isnull=False) | Q(match_candidates__isnull=False)
+            ).distinct().values_list('id', flat=True).order_by('id')
+
+        total = 0
+        for count, user_id in enumerate(user_ids, start=1):
+            total += refresh_user_matches(user_id)
+            if count % 500 == 0:
+                self.stdout.write(f'Rebuilt {count} users...')
+
+        self.stdout.write(self.style.SUCCESS(f'Stored {total} matches'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from accounts.batch_matching import compute_batch_scores
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'List the highest scoring user pairs across the platform (needs numpy/scipy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Number of pairs to list')
+
+    def handle(self, *args, **options):
+        pairs = compute_batch_scores().top_pairs(options['limit'])
+
+        user_ids = {user_id for pair in pairs for user_id in pair[:2]}
+        emails = dict(User.objects.filter(id__in=user_ids).values_list('id', 'email'))
+        for user_id, candidate_id, score in pairs:
+            self.stdout.write(f'{score:>4}  {emails.get(user_id)} -> {emails.get(candidate_id)}')
@@ -0,0 +1,231 @@
+"""
+Persisted per-user match lists.
+
+Each user's top MATCH_LIST_SIZE matches are stored as MatchCandidate rows
+so the matches page and the Sidebar badge become indexed reads. When a
+post changes, only the users whose lists can change are recomputed: the owner, users whose skills relate to the post (found via
+the skill index) and users who currently list the owner.
+
+Each user's MatchListState row is locked while their list is replaced, so
+a refresh requested by the matches page and one from the background
+thread run one after the other instead of racing on the unique
+(user, candidate) constraint. Its computed_at marks lists that have been
+computed, including empty ones.
+
+Refreshes run according to settings.MATCH_REFRESH:
+  'thread' on an in-process background thread after commit (default)
+  'sync'   right after the transaction commits
+"""
+import logging
+import queue
+import threading
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .matching import find_matches, get_skill_index, score_post
+from .models import MatchCandidate, MatchListState, Post
+from .skills import get_skill_dictionary
+
+logger = logging.getLogger(__name__)
+
+
+def get_match_list_size():
+    return getattr(settings, 'MATCH_LIST_SIZE', 100)
+
+
+def refresh_user_matches(user_id):
+    """Recompute and store the match list of one user"""
+    with transaction.atomic():
+        # Score under the lock too, so a refresh never overwrites a newer one
+        lock_match_list(user_id)
+        return store_user_matches(user_id, find_matches(user_id, limit=get_match_list_size()))
+
+
+def lock_match_list(user_id):
+    """Lock a user's MatchListState row (creating it) until the transaction ends"""
+    MatchListState.objects.get_or_create(user_id=user_id)
+    return MatchListState.objects.select_for_update().get(user_id=user_id)
+
+
+def match_list_computed(user_id):
+    return MatchListState.objects.filter(user_id=user_id, computed_at__isnull=False).exists()
+
+
+def store_user_matches(user_id, results):
+    """Replace the stored match list of one user with ranked MatchResults"""
+    with transaction.atomic():
+        state = lock_match_list(user_id)
+        MatchCandidate.objects.filter(user_id=user_id).delete()
+        MatchCandidate.objects.bulk_create([
+            MatchCandidate(
+                user_id=user_id,
+                candidate_id=result.user_id,
+                post_id=result.post_id,
+                rank=rank,
+                score=result.score,
+                matched_skills=result.matched_skills,
+                can_teach=result.can_teach,
+            )
+            for rank, result in enumerate(results, start=1)
+        ])
+        state.computed_at = timezone.now()
+        state.save(update_fields=['computed_at'])
+    return len(results)
+
+
+def rebuild_all_matches(progress=None):
+    """
+    Recompute every user's stored list using batch scoring (needs numpy and
+    scipy). Only the stored top entries are scored individually, to fill in
+    their matched skills. Returns (users, matches) stored.
+    """
+    from .batch_matching import compute_batch_scores
+
+    index = get_skill_index()
+    dictionary = get_skill_dictionary()
+    batch = compute_batch_scores(index, dictionary)
+
+    my_skills, my_wanted_skills = {}, {}
+    for post in index.posts.values():
+        my_skills.setdefault(post.user_id, set()).update(post.skill_ids)
+        my_wanted_skills.setdefault(post.user_id, set()).update(post.wanted_skill_ids)
+
+    users = total = 0
+    for user_id, matches in batch.iter_top_matches(limit=get_match_list_size()):
+        results = [
+            score_post(index.posts[match.post_id], my_skills[user_id], my_wanted_skills[user_id], dictionary)
+            for match in matches
+        ]
+        total += store_user_matches(user_id, results)
+        users += 1
+        if progress:
+            progress(users)
+
+    # Lists of users who no longer have any posts
+    MatchCandidate.objects.filter(
+        ~Exists(Post.objects.filter(user_id=OuterRef('user_id')))
+    ).delete()
+    return users, total
+
+
+@dataclass
+class PostChange:
+    """Snapshot of a created, edited or deleted post, taken when its signal fires"""
+    user_id: int
+    skill_ids: list
+    wanted_skill_ids: list
+    listed_by: set = field(default_factory=set)
+
+    @classmethod
+    def from_post(cls, post, deleted=False):
+        change = cls(post.user_id, list(post.skill_ids), list(post.wanted_skill_ids))
+        if deleted:
+            # Collected now: the rows pointing at the post are cascaded away with it
+            change.listed_by = set(
+                MatchCandidate.objects.filter(post=post).values_list('user_id', flat=True)
+            )
+        return change
+
+
+def users_affected_by_post(change):
+    """Users whose match lists may change because of a PostChange"""
+    user_ids = {change.user_id} | change.listed_by
+
+    # Users who currently list the owner (covers skills the post no longer has)
+    user_ids.update(
+        MatchCandidate.objects.filter(candidate_id=change.user_id).values_list('user_id', flat=True)
+    )
+
+    # Users whose posts relate to the post's current skills
+    index = get_skill_index()
+    candidates = index.candidates(
+        set(change.skill_ids), set(change.wanted_skill_ids), get_skill_dictionary()
+    )
+    for post_id in candidates:
+        user_ids.add(index.posts[post_id].user_id)
+
+    return user_ids
+
+
+class MatchRefreshWorker(threading.Thread):
+    """Background thread that works out affected users and recomputes their match lists"""
+
+    def __init__(self):
+        super().__init__(name='match-refresh', daemon=True)
+        self.queue = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def add_users(self, user_ids):
+        with self.lock:
+            new_ids = set(user_ids) - self.pending
+            self.pending |= new_ids
+        for user_id in new_ids:
+            self.queue.put(user_id)
+
+    def add_post_change(self, change):
+        self.queue.put(change)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if isinstance(item, PostChange):
+                    self.add_users(users_affected_by_post(item))
+                else:
+                    with self.lock:
+                        self.pending.discard(item)
+                    refresh_user_matches(item)
+            except Exception:
+                logger.exception('Refreshing matches for %s failed', item)
+            finally:
+                close_old_connections()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _get_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = MatchRefreshWorker()
+            _worker.start()
+    return _worker
+
+
+def _is_sync():
+    return getattr(settings, 'MATCH_REFRESH', 'thread') == 'sync'
+
+
+def schedule_refresh(user_ids):
+    """Recompute the given users' match lists once the current transaction commits"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    def run():
+        if _is_sync():
+            for user_id in user_ids:
+                refresh_user_matches(user_id)
+        else:
+            _get_worker().add_users(user_ids)
+    transaction.on_commit(run)
+
+
+def schedule_post_refresh(post, deleted=False):
+    """Refresh everyone affected by a post change once the current transaction commits"""
+    change = PostChange.from_post(post, deleted=deleted)
+
+    def run():
+        if _is_sync():
+            for user_id in users_affected_by_post(change):
+                refresh_user_matches(user_id)
+        else:
+            _get_worker().add_post_change(change)
+    transaction.on_commit(run)
@@ -0,0 +1,205 @@
+"""
+Server-side skill matching engine.
+
+Posts carry canonical Skill ids (resolved at write time, see
+accounts/skills.py). An inverted index from skill id to the posts
+offering or wanting it means a match lookup only scores posts that
+share at least one skill with the current user, and comparisons are
+integer set lookups rather than string checks.
+
+Scoring mirrors the original client-side algorithm from the matches page:
+exact matches are worth 2 points, partial matches (one canonical name
+containing the other) 1 point, a mutual exchange adds 5 and having
+availability set adds 1.
+"""
+import threading
+from dataclasses import dataclass
+
+from django.db.models import Count, Max
+
+from .models import Post
+from .skills import get_skill_dictionary
+
+
+EXACT_MATCH_POINTS = 2
+PARTIAL_MATCH_POINTS = 1
+MUTUAL_EXCHANGE_BONUS = 5
+AVAILABILITY_BONUS = 1
+
+
+@dataclass
+class IndexedPost:
+    id: int
+    user_id: int
+    skill_ids: list
+    wanted_skill_ids: list
+    availability: list
+    created_at: object
+
+
+@dataclass
+class MatchResult:
+    post_id: int
+    user_id: int
+    score: int
+    matched_skills: list
+    can_teach: list
+
+
+class SkillIndex:
+    """Inverted index from skill id to the ids of posts offering/wanting it"""
+
+    def __init__(self, posts):
+        self.posts = {}
+        self.offered = {}
+        self.wanted = {}
+
+        for post in posts:
+            self.posts[post.id] = post
+            for skill_id in post.skill_ids:
+                self.offered.setdefault(skill_id, set()).add(post.id)
+            for skill_id in post.wanted_skill_ids:
+                self.wanted.setdefault(skill_id, set()).add(post.id)
+
+    @classmethod
+    def build(cls):
+        rows = Post.objects.values_list(
+            'id', 'user_id', 'skill_ids', 'wanted_skill_ids', 'availability', 'created_at'
+        )
+        return cls(IndexedPost(*row) for row in rows)
+
+    @staticmethod
+    def _related(skill_ids, dictionary):
+        """The skill ids plus every skill partially matching one of them"""
+        related = set(skill_ids)
+        for skill_id in skill_ids:
+            related |= dictionary.related(skill_id)
+        return related
+
+    def candidates(self, my_skill_ids, my_wanted_skill_ids, dictionary):
+        """Ids of posts sharing at least one exact or partial skill with the user"""
+        post_ids = set()
+        for skill_id in self._related(my_wanted_skill_ids, dictionary):
+            post_ids |= self.offered.get(skill_id, set())
+        for skill_id in self._related(my_skill_ids, dictionary):
+            post_ids |= self.wanted.get(skill_id, set())
+        return post_ids
+
+
+def score_post(post, my_skill_ids, my_wanted_skill_ids, dictionary):
+    """
+    Score a single post against the user's skill id sets.
+    Returns None if the post has no exact or partial match.
+    """
+    def partial(skill_id, mine):
+        return not dictionary.related(skill_id).isdisjoint(mine)
+
+    can_teach_them = [s for s in post.wanted_skill_ids if s in my_skill_ids]
+    they_can_teach_me = [s for s in post.skill_ids if s in my_wanted_skill_ids]
+
+    partial_they_teach = [
+        s for s in post.skill_ids
+        if s not in my_wanted_skill_ids and partial(s, my_wanted_skill_ids)
+    ]
+    partial_i_teach = [
+        s for s in post.wanted_skill_ids
+        if s not in my_skill_ids and partial(s, my_skill_ids)
+    ]
+
+    all_teach = they_can_teach_me + partial_they_teach
+    all_learn = can_teach_them + partial_i_teach
+    if not all_teach and not all_learn:
+        return None
+
+    score = (
+        EXACT_MATCH_POINTS * (len(can_teach_them) + len(they_can_teach_me))
+        + PARTIAL_MATCH_POINTS * (len(partial_they_teach) + len(partial_i_teach))
+    )
+    if can_teach_them and they_can_teach_me:
+        score += MUTUAL_EXCHANGE_BONUS
+    if post.availability:
+        score += AVAILABILITY_BONUS
+
+    return MatchResult(
+        post_id=post.id,
+        user_id=post.user_id,
+        score=score,
+        matched_skills=list(dict.fromkeys(dictionary.display_name(s) for s in all_learn + all_teach)),
+        can_teach=[dictionary.display_name(s) for s in all_teach],
+    )
+
+
+_index = None
+_index_fingerprint = None
+_index_lock = threading.Lock()
+
+
+def _fingerprint():
+    # Cheap aggregate that changes whenever a post is created, updated or deleted
+    stats = Post.objects.aggregate(count=Count('id'), latest=Max('updated_at'))
+    return (stats['count'], stats['latest'])
+
+
+def get_skill_index():
+    """Return the process-wide skill index, rebuilding it if posts have changed"""
+    global _index, _index_fingerprint
+
+    fingerprint = _fingerprint()
+    if _index is not None and _index_fingerprint == fingerprint:
+        return _index
+
+    with _index_lock:
+        if _index is None or _index_fingerprint != fingerprint:
+            _index = SkillIndex.build()
+            _index_fingerprint = fingerprint
+        return _index
+
+
+def invalidate_skill_index():
+    global _index, _index_fingerprint
+    with _index_lock:
+        _index = None
+        _index_fingerprint = None
+
+
+def find_matches(user, limit=None, index=None):
+    """
+    Return ranked MatchResults for a user (instance or id), best first.
+    Only the newest matching post of each other user is kept.
+    """
+    user_id = getattr(user, 'pk', user)
+    my_skills = set()
+    my_wanted_skills = set()
+    rows = Post.objects.filter(user_id=user_id).values_list('skill_ids', 'wanted_skill_ids')
+    for skill_ids, wanted_skill_ids in rows:
+        my_skills.update(skill_ids)
+        my_wanted_skills.update(wanted_skill_ids)
+
+    if not my_skills and not my_wanted_skills:
+        return []
+
+    index = index or get_skill_index()
+    dictionary = get_skill_dictionary()
+    candidates = [
+        index.posts[post_id]
+        for post_id in index.candidates(my_skills, my_wanted_skills, dictionary)
+        if index.posts[post_id].user_id != user_id
+    ]
+    # Newest first, so each user is represented by their latest matching post
+    candidates.sort(key=lambda p: (p.created_at, p.id), reverse=True)
+
+    results = []
+    seen_users = set()
+    for post in candidates:
+        if post.user_id in seen_users:
+            continue
+        result = score_post(post, my_skills, my_wanted_skills, dictionary)
+        if result:
+            results.append(result)
+            seen_users.add(post.user_id)
+
+    # Stable sort keeps newest-first order between equal scores
+    results.sort(key=lambda r: (r.score, len(r.matched_skills)), reverse=True)
+    if limit is not None:
+        results = results[:limit]
+    return results
@@ -0,0 +1,76 @@
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from .models import MatchCandidate
+from .serializers import PostSerializer
+from .match_store import get_match_list_size, match_list_computed, refresh_user_matches, schedule_refresh
+
+
+DEFAULT_MATCH_LIMIT = 50
+
+
+class MatchesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_MATCH_LIMIT))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, get_match_list_size()))
+
+        if not match_list_computed(request.user.pk):
+            # First visit: compute the list now
+            refresh_user_matches(request.user.pk)
+
+        candidates = MatchCandidate.objects.filter(user=request.user)
+
+        candidates = candidates.select_related('post__user').prefetch_related(
+            'post__images', 'post__videos'
+        ).order_by('rank')[:limit]
+
+        matches = []
+        for candidate in candidates:
+            post_data = PostSerializer(candidate.post, context={'request': request}).data
+            matches.append({
+                'user': post_data['user'],
+                'post': post_data,
+                'match_score': candidate.score,
+                'matched_skills': candidate.matched_skills,
+                'can_teach': candidate.can_teach,
+            })
+
+        return Response(matches, status=status.HTTP_200_OK)
+
+
+class MatchCountView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Number of stored matches, optionally only those posted after ?since=<ISO datetime>.
+        Until the user's list is first computed the count is null and `pending` is true.
+        """
+        if not match_list_computed(request.user.pk):
+            # Unlike MatchesView, don't make a badge poll wait for the computation
+            schedule_refresh([request.user.pk])
+            return Response({'count': None, 'pending': True}, status=status.HTTP_200_OK)
+
+        candidates = MatchCandidate.objects.filter(user=request.user)
+
+        since = request.query_params.get('since')
+        if since:
+            since_date = parse_datetime(since)
+            if since_date is None:
+                return Response(
+                    {'error': 'since must be an ISO 8601 datetime'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            candidates = candidates.filter(post__created_at__gt=since_date)
+
+        return Response({'count': candidates.count(), 'pending': False}, status=status.HTTP_200_OK)
@@ -0,0 +1,208 @@
+"""
+Background processing for post image and video uploads.
+
+Request handlers only stage uploaded files on local disk and queue a
+MediaUpload row, so they return without waiting on Cloudinary. A worker
+then moves each file to permanent storage, creates image thumbnails and
+marks the post ready.
+
+The worker runs according to settings.MEDIA_PROCESSING:
+  'thread'   an in-process daemon thread, woken after each upload (default)
+  'sync'     process immediately after the request's transaction commits
+  'external' leave the queue to `manage.py process_media`
+"""
+import io
+import logging
+import os
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Post, PostImage, PostVideo, MediaUpload
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 30
+STALE_AFTER = timedelta(minutes=10)
+
+
+def get_staging_storage():
+    return FileSystemStorage(location=settings.MEDIA_STAGING_ROOT)
+
+
+def enqueue_post_media(post, images, videos):
+    """Stage uploaded files and queue them for processing; marks the post as processing"""
+    if not images and not videos:
+        return
+
+    storage = get_staging_storage()
+    uploads = []
+    for kind, files in (('image', images), ('video', videos)):
+        for uploaded_file in files:
+            original_name = os.path.basename(uploaded_file.name)
+            staged_path = storage.save(f'{uuid.uuid4().hex}_{original_name}', uploaded_file)
+            uploads.append(MediaUpload(
+                post=post, kind=kind, staged_path=staged_path, original_name=original_name
+            ))
+
+    MediaUpload.objects.bulk_create(uploads)
+    Post.objects.filter(pk=post.pk).update(media_status='processing')
+    post.media_status = 'processing'
+
+    transaction.on_commit(notify_worker)
+
+
+def make_thumbnail(file_obj):
+    """Return a JPEG thumbnail as ContentFile, or None if the file is not a readable image"""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(file_obj) as image:
+            image = image.convert('RGB')
+            image.thumbnail(THUMBNAIL_SIZE)
+            buffer = io.BytesIO()
+            image.save(buffer, format='JPEG', quality=80)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+    return ContentFile(buffer.getvalue())
+
+
+def process_upload(upload):
+    """Move one staged file to permanent storage and create its PostImage/PostVideo"""
+    storage = get_staging_storage()
+
+    with storage.open(upload.staged_path, 'rb') as staged:
+        content = File(staged, name=upload.original_name)
+        if upload.kind == 'image':
+            post_image = PostImage(post_id=upload.post_id)
+            post_image.image.save(upload.original_name, content, save=False)
+
+            staged.seek(0)
+            thumbnail = make_thumbnail(staged)
+            if thumbnail:
+                stem = os.path.splitext(upload.original_name)[0]
+                post_image.thumbnail.save(f'{stem}_thumb.jpg', thumbnail, save=False)
+            post_image.save()
+        else:
+            post_video = PostVideo(post_id=upload.post_id)
+            post_video.video.save(upload.original_name, content, save=False)
+            post_video.save()
+
+    storage.delete(upload.staged_path)
+
+
+def discard_staged_file(upload):
+    """Delete the staged copy of an upload that will not be retried"""
+    try:
+        get_staging_storage().delete(upload.staged_path)
+    except OSError:
+        logger.exception('Deleting staged file %s failed', upload.staged_path)
+
+
+def claim_next_upload():
+    """Atomically claim the oldest pending upload; safe with several workers"""
+    while True:
+        upload = MediaUpload.objects.filter(status='pending').order_by('created_at', 'id').first()
+        if upload is None:
+            return None
+        claimed = MediaUpload.objects.filter(pk=upload.pk, status='pending').update(
+            status='processing', attempts=F('attempts') + 1, updated_at=timezone.now()
+        )
+        if claimed:
+            upload.refresh_from_db()
+            return upload
+
+
+def finish_post(post_id):
+    """Recompute a post's media_status from its remaining upload rows"""
+    statuses = set(MediaUpload.objects.filter(post_id=post_id).values_list('status', flat=True))
+    if statuses & {'pending', 'processing'}:
+        media_status = 'processing'
+    elif 'failed' in statuses:
+        media_status = 'failed'
+    else:
+        media_status = 'ready'
+    Post.objects.filter(pk=post_id).update(media_status=media_status)
+
+
+def process_pending(limit=None):
+    """Process queued uploads until the queue is empty (or `limit` is reached)"""
+    processed = 0
+    while limit is None or processed < limit:
+        upload = claim_next_upload()
+        if upload is None:
+            break
+
+        try:
+            process_upload(upload)
+        except Exception as e:
+            logger.exception('Processing %s failed', upload)
+            status = 'pending' if upload.attempts < MAX_ATTEMPTS else 'failed'
+            MediaUpload.objects.filter(pk=upload.pk).update(
+                status=status, error=str(e), updated_at=timezone.now()
+            )
+            if status == 'pending':
+                # Leave the retry to the next pass instead of spinning on it
+                break
+            discard_staged_file(upload)
+        else:
+            upload.delete()
+
+        finish_post(upload.post_id)
+        processed += 1
+    return processed
+
+
+def requeue_stale_uploads():
+    """Return uploads left 'processing' by a worker that died back to the queue"""
+    return MediaUpload.objects.filter(
+        status='processing', updated_at__lt=timezone.now() - STALE_AFTER
+    ).update(status='pending')
+
+
+class MediaWorker(threading.Thread):
+    """In-process worker thread that drains the upload queue whenever it is woken"""
+
+    def __init__(self):
+        super().__init__(name='media-worker', daemon=True)
+        self.wakeup = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                requeue_stale_uploads()
+                process_pending()
+            except Exception:
+                logger.exception('Media worker pass failed')
+            finally:
+                close_old_connections()
+            self.wakeup.wait(timeout=POLL_INTERVAL)
+            self.wakeup.clear()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def notify_worker():
+    global _worker
+
+    mode = getattr(settings, 'MEDIA_PROCESSING', 'thread')
+    if mode == 'sync':
+        process_pending()
+    elif mode == 'thread':
+        with _worker_lock:
+            if _worker is None or not _worker.is_alive():
+                _worker = MediaWorker()
+                _worker.start()
+        _worker.wakeup.set()
@@ -0,0 +1,112 @@
+"""
+Shared resolver for absolute media URLs.
+
+Serializers used to call request.build_absolute_uri(obj.<file>.url) for
+every object, so a user's avatar was resolved again for each message or
+post it appeared on, and with Cloudinary each .url builds a signed URL.
+Now URLs are resolved in two tiers:
+
+  * storage.url(name) results go in a process-wide LRU keyed by storage
+    and file name (MEDIA_URL_CACHE_SIZE entries), since a stored file's
+    URL does not change;
+  * absolute URLs are memoized per request, on the request itself, so
+    every serializer rendering one response shares them.
+
+For local storage the absolute prefix is worked out once per request and
+the quoted file name appended, which is what build_absolute_uri(url)
+returns for it.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+
+
+def storage_key(storage):
+    """Identifies a storage backend: its class and, for local storage, its base URL"""
+    return f'{type(storage).__module__}.{type(storage).__qualname__}:{getattr(storage, "base_url", "")}'
+
+
+class StorageURLCache:
+    """Bounded LRU of (storage key, file name) -> storage.url(name)"""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def url(self, storage, name):
+        key = (storage_key(storage), name)
+        with self._lock:
+            url = self._entries.get(key)
+            if url is not None:
+                self._entries.move_to_end(key)
+                return url
+
+        url = storage.url(name)
+        with self._lock:
+            self._entries[key] = url
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return url
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+storage_url_cache = StorageURLCache(getattr(settings, 'MEDIA_URL_CACHE_SIZE', 10000))
+
+
+def media_url(file):
+    """Relative (storage) URL of a FieldFile, or None if it is empty"""
+    if not file:
+        return None
+    return storage_url_cache.url(file.storage, file.name)
+
+
+class MediaURLResolver:
+    """Absolute media URLs for one request; get one with for_request()"""
+
+    def __init__(self, request):
+        self.request = request
+        self._memo = {}
+        self._prefixes = {}
+
+    @classmethod
+    def for_request(cls, request):
+        resolver = getattr(request, '_media_url_resolver', None)
+        if resolver is None:
+            resolver = cls(request)
+            request._media_url_resolver = resolver
+        return resolver
+
+    def url(self, storage, name):
+        """Absolute URL of a stored file name, or None if the name is empty"""
+        if not name:
+            return None
+        key = (storage_key(storage), name)
+        url = self._memo.get(key)
+        if url is None:
+            if isinstance(storage, FileSystemStorage):
+                prefix = self._prefixes.get(key[0])
+                if prefix is None:
+                    prefix = self._prefixes[key[0]] = self.request.build_absolute_uri(storage.base_url)
+                url = prefix + filepath_to_uri(name).lstrip('/')
+            else:
+                url = self.request.build_absolute_uri(storage_url_cache.url(storage, name))
+            self._memo[key] = url
+        return url
+
+    def file_url(self, file):
+        """Absolute URL of a FieldFile, or None if it is empty"""
+        if not file:
+            return None
+        return self.url(file.storage, file.name)
+
+
+def absolute_media_url(request, file):
+    return MediaURLResolver.for_request(request).file_url(file)
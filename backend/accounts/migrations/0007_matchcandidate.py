@@ -0,0 +1,37 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_post_media_processing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.IntegerField()),
+                ('matched_skills', models.JSONField(default=list)),
+                ('can_teach', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_candidates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', 'rank'],
+                'indexes': [models.Index(fields=['user', 'rank'], name='matchcandidate_user_rank_idx'), models.Index(fields=['candidate'], name='matchcandidate_candidate_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='matchcandidate',
+            constraint=models.UniqueConstraint(fields=('user', 'candidate'), name='unique_match_candidate'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_skill_ids(apps, schema_editor):
+    # Exact normalized names only; fuzzy merging applies to new writes
+    Skill = apps.get_model('accounts', 'Skill')
+    SkillAlias = apps.get_model('accounts', 'SkillAlias')
+    skill_ids = {}
+
+    def resolve(skills):
+        ids = []
+        for skill in skills or []:
+            if not isinstance(skill, str):
+                continue
+            name = ' '.join(skill.lower().split())[:100]
+            if not name:
+                continue
+            if name not in skill_ids:
+                created = Skill.objects.create(name=name, display_name=skill.strip()[:100])
+                SkillAlias.objects.create(alias=name, skill=created)
+                skill_ids[name] = created.id
+            if skill_ids[name] not in ids:
+                ids.append(skill_ids[name])
+        return ids
+
+    for model_name in ('Post', 'Profile'):
+        model = apps.get_model('accounts', model_name)
+        for obj in model.objects.only('id', 'skills', 'wanted_skills').iterator():
+            obj.skill_ids = resolve(obj.skills)
+            obj.wanted_skill_ids = resolve(obj.wanted_skills)
+            obj.save(update_fields=['skill_ids', 'wanted_skill_ids'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_matchcandidate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Normalized name', max_length=100, unique=True)),
+                ('display_name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='skill_ids',
+            field=models.JSONField(default=list, help_text='Canonical Skill ids of skills'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='wanted_skill_ids',
+            field=models.JSONField(default=list, help_text='Canonical Skill ids of wanted_skills'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='skill_ids',
+            field=models.JSONField(default=list, help_text='Canonical Skill ids of skills'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='wanted_skill_ids',
+            field=models.JSONField(default=list, help_text='Canonical Skill ids of wanted_skills'),
+        ),
+        migrations.CreateModel(
+            name='SkillAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100, unique=True)),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='accounts.skill')),
+            ],
+            options={
+                'verbose_name_plural': 'skill aliases',
+            },
+        ),
+        migrations.RunPython(backfill_skill_ids, migrations.RunPython.noop),
+    ]
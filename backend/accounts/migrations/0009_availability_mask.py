@@ -0,0 +1,54 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:40
+
+from django.db import migrations, models
+
+# Frozen copy of accounts.availability.availability_mask as of this migration
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+SLOTS = ['morning', 'afternoon', 'evening']
+
+
+def availability_mask(days, slots):
+    slot_bits = 0
+    for slot in slots or []:
+        if isinstance(slot, str) and slot.strip().lower() in SLOTS:
+            slot_bits |= 1 << SLOTS.index(slot.strip().lower())
+    if not slot_bits:
+        slot_bits = (1 << len(SLOTS)) - 1
+
+    mask = 0
+    for day in days or []:
+        prefix = day.strip().lower()[:3] if isinstance(day, str) else ''
+        for index, name in enumerate(DAYS):
+            if prefix and name.startswith(prefix):
+                mask |= slot_bits << (index * len(SLOTS))
+                break
+    return mask
+
+
+def backfill_availability_masks(apps, schema_editor):
+    for model_name in ('Post', 'Profile'):
+        model = apps.get_model('accounts', model_name)
+        for obj in model.objects.only('id', 'availability', 'time_slots').iterator():
+            obj.availability_mask = availability_mask(obj.availability, obj.time_slots)
+            obj.save(update_fields=['availability_mask'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_skill'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='availability_mask',
+            field=models.PositiveIntegerField(db_index=True, default=0, help_text='Day × slot bitmask (accounts/availability.py)'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='availability_mask',
+            field=models.PositiveIntegerField(db_index=True, default=0, help_text='Day × slot bitmask (accounts/availability.py)'),
+        ),
+        migrations.RunPython(backfill_availability_masks, migrations.RunPython.noop),
+    ]
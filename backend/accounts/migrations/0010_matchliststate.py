@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_availability_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchListState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.2 on 2026-10-17 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_matchliststate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='availability_mask',
+            field=models.PositiveIntegerField(default=0, help_text='Day × slot bitmask (accounts/availability.py)'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='availability_mask',
+            field=models.PositiveIntegerField(default=0, help_text='Day × slot bitmask (accounts/availability.py)'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from config.cloudinary_storage import get_video_storage, get_raw_storage
+from .availability import availability_mask
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
@@ -17,12 +18,71 @@ class User(AbstractUser):
         return self.email
 
 
-class Profile(models.Model):
+class Skill(models.Model):
+    """Canonical skill that free-form skill strings resolve to (see accounts/skills.py)"""
+    name = models.CharField(max_length=100, unique=True, help_text="Normalized name")
+    display_name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.display_name
+
+
+class SkillAlias(models.Model):
+    """Normalized spelling that resolves to a Skill; every skill has its own name as an alias"""
+    alias = models.CharField(max_length=100, unique=True)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='aliases')
+
+    class Meta:
+        verbose_name_plural = 'skill aliases'
+
+    def __str__(self):
+        return f"{self.alias} -> {self.skill.name}"
+
+
+class AvailabilityMaskMixin:
+    """Keeps `availability_mask` in sync with the availability/time_slots lists on save"""
+
+    def save(self, *args, **kwargs):
+        self.availability_mask = availability_mask(self.availability, self.time_slots)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'availability', 'time_slots'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'availability_mask'}
+        super().save(*args, **kwargs)
+
+
+class SkillIdsMixin:
+    """
+    Keeps `skill_ids`/`wanted_skill_ids` in sync with the free-form
+    skills/wanted_skills lists on save, so matching can compare ids
+    """
+
+    def save(self, *args, **kwargs):
+        # skills.py reads the Skill tables, so it is imported late
+        from .skills import resolve_skills
+
+        update_fields = kwargs.get('update_fields')
+        for field, ids_field in (('skills', 'skill_ids'), ('wanted_skills', 'wanted_skill_ids')):
+            if update_fields is None:
+                setattr(self, ids_field, resolve_skills(getattr(self, field)))
+            elif field in update_fields:
+                setattr(self, ids_field, resolve_skills(getattr(self, field)))
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {ids_field}
+        super().save(*args, **kwargs)
+
+
+class Profile(SkillIdsMixin, AvailabilityMaskMixin, models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profile')
     skills = models.JSONField(default=list, help_text="List of skills the user has")
     wanted_skills = models.JSONField(default=list, help_text="List of skills the user wants to learn")
+    skill_ids = models.JSONField(default=list, help_text="Canonical Skill ids of skills")
+    wanted_skill_ids = models.JSONField(default=list, help_text="Canonical Skill ids of wanted_skills")
     availability = models.JSONField(default=list, help_text="Days of week available")
     time_slots = models.JSONField(default=list, help_text="Time slots available (morning, afternoon, evening)")
+    availability_mask = models.PositiveIntegerField(default=0, help_text="Day × slot bitmask (accounts/availability.py)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -30,15 +90,33 @@ class Profile(models.Model):
         return f"{self.user.email}'s Profile"
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def with_related(self):
+        """Load the author, images and videos up front so serializing N posts costs a fixed number of queries"""
+        return self.select_related('user').prefetch_related('images', 'videos')
+
+
+class Post(SkillIdsMixin, AvailabilityMaskMixin, models.Model):
+    MEDIA_STATUS_CHOICES = [
+        ('ready', 'Ready'),
+        ('processing', 'Processing'),
+        ('failed', 'Failed'),
+    ]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts')
     skills = models.JSONField(default=list, help_text="List of skills the user has")
     wanted_skills = models.JSONField(default=list, help_text="List of skills the user wants to learn")
+    skill_ids = models.JSONField(default=list, help_text="Canonical Skill ids of skills")
+    wanted_skill_ids = models.JSONField(default=list, help_text="Canonical Skill ids of wanted_skills")
     availability = models.JSONField(default=list, help_text="Days of week available")
     time_slots = models.JSONField(default=list, help_text="Time slots available (morning, afternoon, evening)")
+    availability_mask = models.PositiveIntegerField(default=0, help_text="Day × slot bitmask (accounts/availability.py)")
+    media_status = models.CharField(max_length=10, choices=MEDIA_STATUS_CHOICES, default='ready')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
 
@@ -49,6 +127,7 @@ class Post(models.Model):
 class PostImage(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='post_images/')
+    thumbnail = models.ImageField(upload_to='post_thumbnails/', blank=True, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -64,6 +143,83 @@ class PostVideo(models.Model):
         return f"Video for {self.post.id}"
 
 
+class MediaUpload(models.Model):
+    """
+    Database-backed queue of uploaded post files waiting to be moved to
+    permanent storage by the media worker (see accounts/media_queue.py).
+    """
+    KIND_CHOICES = [
+        ('image', 'Image'),
+        ('video', 'Video'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='media_uploads')
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    staged_path = models.CharField(max_length=255)
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='mediaupload_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} upload for post {self.post_id} ({self.status})"
+
+
+class MatchCandidate(models.Model):
+    """
+    Precomputed top-N match list entry: `candidate` (through their `post`)
+    ranked for `user`. Maintained by accounts/match_store.py.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='match_candidates')
+    candidate = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveIntegerField()
+    score = models.IntegerField()
+    matched_skills = models.JSONField(default=list)
+    can_teach = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['user', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'candidate'], name='unique_match_candidate'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'rank'], name='matchcandidate_user_rank_idx'),
+            models.Index(fields=['candidate'], name='matchcandidate_candidate_idx'),
+        ]
+
+    def __str__(self):
+        return f"Match #{self.rank} for {self.user_id}: {self.candidate_id} ({self.score})"
+
+
+class MatchListState(models.Model):
+    """
+    One row per user whose match list has been computed. Refreshes lock it
+    so they run one at a time per user, and computed_at tells an empty
+    list apart from one that was never computed.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    computed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Match list of {self.user_id} computed at {self.computed_at}"
+
+
 class Ringtone(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='ringtones')
     name = models.CharField(max_length=100)
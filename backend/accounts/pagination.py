@@ -0,0 +1,96 @@
+"""
+Keyset (cursor) pagination on (created_at, id).
+
+Unlike offset pagination the cost of fetching a page does not grow with
+how deep the client has scrolled, and rows inserted while paging do not
+shift later pages.
+"""
+import base64
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """Newest-first pagination keyed on (created_at, id)"""
+
+    # (timestamp field, unique tie-breaker field); subclasses may use annotations
+    ordering_fields = ('created_at', 'id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'KEYSET_PAGE_SIZE', 50)
+        self.max_page_size = getattr(settings, 'KEYSET_MAX_PAGE_SIZE', 200)
+        self.next_cursor = None
+
+    @classmethod
+    def is_requested(cls, request):
+        """Pagination is opt-in so existing clients keep receiving a plain list"""
+        params = request.query_params
+        return cls.cursor_query_param in params or cls.page_size_query_param in params
+
+    @staticmethod
+    def encode_cursor(timestamp, key):
+        raw = f'{timestamp.isoformat()}|{key}'
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            timestamp, key = raw.rsplit('|', 1)
+            timestamp = parse_datetime(timestamp)
+            if timestamp is None:
+                raise ValueError
+            return timestamp, int(key)
+        except (ValueError, UnicodeDecodeError):
+            raise ValidationError({'cursor': 'Invalid cursor'})
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            page_size = int(value)
+        except ValueError:
+            raise ValidationError({'page_size': 'page_size must be an integer'})
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        time_field, key_field = self.ordering_fields
+        queryset = queryset.order_by(f'-{time_field}', f'-{key_field}')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            timestamp, key = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{time_field}__lt': timestamp})
+                | Q(**{time_field: timestamp, f'{key_field}__lt': key})
+            )
+
+        # Fetch one extra row to know whether there is a next page
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            # Rows are model instances, or dicts from a values() queryset
+            if isinstance(last, dict):
+                self.next_cursor = self.encode_cursor(last[time_field], last[key_field])
+            else:
+                self.next_cursor = self.encode_cursor(
+                    getattr(last, time_field), getattr(last, key_field)
+                )
+        else:
+            self.next_cursor = None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'results': data,
+            'next_cursor': self.next_cursor,
+        })
@@ -1,8 +1,10 @@
+from django.db import transaction
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
+from config.view_cache import cached_user_response, invalidate_user_cache
 from .models import Ringtone
 from .serializers import RingtoneSerializer
 
@@ -44,16 +46,19 @@ class RingtoneUploadView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Deactivate all existing ringtones for this user
-        Ringtone.objects.filter(user=request.user).update(is_active=False)
+        with transaction.atomic():
+            # Deactivate all existing ringtones for this user
+            Ringtone.objects.filter(user=request.user).update(is_active=False)
 
-        # Create ringtone and set as active automatically
-        ringtone = Ringtone.objects.create(
-            user=request.user,
-            name=name,
-            audio_file=audio_file,
-            is_active=True  # Auto-activate newly uploaded ringtone
-        )
+            # Create ringtone and set as active automatically
+            ringtone = Ringtone.objects.create(
+                user=request.user,
+                name=name,
+                audio_file=audio_file,
+                is_active=True  # Auto-activate newly uploaded ringtone
+            )
+        # update() skips the post_save handler that drops the cached active ringtone
+        invalidate_user_cache('active_ringtone', request.user.pk)
 
         print(f"🔔 New ringtone uploaded and activated for user {request.user.id}: {name}")
 
@@ -90,13 +95,17 @@ class SetActiveRingtoneView(APIView):
 
     def post(self, request, pk):
         try:
-            # Deactivate all other ringtones
-            Ringtone.objects.filter(user=request.user).update(is_active=False)
-
-            # Activate the selected ringtone
-            ringtone = Ringtone.objects.get(pk=pk, user=request.user)
-            ringtone.is_active = True
-            ringtone.save()
+            # A missing ringtone rolls the deactivation back
+            with transaction.atomic():
+                # Deactivate all other ringtones
+                Ringtone.objects.filter(user=request.user).update(is_active=False)
+
+                # Activate the selected ringtone
+                ringtone = Ringtone.objects.get(pk=pk, user=request.user)
+                ringtone.is_active = True
+                ringtone.save()
+            # update() skips the post_save handler that drops the cached active ringtone
+            invalidate_user_cache('active_ringtone', request.user.pk)
 
             serializer = RingtoneSerializer(ringtone, context={'request': request})
             return Response(
@@ -117,6 +126,9 @@ class ActiveRingtoneView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        return cached_user_response('active_ringtone', request, lambda: self._get_active(request))
+
+    def _get_active(self, request):
         try:
             ringtone = Ringtone.objects.get(user=request.user, is_active=True)
             serializer = RingtoneSerializer(ringtone, context={'request': request})
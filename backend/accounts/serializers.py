@@ -1,5 +1,50 @@
 from rest_framework import serializers
 from .models import User, Profile, Post, PostImage, PostVideo, Ringtone
+from .media_urls import absolute_media_url, media_url
+
+
+def parse_field_projection(value):
+    """
+    Parse a `fields=` query parameter such as "user.id,skills,wanted_skills"
+    into a nested dict of field names: {'user': {'id': {}}, 'skills': {}, ...}
+    """
+    tree = {}
+    if not value:
+        return tree
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class FieldProjectionMixin:
+    """
+    Lets callers restrict a serializer to a subset of its fields, including
+    fields of nested serializers, by passing `fields=<nested dict>`.
+    Dropped fields are never evaluated, so nested images/videos are skipped.
+    """
+
+    def __init__(self, *args, **kwargs):
+        projection = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if projection:
+            self._apply_projection(self, projection)
+
+    @classmethod
+    def _apply_projection(cls, serializer, projection):
+        for name in list(serializer.fields):
+            if name not in projection:
+                serializer.fields.pop(name)
+
+        for name, nested in projection.items():
+            if not nested or name not in serializer.fields:
+                continue
+            field = serializer.fields[name]
+            child = getattr(field, 'child', field)
+            if isinstance(child, serializers.Serializer):
+                cls._apply_projection(child, nested)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -32,34 +77,42 @@ class UserDetailSerializer(serializers.ModelSerializer):
         if obj.profile_image:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.profile_image.url)
+                return absolute_media_url(request, obj.profile_image)
             # Fallback: return the URL path if no request context
-            return obj.profile_image.url
+            return media_url(obj.profile_image)
         return None
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(FieldProjectionMixin, serializers.ModelSerializer):
     user = UserDetailSerializer(read_only=True)
 
     class Meta:
         model = Profile
-        fields = ['id', 'user', 'skills', 'wanted_skills', 'availability', 'time_slots', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at']
+        fields = ['id', 'user', 'skills', 'wanted_skills', 'skill_ids', 'wanted_skill_ids', 'availability', 'time_slots', 'created_at', 'updated_at']
+        read_only_fields = ['skill_ids', 'wanted_skill_ids', 'created_at', 'updated_at']
 
 
 class PostImageSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         model = PostImage
-        fields = ['id', 'image', 'uploaded_at']
+        fields = ['id', 'image', 'thumbnail', 'uploaded_at']
         read_only_fields = ['uploaded_at']
 
     def get_image(self, obj):
         if obj.image:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.image.url)
+                return absolute_media_url(request, obj.image)
+        return None
+
+    def get_thumbnail(self, obj):
+        if obj.thumbnail:
+            request = self.context.get('request')
+            if request:
+                return absolute_media_url(request, obj.thumbnail)
         return None
 
 
@@ -75,19 +128,19 @@ class PostVideoSerializer(serializers.ModelSerializer):
         if obj.video:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.video.url)
+                return absolute_media_url(request, obj.video)
         return None
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(FieldProjectionMixin, serializers.ModelSerializer):
     user = UserDetailSerializer(read_only=True)
     images = PostImageSerializer(many=True, read_only=True)
     videos = PostVideoSerializer(many=True, read_only=True)
 
     class Meta:
         model = Post
-        fields = ['id', 'user', 'skills', 'wanted_skills', 'availability', 'time_slots', 'images', 'videos', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at']
+        fields = ['id', 'user', 'skills', 'wanted_skills', 'skill_ids', 'wanted_skill_ids', 'availability', 'time_slots', 'images', 'videos', 'media_status', 'created_at', 'updated_at']
+        read_only_fields = ['skill_ids', 'wanted_skill_ids', 'media_status', 'created_at', 'updated_at']
 
 
 class RingtoneSerializer(serializers.ModelSerializer):
@@ -102,5 +155,5 @@ class RingtoneSerializer(serializers.ModelSerializer):
         if obj.audio_file:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(obj.audio_file.url)
+                return absolute_media_url(request, obj.audio_file)
         return None
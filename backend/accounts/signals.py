@@ -0,0 +1,49 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from config.view_cache import invalidate_user_cache
+from .models import User, Profile, Post, Ringtone, MediaUpload
+from .authentication import token_cache, invalidate_user_tokens
+from .match_store import schedule_post_refresh
+from .media_queue import discard_staged_file
+
+
+@receiver(post_save, sender=User)
+def invalidate_tokens_on_user_save(sender, instance, created, **kwargs):
+    # Password changes, deactivation and profile edits must not be served from a stale cache
+    if not created:
+        invalidate_user_tokens(instance)
+        invalidate_user_cache('profile', instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_profile_cache(sender, instance, **kwargs):
+    invalidate_user_cache('profile', instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Ringtone)
+def invalidate_ringtone_cache(sender, instance, **kwargs):
+    invalidate_user_cache('active_ringtone', instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+def refresh_matches_on_post_save(sender, instance, **kwargs):
+    schedule_post_refresh(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def refresh_matches_on_post_delete(sender, instance, **kwargs):
+    # pre_delete: the match rows pointing at this post are cascaded away before post_delete
+    schedule_post_refresh(instance, deleted=True)
+
+
+@receiver(post_delete, sender=MediaUpload)
+def discard_deleted_upload(sender, instance, **kwargs):
+    # Also runs when a post is deleted before its queued uploads were processed
+    transaction.on_commit(lambda: discard_staged_file(instance))
@@ -0,0 +1,255 @@
+"""
+Canonical skill dictionary.
+
+Free-form skill strings on posts and profiles are resolved to canonical
+Skill ids when they are written. Lookup goes:
+  1. exact match on a normalized name or alias (SkillAlias)
+  2. fuzzy match through a trigram index over all aliases, so spelling
+     variants such as "pyton" or "python3" land on "python"; the new
+     spelling is then stored as an alias. Only typos count: the names
+     need the same number of words, each within MAX_WORD_EDITS edits of
+     its counterpart, so "react native" stays apart from "react" and
+     "guitarist" from "guitar"
+  3. otherwise a new Skill is created
+
+The trigram index lives in memory and is rebuilt when the alias table
+changes, like the post skill index in accounts/matching.py.
+"""
+import re
+import threading
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+
+from .models import Skill, SkillAlias
+
+MAX_SKILL_LENGTH = 100
+
+# Minimum Dice coefficient between trigram sets for an alias to be considered
+# as a fuzzy match; the edit distance check below makes the actual decision
+FUZZY_MATCH_THRESHOLD = 0.3
+
+# Edits allowed per word in a fuzzy match, by the length of the shorter word.
+# Words of up to 4 characters must match exactly ("java" is not "lava").
+MAX_WORD_EDITS = ((9, 2), (5, 1))
+
+_whitespace = re.compile(r'\s+')
+
+
+def normalize_skill(skill):
+    """Normalize a free-form skill string for comparison"""
+    if not isinstance(skill, str):
+        return ''
+    return _whitespace.sub(' ', skill.strip().lower())
+
+
+def trigrams(text):
+    """Trigrams of a normalized string, padded like pg_trgm so short words still produce some"""
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_word_edits(word, other):
+    length = min(len(word), len(other))
+    for min_length, edits in MAX_WORD_EDITS:
+        if length >= min_length:
+            return edits
+    return 0
+
+
+def edit_distance(a, b, limit):
+    """
+    Levenshtein distance counting adjacent transpositions as one edit
+    ("pyhton"), or limit + 1 once it is known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def typo_distance(name, alias):
+    """Total edits between two normalized names, or None if they differ by more than typos"""
+    words, alias_words = name.split(' '), alias.split(' ')
+    if len(words) != len(alias_words):
+        return None
+    total = 0
+    for word, alias_word in zip(words, alias_words):
+        limit = max_word_edits(word, alias_word)
+        distance = edit_distance(word, alias_word, limit)
+        if distance > limit:
+            return None
+        total += distance
+    return total
+
+
+class SkillDictionary:
+    """In-memory view of the Skill/SkillAlias tables with a trigram index for fuzzy lookup"""
+
+    def __init__(self, skills, aliases):
+        self.names = {}
+        self.display_names = {}
+        self.aliases = {}
+        self.trigram_index = {}
+        self._alias_trigrams = {}
+        self._related = {}
+
+        for skill_id, name, display_name in skills:
+            self.names[skill_id] = name
+            self.display_names[skill_id] = display_name
+        for alias, skill_id in aliases:
+            self.add_alias(alias, skill_id)
+
+    @classmethod
+    def build(cls):
+        return cls(
+            Skill.objects.values_list('id', 'name', 'display_name'),
+            SkillAlias.objects.values_list('alias', 'skill_id'),
+        )
+
+    def add_alias(self, alias, skill_id):
+        self.aliases[alias] = skill_id
+        grams = trigrams(alias)
+        self._alias_trigrams[alias] = grams
+        for gram in grams:
+            self.trigram_index.setdefault(gram, set()).add(alias)
+
+    def add_skill(self, skill_id, name, display_name):
+        self.names[skill_id] = name
+        self.display_names[skill_id] = display_name
+        self._related.clear()
+        self.add_alias(name, skill_id)
+
+    def lookup(self, name):
+        """Skill id for a normalized name: exact alias first, then the closest typo-level match"""
+        if name in self.aliases:
+            return self.aliases[name]
+
+        grams = trigrams(name)
+        shared = {}
+        for gram in grams:
+            for alias in self.trigram_index.get(gram, ()):
+                shared[alias] = shared.get(alias, 0) + 1
+
+        best_id, best_key = None, None
+        for alias, count in shared.items():
+            score = 2 * count / (len(grams) + len(self._alias_trigrams[alias]))
+            if score < FUZZY_MATCH_THRESHOLD:
+                continue
+            distance = typo_distance(name, alias)
+            if distance is None:
+                continue
+            # Fewest edits wins, then the most shared trigrams
+            key = (distance, -score)
+            if best_key is None or key < best_key:
+                best_id, best_key = self.aliases[alias], key
+        return best_id
+
+    def related(self, skill_id):
+        """Ids of other skills whose canonical names contain or are contained in this one"""
+        if skill_id not in self._related:
+            name = self.names.get(skill_id, '')
+            self._related[skill_id] = {
+                other_id for other_id, other in self.names.items()
+                if other_id != skill_id and name and (other in name or name in other)
+            }
+        return self._related[skill_id]
+
+    def display_name(self, skill_id):
+        return self.display_names.get(skill_id, '')
+
+
+_dictionary = None
+_dictionary_fingerprint = None
+_dictionary_lock = threading.Lock()
+
+
+def _fingerprint():
+    # Aliases are only ever added, so count + max id changes on every write
+    stats = SkillAlias.objects.aggregate(count=Count('id'), latest=Max('id'))
+    return (stats['count'], stats['latest'])
+
+
+def get_skill_dictionary():
+    """Return the process-wide skill dictionary, rebuilding it if aliases have changed"""
+    global _dictionary, _dictionary_fingerprint
+
+    fingerprint = _fingerprint()
+    if _dictionary is not None and _dictionary_fingerprint == fingerprint:
+        return _dictionary
+
+    with _dictionary_lock:
+        if _dictionary is None or _dictionary_fingerprint != fingerprint:
+            _dictionary = SkillDictionary.build()
+            _dictionary_fingerprint = fingerprint
+        return _dictionary
+
+
+def invalidate_skill_dictionary():
+    global _dictionary, _dictionary_fingerprint
+    with _dictionary_lock:
+        _dictionary = None
+        _dictionary_fingerprint = None
+
+
+def _create_skill(name, display_name):
+    try:
+        with transaction.atomic():
+            skill = Skill.objects.create(name=name, display_name=display_name)
+            SkillAlias.objects.create(alias=name, skill=skill)
+            return skill.id
+    except IntegrityError:
+        # Created concurrently by another request
+        return SkillAlias.objects.get(alias=name).skill_id
+
+
+def _add_alias(alias, skill_id):
+    try:
+        with transaction.atomic():
+            SkillAlias.objects.create(alias=alias, skill_id=skill_id)
+    except IntegrityError:
+        pass
+
+
+def resolve_skills(skills):
+    """
+    Resolve free-form skill strings to canonical Skill ids, creating skills
+    and aliases as needed. Returns ids without duplicates, in input order.
+    """
+    dictionary = get_skill_dictionary()
+    changed = False
+    skill_ids = []
+
+    for skill in skills or []:
+        name = normalize_skill(skill)[:MAX_SKILL_LENGTH]
+        if not name:
+            continue
+
+        skill_id = dictionary.lookup(name)
+        if skill_id is None:
+            display_name = skill.strip()[:MAX_SKILL_LENGTH]
+            skill_id = _create_skill(name, display_name)
+            dictionary.add_skill(skill_id, name, display_name)
+            changed = True
+        elif name not in dictionary.aliases:
+            # Remember the spelling so the next lookup is exact
+            _add_alias(name, skill_id)
+            dictionary.add_alias(name, skill_id)
+            changed = True
+
+        if skill_id not in skill_ids:
+            skill_ids.append(skill_id)
+
+    if changed:
+        # Other processes notice the new aliases through the fingerprint
+        invalidate_skill_dictionary()
+    return skill_ids
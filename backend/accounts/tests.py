@@ -1,3 +1,442 @@
-from django.test import TestCase
+import importlib
+import importlib.util
+import random
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from .availability import availability_mask
+from .authentication import TokenCache, decode_credentials, encode_credentials
+from . import media_queue
+from .media_urls import MediaURLResolver, StorageURLCache
+from .models import User, Profile, Post, PostImage, PostVideo, Ringtone, MediaUpload
+from .batch_matching import compute_batch_scores
+from .matching import SkillIndex, find_matches
+from .skills import SkillDictionary, get_skill_dictionary, resolve_skills
 
-# Create your tests here.
+
+class PostQueryCountTests(TestCase):
+    """Serializing posts must cost a fixed number of queries, however many rows there are"""
+
+    # posts (joined with user) + images + videos
+    MAX_QUERIES = 3
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='owner', email='owner@example.com', password='password',
+            first_name='Post', last_name='Owner'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_posts(self, count):
+        for i in range(count):
+            number = User.objects.count()
+            author = User.objects.create(
+                username=f'author{number}', email=f'author{number}@example.com',
+                first_name='Author', last_name=str(i), profile_image='profile_images/avatar.png'
+            )
+            for owner in (self.user, author):
+                post = Post.objects.create(user=owner, skills=['python'], wanted_skills=['guitar'])
+                PostImage.objects.create(post=post, image='post_images/image.png')
+                PostVideo.objects.create(post=post, video='post_videos/video.mp4')
+
+    def assertQueryCountIsConstant(self, url):
+        self.create_posts(1)
+        with self.assertNumQueries(self.MAX_QUERIES):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.create_posts(10)
+        with self.assertNumQueries(self.MAX_QUERIES):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_all_posts(self):
+        self.assertQueryCountIsConstant('/api/posts/all/')
+
+    def test_user_posts(self):
+        self.assertQueryCountIsConstant('/api/posts/')
+
+    def test_post_detail(self):
+        self.create_posts(1)
+        post = Post.objects.filter(user=self.user).first()
+        with self.assertNumQueries(self.MAX_QUERIES):
+            response = self.client.get(f'/api/posts/{post.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['images']), 1)
+        self.assertEqual(len(response.data['videos']), 1)
+
+
+class FastReadPathTests(TestCase):
+    """The values()-based read path must return exactly what the serializers return"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='viewer', email='viewer@example.com', password='password',
+            profile_image='profile_images/me and you [1].png'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            author = User.objects.create(
+                username=f'author{i}', email=f'author{i}@example.com', first_name='Author',
+                last_name=str(i), phone_number='555-0100' if i else None,
+                profile_image='profile_images/avatar.png' if i != 1 else '',
+            )
+            post = Post.objects.create(
+                user=author, skills=['python', 'Café'], wanted_skills=['guitar'],
+                availability=['monday'], time_slots=['evening'],
+            )
+            PostImage.objects.create(post=post, image=f'post_images/image{i}.png', thumbnail='post_thumbnails/t.png')
+            PostImage.objects.create(post=post, image='post_images/second image.png')
+            if i != 2:
+                PostVideo.objects.create(post=post, video=f'post_videos/video{i}.mp4')
+
+    def assertSameOutput(self, url):
+        with override_settings(FAST_READ_PATHS=False):
+            reference = self.client.get(url)
+        fast = self.client.get(url)
+        self.assertEqual(reference.status_code, 200)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, reference.content)
+
+    def test_all_posts(self):
+        self.assertSameOutput('/api/posts/all/')
+
+    def test_all_posts_with_projection(self):
+        self.assertSameOutput('/api/posts/all/?fields=id,user.id,user.profile_image,images.thumbnail,skills')
+
+    def test_all_posts_paginated(self):
+        self.assertSameOutput('/api/posts/all/?page_size=2')
+
+
+class CountingStorage(Storage):
+    def __init__(self):
+        self.url_calls = 0
+
+    def url(self, name):
+        self.url_calls += 1
+        return f'https://cdn.example.com/{name}'
+
+
+class MediaURLResolverTests(TestCase):
+    def test_local_urls_match_build_absolute_uri(self):
+        request = RequestFactory().get('/')
+        storage = FileSystemStorage()
+        resolver = MediaURLResolver.for_request(request)
+        for name in ['profile_images/a.png', 'post_images/two words [1].png', 'post_images/café%20.png']:
+            self.assertEqual(resolver.url(storage, name), request.build_absolute_uri(storage.url(name)))
+        self.assertIsNone(resolver.url(storage, ''))
+        self.assertIs(MediaURLResolver.for_request(request), resolver)
+
+    def test_storage_urls_are_cached(self):
+        storage = CountingStorage()
+        cache = StorageURLCache(max_size=1)
+        self.assertEqual(cache.url(storage, 'a.png'), 'https://cdn.example.com/a.png')
+        cache.url(storage, 'a.png')
+        self.assertEqual(storage.url_calls, 1)
+        # The least recently used entry is evicted
+        cache.url(storage, 'b.png')
+        cache.url(storage, 'a.png')
+        self.assertEqual(storage.url_calls, 3)
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ada', email='ada@example.com', password='pw', first_name='Ada')
+        self.token = Token.objects.create(user=self.user)
+
+    def test_entries_decode_to_fresh_users(self):
+        cache = TokenCache()
+        cache.set(self.token.key, (self.user, self.token))
+        user, token = cache.get(self.token.key)
+        self.assertEqual((user.pk, user.first_name, user.password), (self.user.pk, 'Ada', self.user.password))
+        self.assertEqual(user.date_joined, self.user.date_joined)
+        self.assertEqual(token.created, self.token.created)
+        self.assertIsNot(cache.get(self.token.key)[0], user)
+
+        cache.delete(self.token.key)
+        self.assertIsNone(cache.get(self.token.key))
+
+    def test_entries_are_keyed_by_token_digest(self):
+        payload = encode_credentials(self.token.key, self.user, self.token)
+        self.assertNotIn(self.token.key, payload)
+        self.assertIsNone(decode_credentials('x' * 40, payload))
+
+
+class SkillLookupTests(SimpleTestCase):
+    def setUp(self):
+        names = ['python', 'react', 'guitar', 'machine learning', 'javascript', 'java', 'spanish']
+        self.ids = {name: skill_id for skill_id, name in enumerate(names)}
+        self.dictionary = SkillDictionary(
+            [(skill_id, name, name) for name, skill_id in self.ids.items()], self.ids.items()
+        )
+
+    def test_typos_resolve_to_existing_skills(self):
+        for typo, name in [
+            ('pyton', 'python'), ('python3', 'python'), ('pyhton', 'python'),
+            ('javascirpt', 'javascript'), ('machine lerning', 'machine learning'), ('spansh', 'spanish'),
+        ]:
+            self.assertEqual(self.dictionary.lookup(typo), self.ids[name], typo)
+
+    def test_different_skills_stay_apart(self):
+        for name in ['react native', 'python django', 'bass guitar', 'guitarist', 'machine', 'lava', 'ruby']:
+            self.assertIsNone(self.dictionary.lookup(name), name)
+
+
+@skipUnless(importlib.util.find_spec('numpy') and importlib.util.find_spec('scipy'), 'needs numpy and scipy')
+class BatchMatchingTests(TestCase):
+    # Includes names contained in others ("java"/"javascript") so partial matches are exercised
+    SKILLS = ['python', 'django', 'java', 'javascript', 'react', 'react native', 'guitar', 'bass guitar', 'spanish', 'cooking']
+
+    def test_batch_scores_agree_with_find_matches(self):
+        rng = random.Random(15)
+        for n in range(30):
+            user = User.objects.create(username=f'user{n}', email=f'user{n}@example.com')
+            for _ in range(rng.randint(0, 3)):
+                Post.objects.create(
+                    user=user,
+                    skills=rng.sample(self.SKILLS, rng.randint(0, 3)),
+                    wanted_skills=rng.sample(self.SKILLS, rng.randint(0, 3)),
+                    availability=rng.choice([[], ['monday']]),
+                )
+
+        index = SkillIndex.build()
+        batch = compute_batch_scores(index, get_skill_dictionary())
+        self.assertTrue(batch.scores.nnz)
+        for row, user_id in enumerate(batch.user_ids):
+            expected = find_matches(int(user_id), index=index)
+            matches = batch.top_matches(row)
+            # Rankings may differ between equal scores, so compare per candidate
+            self.assertEqual(
+                {match.candidate_id: (match.post_id, match.score) for match in matches},
+                {result.user_id: (result.post_id, result.score) for result in expected},
+            )
+            self.assertEqual([match.score for match in matches], [result.score for result in expected])
+
+
+class SkillIdsOnSaveTests(TestCase):
+    def test_posts_created_through_the_orm_are_matched(self):
+        teacher = User.objects.create(username='teacher', email='teacher@example.com')
+        learner = User.objects.create(username='learner', email='learner@example.com')
+        post = Post.objects.create(user=teacher, skills=['Python'], wanted_skills=['Guitar'])
+        Post.objects.create(user=learner, skills=['guitar '], wanted_skills=['python'])
+
+        self.assertEqual(post.skill_ids, resolve_skills(['python']))
+        self.assertEqual([match.post_id for match in find_matches(learner)], [post.id])
+
+    def test_update_fields_saves_resolved_ids(self):
+        profile = Profile.objects.create(user=User.objects.create(username='p', email='p@example.com'))
+        profile.wanted_skills = ['Spanish']
+        profile.save(update_fields=['wanted_skills'])
+
+        profile.refresh_from_db()
+        self.assertEqual(profile.wanted_skill_ids, resolve_skills(['spanish']))
+        self.assertEqual(profile.skill_ids, [])
+
+
+@override_settings(MATCH_REFRESH='sync')
+class MatchEndpointTests(TestCase):
+    def setUp(self):
+        self.learner = User.objects.create(username='learner', email='learner@example.com')
+        teacher = User.objects.create(username='teacher', email='teacher@example.com')
+        Post.objects.create(user=self.learner, skills=['guitar'], wanted_skills=['python'])
+        self.post = Post.objects.create(user=teacher, skills=['python'], wanted_skills=['guitar'])
+        self.client = APIClient()
+        self.client.force_authenticate(self.learner)
+
+    def test_count_is_pending_until_the_list_is_computed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get('/api/matches/count/')
+        self.assertEqual(response.data, {'count': None, 'pending': True})
+
+        # The refresh queued by the first request has run
+        self.assertEqual(self.client.get('/api/matches/count/').data, {'count': 1, 'pending': False})
+        future = '2999-01-01T00:00:00Z'
+        self.assertEqual(self.client.get(f'/api/matches/count/?since={future}').data['count'], 0)
+        self.assertEqual(self.client.get('/api/matches/count/?since=yesterday').status_code, 400)
+
+    def test_matches_are_computed_on_first_visit(self):
+        response = self.client.get('/api/matches/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([match['post']['id'] for match in response.data], [self.post.id])
+        self.assertTrue(response.data[0]['can_teach'])
+        self.assertEqual(self.client.get('/api/matches/count/').data, {'count': 1, 'pending': False})
+
+    def test_matches_limit_must_be_an_integer(self):
+        self.assertEqual(self.client.get('/api/matches/?limit=many').status_code, 400)
+
+
+class ViewCacheInvalidationTests(TestCase):
+    """Cached profile and ringtone responses must follow every write path"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='cached', email='cached@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_profile_update_invalidates_cached_profile(self):
+        Profile.objects.create(user=self.user, skills=['Python'])
+        self.assertEqual(self.client.get('/api/profile/').data['skills'], ['Python'])
+
+        response = self.client.put('/api/profile/', {'skills': ['Django']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/profile/').data['skills'], ['Django'])
+
+    def test_activating_a_ringtone_invalidates_cached_active_ringtone(self):
+        first = Ringtone.objects.create(user=self.user, name='First', audio_file='ringtones/first.mp3', is_active=True)
+        second = Ringtone.objects.create(user=self.user, name='Second', audio_file='ringtones/second.mp3')
+        self.assertEqual(self.client.get('/api/ringtones/active/').data['id'], first.id)
+
+        response = self.client.post(f'/api/ringtones/{second.id}/activate/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/ringtones/active/').data['id'], second.id)
+
+    def test_activating_a_missing_ringtone_changes_nothing(self):
+        ringtone = Ringtone.objects.create(user=self.user, name='Only', audio_file='ringtones/only.mp3', is_active=True)
+        self.assertEqual(self.client.get('/api/ringtones/active/').data['id'], ringtone.id)
+
+        response = self.client.post(f'/api/ringtones/{ringtone.id + 100}/activate/')
+        self.assertEqual(response.status_code, 404)
+        ringtone.refresh_from_db()
+        self.assertTrue(ringtone.is_active)
+        self.assertEqual(self.client.get('/api/ringtones/active/').data['id'], ringtone.id)
+
+
+class MediaQueueTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, MEDIA_STAGING_ROOT=f'{media_root}/staging', MEDIA_PROCESSING='external',
+            MATCH_REFRESH='sync',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.staging = media_queue.get_staging_storage()
+        self.post = Post.objects.create(user=User.objects.create(username='poster', email='poster@example.com'))
+
+    def queue_image(self, name='photo.png'):
+        staged_path = self.staging.save(name, ContentFile(b'not really a png'))
+        Post.objects.filter(pk=self.post.pk).update(media_status='processing')
+        return MediaUpload.objects.create(post=self.post, kind='image', staged_path=staged_path, original_name=name)
+
+    def media_status(self):
+        self.post.refresh_from_db()
+        return self.post.media_status
+
+    def test_processed_upload_becomes_a_post_image(self):
+        upload = self.queue_image()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(media_queue.process_pending(), 1)
+
+        self.assertEqual(self.media_status(), 'ready')
+        self.assertEqual(self.post.images.count(), 1)
+        self.assertFalse(MediaUpload.objects.exists())
+        self.assertFalse(self.staging.exists(upload.staged_path))
+
+    def test_upload_fails_after_max_attempts(self):
+        upload = self.queue_image()
+        with mock.patch.object(media_queue, 'process_upload', side_effect=OSError('storage down')), \
+                self.assertLogs('accounts.media_queue', 'ERROR'):
+            for attempt in range(media_queue.MAX_ATTEMPTS):
+                media_queue.process_pending()
+                self.assertEqual(self.media_status(), 'failed' if attempt == media_queue.MAX_ATTEMPTS - 1 else 'processing')
+
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.attempts), ('failed', media_queue.MAX_ATTEMPTS))
+        self.assertFalse(self.staging.exists(upload.staged_path))
+
+    def test_retry_after_a_failure_marks_the_post_ready(self):
+        self.queue_image()
+        with mock.patch.object(media_queue, 'process_upload', side_effect=OSError('storage down')), \
+                self.assertLogs('accounts.media_queue', 'ERROR'):
+            media_queue.process_pending()
+        self.assertEqual(self.media_status(), 'processing')
+
+        media_queue.process_pending()
+        self.assertEqual(self.media_status(), 'ready')
+        self.assertEqual(self.post.images.count(), 1)
+
+    def test_media_status_follows_the_remaining_uploads(self):
+        failed = self.queue_image('first.png')
+        MediaUpload.objects.filter(pk=failed.pk).update(status='failed')
+        media_queue.finish_post(self.post.pk)
+        self.assertEqual(self.media_status(), 'failed')
+
+        # Retrying the failed upload clears the failure once it succeeds
+        MediaUpload.objects.filter(pk=failed.pk).update(status='pending')
+        media_queue.process_pending()
+        self.assertEqual(self.media_status(), 'ready')
+
+    def test_deleting_a_post_discards_its_staged_files(self):
+        upload = self.queue_image()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        self.assertFalse(self.staging.exists(upload.staged_path))
+
+
+class AvailabilityOverlapTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='me', email='me@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_profile(self, username, availability, time_slots=()):
+        user = self.user if username == 'me' else User.objects.create(username=username, email=f'{username}@example.com')
+        Profile.objects.create(user=user, availability=availability, time_slots=list(time_slots))
+        return user
+
+    def overlap(self, query=''):
+        response = self.client.get(f'/api/availability/overlap/{query}')
+        self.assertEqual(response.status_code, 200)
+        return {result['user']['id']: result['overlap'] for result in response.data}
+
+    def test_overlap_with_own_profile(self):
+        self.make_profile('me', ['monday', 'Fri'], ['evening'])
+        evening = self.make_profile('evening', ['friday'], ['morning', 'evening'])
+        all_day = self.make_profile('allday', ['monday'])
+        self.make_profile('morning', ['monday'], ['morning'])
+        self.make_profile('never', [])
+
+        self.assertEqual(self.overlap(), {
+            evening.id: [{'day': 'friday', 'slot': 'evening'}],
+            all_day.id: [{'day': 'monday', 'slot': 'evening'}],
+        })
+
+    def test_overlap_with_explicit_days_or_another_user(self):
+        self.make_profile('me', ['sunday'])
+        weekend = self.make_profile('weekend', ['saturday', 'sunday'], ['afternoon'])
+        saturday = self.make_profile('saturday', ['saturday'])
+
+        self.assertEqual(set(self.overlap('?days=saturday&slots=afternoon')), {weekend.id, saturday.id})
+        # The other user is left out of their own overlap, the requester too
+        self.assertEqual(set(self.overlap(f'?user_id={weekend.id}')), {saturday.id})
+
+    def test_missing_profile(self):
+        for query in ('', '?user_id=999999', '?user_id=abc'):
+            response = self.client.get(f'/api/availability/overlap/{query}')
+            self.assertEqual(response.status_code, 404, query)
+
+    def test_migration_backfills_masks(self):
+        post = Post.objects.create(user=self.user, availability=['tue', 'Thursday'], time_slots=['morning'])
+        profile = self.make_profile('me', ['sunday', 'funday'], ['night'])
+        Post.objects.update(availability_mask=0)
+        Profile.objects.update(availability_mask=0)
+
+        # Historical models have no save() hook, so only the migration sets the mask
+        migration = importlib.import_module('accounts.migrations.0009_availability_mask')
+        state = MigrationExecutor(connection).loader.project_state(('accounts', '0009_availability_mask'))
+        migration.backfill_availability_masks(state.apps, None)
+
+        post.refresh_from_db()
+        self.assertEqual(post.availability_mask, availability_mask(['tuesday', 'thursday'], ['morning']))
+        self.assertEqual(Profile.objects.get(pk=profile.profile.pk).availability_mask, availability_mask(['sunday'], []))
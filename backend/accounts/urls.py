@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (
-    SignUpView, LoginView, ProfileView, AllProfilesView,
+    SignUpView, LoginView, LogoutView, ProfileView, AllProfilesView,
     UserPostsView, PostDetailView, AllPostsView,
     ChangePasswordView, UpdateProfileImageView, DeleteAccountView
 )
@@ -8,10 +8,13 @@ from .ringtone_views import (
     RingtoneListView, RingtoneUploadView, RingtoneDetailView,
     SetActiveRingtoneView, ActiveRingtoneView
 )
+from .matching_views import MatchesView, MatchCountView
+from .availability_views import AvailabilityOverlapView
 
 urlpatterns = [
     path('auth/signup/', SignUpView.as_view(), name='signup'),
     path('auth/login/', LoginView.as_view(), name='login'),
+    path('auth/logout/', LogoutView.as_view(), name='logout'),
     path('auth/change-password/', ChangePasswordView.as_view(), name='change-password'),
     path('auth/update-profile/', UpdateProfileImageView.as_view(), name='update-profile'),
     path('auth/delete-account/', DeleteAccountView.as_view(), name='delete-account'),
@@ -20,6 +23,9 @@ urlpatterns = [
     path('posts/', UserPostsView.as_view(), name='user-posts'),
     path('posts/<int:pk>/', PostDetailView.as_view(), name='post-detail'),
     path('posts/all/', AllPostsView.as_view(), name='all-posts'),
+    path('matches/', MatchesView.as_view(), name='matches'),
+    path('matches/count/', MatchCountView.as_view(), name='match-count'),
+    path('availability/overlap/', AvailabilityOverlapView.as_view(), name='availability-overlap'),
 
     # Ringtone endpoints
     path('ringtones/', RingtoneListView.as_view(), name='ringtone-list'),
@@ -5,8 +5,15 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.contrib.auth import authenticate
-from .models import User, Profile, Post, PostImage, PostVideo
-from .serializers import UserSerializer, UserDetailSerializer, ProfileSerializer, PostSerializer
+from config.view_cache import cached_user_response
+from .models import User, Profile, Post
+from .serializers import (
+    UserSerializer, UserDetailSerializer, ProfileSerializer, PostSerializer,
+    parse_field_projection
+)
+from .pagination import KeysetPagination
+from .fast_read import fast_read_enabled, post_values_queryset, post_rows, all_posts
+from .media_queue import enqueue_post_media
 
 
 class SignUpView(generics.CreateAPIView):
@@ -67,12 +74,33 @@ class LoginView(APIView):
         )
 
 
+class LogoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # Deleting the token also drops it from the auth cache
+        Token.objects.filter(user=request.user).delete()
+
+        return Response(
+            {'message': 'Logged out successfully'},
+            status=status.HTTP_200_OK
+        )
+
+
 class AllProfilesView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        profiles = Profile.objects.all()
-        serializer = ProfileSerializer(profiles, many=True)
+        profiles = Profile.objects.select_related('user')
+        fields = parse_field_projection(request.query_params.get('fields'))
+
+        if KeysetPagination.is_requested(request):
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(profiles, request, view=self)
+            serializer = ProfileSerializer(page, many=True, fields=fields)
+            return paginator.get_paginated_response(serializer.data)
+
+        serializer = ProfileSerializer(profiles, many=True, fields=fields)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -82,7 +110,7 @@ class UserPostsView(APIView):
 
     def get(self, request):
         # Get all posts for the current user
-        posts = Post.objects.filter(user=request.user)
+        posts = Post.objects.filter(user=request.user).with_related()
         serializer = PostSerializer(posts, many=True, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -102,19 +130,10 @@ class UserPostsView(APIView):
         if serializer.is_valid():
             post = serializer.save(user=request.user)
 
-            # Handle image uploads
+            # Stage uploaded files; the media worker stores them in the background
             images = request.FILES.getlist('images')
-            print(f"📸 Received {len(images)} images for upload")
-            for image in images:
-                created_image = PostImage.objects.create(post=post, image=image)
-                print(f"✅ Saved image: {created_image.image.url}")
-
-            # Handle video uploads
             videos = request.FILES.getlist('videos')
-            print(f"🎥 Received {len(videos)} videos for upload")
-            for video in videos:
-                created_video = PostVideo.objects.create(post=post, video=video)
-                print(f"✅ Saved video: {created_video.video.url}")
+            enqueue_post_media(post, images, videos)
 
             # Return the post with images and videos
             result_serializer = PostSerializer(post, context={'request': request})
@@ -128,7 +147,7 @@ class PostDetailView(APIView):
 
     def get(self, request, pk):
         try:
-            post = Post.objects.get(pk=pk, user=request.user)
+            post = Post.objects.with_related().get(pk=pk, user=request.user)
             serializer = PostSerializer(post, context={'request': request})
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Post.DoesNotExist:
@@ -163,15 +182,8 @@ class PostDetailView(APIView):
         if serializer.is_valid():
             post = serializer.save()
 
-            # Handle new image uploads
-            new_images = request.FILES.getlist('images')
-            for image in new_images:
-                PostImage.objects.create(post=post, image=image)
-
-            # Handle new video uploads
-            new_videos = request.FILES.getlist('videos')
-            for video in new_videos:
-                PostVideo.objects.create(post=post, video=video)
+            # Stage new uploads for background processing
+            enqueue_post_media(post, request.FILES.getlist('images'), request.FILES.getlist('videos'))
 
             # Return the updated post
             result_serializer = PostSerializer(post, context={'request': request})
@@ -198,15 +210,38 @@ class AllPostsView(APIView):
 
     def get(self, request):
         # Get all posts from all users
-        posts = Post.objects.all()
-        serializer = PostSerializer(posts, many=True, context={'request': request})
+        fields = parse_field_projection(request.query_params.get('fields'))
+        if fast_read_enabled():
+            return self._get_fast(request, fields)
+
+        posts = Post.objects.with_related()
+
+        # Optional keyset pagination: ?page_size=N&cursor=<next_cursor>
+        if KeysetPagination.is_requested(request):
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(posts, request, view=self)
+            serializer = PostSerializer(page, many=True, fields=fields, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
+
+        serializer = PostSerializer(posts, many=True, fields=fields, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def _get_fast(self, request, fields):
+        # Same output as PostSerializer, built from values() rows
+        if KeysetPagination.is_requested(request):
+            paginator = KeysetPagination()
+            rows = paginator.paginate_queryset(post_values_queryset(Post.objects.all(), fields), request, view=self)
+            return paginator.get_paginated_response(post_rows(rows, request, fields))
+        return Response(all_posts(request, fields), status=status.HTTP_200_OK)
+
 
 class ProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        return cached_user_response('profile', request, lambda: self._get_profile(request))
+
+    def _get_profile(self, request):
         try:
             profile = request.user.profile
             serializer = ProfileSerializer(profile)
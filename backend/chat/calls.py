@@ -0,0 +1,488 @@
+"""
+Server-side call sessions.
+
+Each call between two users is a CallSession that moves through
+ringing -> active -> ended. The signaling consumers drive it: an offer
+starts ringing (or is rejected when either user is already in another
+call), an answer makes it active and a hang-up ends it. Sessions expire
+on their own: a ringing call after CALL_RING_TIMEOUT seconds, an active
+one CALL_ACTIVE_TTL seconds after its participants stop heartbeating.
+Expired sessions are swept from heartbeats and from a timer started with
+each offer, and both users are sent a call-end, so abandoned offers stop
+ringing without the clients having to notice.
+
+Sessions live in Redis when REDIS_URL is set, so every ASGI worker sees
+them, and in process memory otherwise (matching InMemoryChannelLayer).
+If the Redis locks cannot be taken in time the operation is dropped
+(CallStoreBusy): an offer is answered with call-busy and anything else
+is left for the session timeouts to clean up, instead of the error
+closing the signaling socket.
+Finished calls are recorded as CallLog rows according to
+settings.CALL_LOG_WRITES:
+  'thread' on an in-process background thread (default)
+  'sync'   immediately
+"""
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .events import call_group_name, publish_to_group
+
+logger = logging.getLogger(__name__)
+
+RINGING = 'ringing'
+ACTIVE = 'active'
+ENDED = 'ended'
+
+
+@dataclass
+class CallSession:
+    call_id: str
+    caller_id: int
+    callee_id: int
+    state: str
+    started_at: float
+    expires_at: float
+    answered_at: float = None
+    ended_at: float = None
+
+    @classmethod
+    def ring(cls, caller_id, callee_id, now, ttl):
+        return cls(
+            call_id=uuid.uuid4().hex, caller_id=caller_id, callee_id=callee_id,
+            state=RINGING, started_at=now, expires_at=now + ttl,
+        )
+
+    @classmethod
+    def from_json(cls, raw):
+        return cls(**json.loads(raw))
+
+    def to_json(self):
+        return json.dumps(asdict(self))
+
+    @property
+    def participants(self):
+        return (self.caller_id, self.callee_id)
+
+    def is_between(self, user_id, other_id):
+        return {user_id, other_id} == {self.caller_id, self.callee_id}
+
+    def peer_of(self, user_id):
+        return self.callee_id if user_id == self.caller_id else self.caller_id
+
+
+class CallStoreBusy(Exception):
+    """The call store could not lock the users' sessions in time"""
+
+
+class BaseCallStore:
+    """
+    The session state machine. Subclasses provide storage: _locked(*user_ids),
+    which serializes transitions touching those users' sessions, _get(user_id),
+    _put(session), _delete(session) and _expired(now).
+    """
+
+    def __init__(self, ring_timeout, active_ttl):
+        self.ring_timeout = ring_timeout
+        self.active_ttl = active_ttl
+
+    def _current(self, user_id, now):
+        session = self._get(user_id)
+        if session is None or session.expires_at <= now:
+            return None
+        return session
+
+    def current(self, user_id):
+        """The call user_id is ringing in or taking part in, if any"""
+        return self._current(user_id, time.time())
+
+    def offer(self, caller_id, callee_id):
+        """
+        Start ringing callee_id. Returns the session, or None if either user
+        is in a call with someone else. Repeated offers between the same
+        users (a retried offer, or renegotiation during an active call)
+        return the existing session.
+        """
+        with self._locked(caller_id, callee_id):
+            now = time.time()
+            for user_id in (callee_id, caller_id):
+                session = self._current(user_id, now)
+                if session is not None and not session.is_between(caller_id, callee_id):
+                    return None
+
+            session = self._current(caller_id, now)
+            if session is None:
+                session = CallSession.ring(caller_id, callee_id, now, self.ring_timeout)
+                self._put(session)
+            elif session.state == RINGING:
+                session.expires_at = now + self.ring_timeout
+                self._put(session)
+            return session
+
+    def answer(self, callee_id, caller_id):
+        """Mark the call active; returns None if there is no such call anymore"""
+        with self._locked(callee_id, caller_id):
+            now = time.time()
+            session = self._current(callee_id, now)
+            if session is None or not session.is_between(callee_id, caller_id):
+                return None
+            if session.state == RINGING:
+                session.state = ACTIVE
+                session.answered_at = now
+            session.expires_at = now + self.active_ttl
+            self._put(session)
+            return session
+
+    def end(self, user_id, peer_id=None):
+        """End user_id's call (only if it is with peer_id, when given); returns the ended session"""
+        if peer_id is None:
+            session = self._get(user_id)
+            if session is None:
+                return None
+            peer_id = session.peer_of(user_id)
+        with self._locked(user_id, peer_id):
+            session = self._get(user_id)
+            if session is None or not session.is_between(user_id, peer_id):
+                return None
+            self._delete(session)
+            session.state = ENDED
+            session.ended_at = min(time.time(), session.expires_at)
+            return session
+
+    def touch(self, user_id):
+        """Keep an active call alive while its participants' sockets heartbeat"""
+        now = time.time()
+        session = self._current(user_id, now)
+        # Only take the lock when the call is active and half its TTL has passed
+        if session is None or session.state != ACTIVE or session.expires_at - now > self.active_ttl / 2:
+            return
+        peer_id = session.peer_of(user_id)
+        with self._locked(user_id, peer_id):
+            session = self._current(user_id, now)
+            if session is not None and session.state == ACTIVE and session.is_between(user_id, peer_id):
+                session.expires_at = now + self.active_ttl
+                self._put(session)
+
+    def expire(self):
+        """Remove and return sessions whose TTL has passed"""
+        now = time.time()
+        expired = []
+        for session in self._expired(now):
+            try:
+                with self._locked(*session.participants):
+                    # Re-read under the lock: it may have been answered or extended meanwhile
+                    current = self._get(session.caller_id)
+                    if current is not None and current.call_id == session.call_id:
+                        if current.expires_at > now:
+                            continue
+                        session = current
+                        expired.append(session)
+                    self._delete(session)
+            except CallStoreBusy:
+                # Left for the next sweep
+                logger.warning('Skipping expired call %s: call store busy', session.call_id, exc_info=True)
+                continue
+            session.state = ENDED
+            session.ended_at = session.expires_at
+        return expired
+
+
+class MemoryCallStore(BaseCallStore):
+    """Process-local sessions: user id -> CallSession (both participants share one)"""
+
+    def __init__(self, ring_timeout, active_ttl):
+        super().__init__(ring_timeout, active_ttl)
+        self._sessions = {}
+        self._lock = threading.RLock()
+
+    def _locked(self, *user_ids):
+        return self._lock
+
+    def _get(self, user_id):
+        session = self._sessions.get(user_id)
+        # Hand out copies so callers never mutate stored state outside the lock
+        return CallSession(**asdict(session)) if session else None
+
+    def _put(self, session):
+        for user_id in session.participants:
+            self._sessions[user_id] = CallSession(**asdict(session))
+
+    def _delete(self, session):
+        for user_id in session.participants:
+            stored = self._sessions.get(user_id)
+            if stored is not None and stored.call_id == session.call_id:
+                del self._sessions[user_id]
+
+    def _expired(self, now):
+        expired = {}
+        with self._lock:
+            for session in self._sessions.values():
+                if session.expires_at <= now:
+                    expired[session.call_id] = CallSession(**asdict(session))
+        return list(expired.values())
+
+
+class RedisCallStore(BaseCallStore):
+    """
+    Shared sessions in Redis: the session JSON under call:session:<id>,
+    call:user:<user id> -> call id for both participants, and a sorted set
+    of call id -> expiry for sweeping. Keys also carry a Redis TTL so
+    nothing is left behind if no worker sweeps. Transitions lock each
+    user involved (call:lock:<user id>, taken in ascending id order), so
+    calls between unrelated users never wait on each other, while two
+    offers to the same callee still cannot both see them free.
+    """
+
+    expiry_key = 'call:expiry'
+    # Seconds a lock is held at most, and waited for before giving up
+    lock_timeout = 5
+    # Redis keeps keys this long past expiry so a sweep can still report them
+    key_grace = 300
+
+    def __init__(self, ring_timeout, active_ttl, redis_url):
+        import redis
+        super().__init__(ring_timeout, active_ttl)
+        self._redis = redis.Redis.from_url(redis_url)
+
+    @staticmethod
+    def _user_key(user_id):
+        return f'call:user:{user_id}'
+
+    @staticmethod
+    def _session_key(call_id):
+        return f'call:session:{call_id}'
+
+    @staticmethod
+    def _lock_key(user_id):
+        return f'call:lock:{user_id}'
+
+    @contextmanager
+    def _locked(self, *user_ids):
+        from redis.exceptions import LockError
+
+        acquired = []
+        try:
+            for user_id in sorted(set(user_ids)):
+                lock = self._redis.lock(
+                    self._lock_key(user_id), timeout=self.lock_timeout, blocking_timeout=self.lock_timeout
+                )
+                if not lock.acquire():
+                    raise CallStoreBusy(f'Timed out locking the call session of user {user_id}')
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                try:
+                    lock.release()
+                except LockError:
+                    # Held past its timeout; the transition has already been written
+                    logger.warning('Call lock %s expired before it was released', lock.name)
+
+    def _load(self, call_id):
+        raw = self._redis.get(self._session_key(call_id))
+        return CallSession.from_json(raw) if raw else None
+
+    def _get(self, user_id):
+        call_id = self._redis.get(self._user_key(user_id))
+        return self._load(call_id.decode()) if call_id else None
+
+    def _put(self, session):
+        ttl = max(int(session.expires_at - time.time()), 0) + self.key_grace
+        pipe = self._redis.pipeline()
+        pipe.set(self._session_key(session.call_id), session.to_json(), ex=ttl)
+        for user_id in session.participants:
+            pipe.set(self._user_key(user_id), session.call_id, ex=ttl)
+        pipe.zadd(self.expiry_key, {session.call_id: session.expires_at})
+        pipe.execute()
+
+    def _delete(self, session):
+        pipe = self._redis.pipeline()
+        pipe.delete(self._session_key(session.call_id))
+        for user_id in session.participants:
+            if self._redis.get(self._user_key(user_id)) == session.call_id.encode():
+                pipe.delete(self._user_key(user_id))
+        pipe.zrem(self.expiry_key, session.call_id)
+        pipe.execute()
+
+    def _expired(self, now):
+        expired = []
+        for call_id in self._redis.zrangebyscore(self.expiry_key, '-inf', now):
+            session = self._load(call_id.decode())
+            if session is None:
+                self._redis.zrem(self.expiry_key, call_id)
+            elif session.expires_at <= now:
+                expired.append(session)
+        return expired
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_call_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            ring_timeout = getattr(settings, 'CALL_RING_TIMEOUT', 45)
+            active_ttl = getattr(settings, 'CALL_ACTIVE_TTL', 120)
+            redis_url = getattr(settings, 'REDIS_URL', '')
+            if redis_url:
+                _store = RedisCallStore(ring_timeout, active_ttl, redis_url)
+            else:
+                _store = MemoryCallStore(ring_timeout, active_ttl)
+        return _store
+
+
+def _datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc) if timestamp is not None else None
+
+
+def _call_log(session, status):
+    from .models import CallLog
+    return CallLog(
+        call_id=session.call_id,
+        caller_id=session.caller_id,
+        callee_id=session.callee_id,
+        status=status,
+        started_at=_datetime(session.started_at),
+        answered_at=_datetime(session.answered_at),
+        ended_at=_datetime(session.ended_at),
+    )
+
+
+def write_call_logs(logs):
+    from .models import CallLog
+    CallLog.objects.bulk_create(logs, ignore_conflicts=True)
+
+
+class CallLogWriter(threading.Thread):
+    """Background thread that writes queued CallLog rows in batches"""
+
+    batch_size = 100
+
+    def __init__(self):
+        super().__init__(name='call-log-writer', daemon=True)
+        self.queue = queue.Queue()
+
+    def run(self):
+        while True:
+            logs = [self.queue.get()]
+            while len(logs) < self.batch_size:
+                try:
+                    logs.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                write_call_logs(logs)
+            except Exception:
+                logger.exception('Writing %d call logs failed', len(logs))
+            finally:
+                close_old_connections()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = CallLogWriter()
+            _writer.start()
+    return _writer
+
+
+def record_call(session, status):
+    """Write a CallLog for a finished call without holding up signaling"""
+    log = _call_log(session, status)
+    if getattr(settings, 'CALL_LOG_WRITES', 'thread') == 'sync':
+        write_call_logs([log])
+    else:
+        _get_writer().queue.put(log)
+
+
+def _ended_status(session, ended_by=None):
+    if session.answered_at is not None:
+        return 'completed'
+    if ended_by is None:
+        return 'missed'
+    return 'cancelled' if ended_by == session.caller_id else 'declined'
+
+
+def call_offered(caller_id, callee_id):
+    """Returns the ringing (or ongoing) session, or None if the offer was rejected as busy"""
+    try:
+        session = get_call_store().offer(caller_id, callee_id)
+    except CallStoreBusy:
+        logger.warning('Rejecting call offer %s -> %s: call store busy', caller_id, callee_id, exc_info=True)
+        return None
+    if session is None:
+        now = time.time()
+        busy = CallSession.ring(caller_id, callee_id, now, 0)
+        busy.ended_at = now
+        record_call(busy, 'busy')
+    return session
+
+
+def call_answered(callee_id, caller_id):
+    try:
+        return get_call_store().answer(callee_id, caller_id)
+    except CallStoreBusy:
+        logger.warning('Dropping call answer %s -> %s: call store busy', callee_id, caller_id, exc_info=True)
+        return None
+
+
+def call_ended(user_id, peer_id=None):
+    """End user_id's call (with peer_id, if given) and log it; returns the ended session"""
+    try:
+        session = get_call_store().end(user_id, peer_id)
+    except CallStoreBusy:
+        # The session times out on its own
+        logger.warning('Could not end the call of user %s: call store busy', user_id, exc_info=True)
+        return None
+    if session is not None:
+        # A hang-up after the session expired does not change how it ended
+        ended_by = user_id if session.ended_at < session.expires_at else None
+        record_call(session, _ended_status(session, ended_by=ended_by))
+    return session
+
+
+_last_sweep = 0.0
+
+
+def sweep_expired_calls(force=False):
+    """
+    End expired sessions, log them and tell both participants the call is
+    over; throttled to once every few seconds unless forced.
+    """
+    global _last_sweep
+    now = time.time()
+    if not force and now - _last_sweep < 5:
+        return
+    _last_sweep = now
+    for session in get_call_store().expire():
+        record_call(session, _ended_status(session))
+        for user_id in session.participants:
+            publish_to_group(call_group_name(user_id), {
+                'type': 'call_end',
+                'peer_id': session.peer_of(user_id),
+                'reason': 'timeout',
+            })
+
+
+def call_heartbeat(user_id):
+    try:
+        get_call_store().touch(user_id)
+    except CallStoreBusy:
+        logger.warning('Could not extend the call of user %s: call store busy', user_id, exc_info=True)
+    sweep_expired_calls()
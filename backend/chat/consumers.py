@@ -1,41 +1,272 @@
-import json
+import asyncio
+import logging
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Q
+from config import fast_json
+from .calls import RINGING, get_call_store, call_offered, call_answered, call_ended, call_heartbeat, sweep_expired_calls
+from .events import chat_group_name, call_group_name, notification_group_name
+from .models import Connection, Conversation
+from .presence import (
+    presence_group_name, get_online_user_ids,
+    connection_opened, connection_heartbeat, connection_closed,
+)
 
+logger = logging.getLogger(__name__)
 
-class CallConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        self.user_id = self.scope['url_route']['kwargs']['user_id']
-        self.room_group_name = f'call_{self.user_id}'
+# Flush a peer's ICE candidates early once this many are queued
+MAX_ICE_BATCH = 50
 
-        # Join room group
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+# Frames that set up or tear down a call are never dropped by the rate
+# limiter: losing one would leave a call ringing or half-open
+UNLIMITED_FRAME_TYPES = frozenset({'call-offer', 'call-answer', 'call-end'})
 
-        await self.accept()
 
-    async def disconnect(self, close_code):
-        # Leave room group
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
+class RateLimiter:
+    """Token bucket: `rate` frames per second on average, bursts of up to `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def allow(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class UserConsumer(AsyncWebsocketConsumer):
+    """
+    Base for sockets of the user authenticated by TokenAuthMiddleware.
+    Feature mixins send frames through send_frame(); a multiplexed
+    consumer tags each frame with the channel it belongs to.
+    """
+
+    multiplexed = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = RateLimiter(
+            getattr(settings, 'WEBSOCKET_RATE_LIMIT', 20),
+            getattr(settings, 'WEBSOCKET_RATE_BURST', 100),
         )
+        self.rate_limited = False
 
-    # Receive message from WebSocket
-    async def receive(self, text_data):
-        data = json.loads(text_data)
+    def parse_frame(self, text_data):
+        """
+        Decode an incoming JSON object. Returns None, dropping the frame,
+        if it is oversized, malformed or over this connection's rate limit
+        (call-control frames are exempt from the limit).
+        """
+        if text_data is None or len(text_data) > getattr(settings, 'WEBSOCKET_MAX_MESSAGE_SIZE', 65536):
+            return None
+        try:
+            data = fast_json.loads(text_data)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+
+        if data.get('type') in UNLIMITED_FRAME_TYPES:
+            return data
+        if not self.rate_limiter.allow():
+            if not self.rate_limited:
+                logger.warning('WebSocket of user %s exceeded the frame rate limit', getattr(self, 'user_id', None))
+                self.rate_limited = True
+            return None
+        self.rate_limited = False
+        return data
+
+    @staticmethod
+    def parse_user_id(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    async def send_frame(self, channel, payload):
+        if self.multiplexed:
+            payload = {'channel': channel, **payload}
+        await self.send(text_data=fast_json.dumps(payload))
+
+
+class PresenceMixin:
+    """
+    Registers the socket with chat/presence.py and relays contacts'
+    presence diffs. Clients send {"type": "heartbeat"} every 30 seconds.
+    """
+
+    # Whether the socket can ring for incoming calls (see CallSignalingMixin)
+    can_call = False
+
+    async def presence_join(self):
+        await self.channel_layer.group_add(presence_group_name(self.user_id), self.channel_name)
+        await database_sync_to_async(connection_opened)(self.user_id, self.channel_name, self.can_call)
+
+    async def presence_leave(self):
+        await self.channel_layer.group_discard(presence_group_name(self.user_id), self.channel_name)
+        await database_sync_to_async(connection_closed)(self.user_id, self.channel_name)
+
+    async def presence_heartbeat(self):
+        await database_sync_to_async(connection_heartbeat)(self.user_id, self.channel_name, self.can_call)
+
+    # A contact came online or went offline
+    async def presence_update(self, event):
+        await self.send_frame('presence', {
+            'type': 'presence',
+            'user_id': event['user_id'],
+            'online': event['online'],
+        })
+
+
+class CallSignalingMixin:
+    """
+    Relays WebRTC signaling (offer, answer, ICE candidates, hang-up) between
+    users. In the default 'batched' relay mode the trickle of ICE candidates
+    sent during call setup is coalesced per peer over a short window into a
+    single channel-layer event; anything else sent to that peer flushes its
+    queued candidates first, so the peer sees signaling in order.
+
+    Offers, answers and hang-ups also drive the call session in
+    chat/calls.py, which rejects offers to users already in a call and
+    ends calls that ring unanswered or whose participants went away.
+    Answers, ICE candidates and hang-ups are only relayed to the user the
+    sender is in a call with; frames naming anyone else are dropped.
+    """
+
+    can_call = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending_ice = {}
+        self.ice_flush_tasks = {}
+        self.ring_timeout_task = None
+
+    async def in_call_with(self, peer_id):
+        """Whether this user's current call session is with peer_id"""
+        session = await database_sync_to_async(get_call_store().current)(self.user_id)
+        return session is not None and session.is_between(self.user_id, peer_id)
+
+    async def relay_ice_candidate(self, peer_id, candidate):
+        if getattr(settings, 'CALL_SIGNALING_RELAY', 'batched') != 'batched':
+            await self.channel_layer.group_send(
+                call_group_name(peer_id),
+                {
+                    'type': 'ice_candidate',
+                    'candidate': candidate,
+                }
+            )
+            return
+
+        pending = self.pending_ice.setdefault(peer_id, [])
+        pending.append(candidate)
+        if len(pending) >= MAX_ICE_BATCH:
+            await self.flush_ice(peer_id)
+        elif peer_id not in self.ice_flush_tasks:
+            self.ice_flush_tasks[peer_id] = asyncio.ensure_future(self.flush_ice_later(peer_id))
+
+    async def flush_ice_later(self, peer_id):
+        await asyncio.sleep(getattr(settings, 'CALL_ICE_BATCH_WINDOW_MS', 25) / 1000)
+        try:
+            await self.flush_ice(peer_id)
+        except Exception:
+            logger.exception('Failed to relay ICE candidates to %s', peer_id)
+
+    async def flush_ice(self, peer_id):
+        """Send the ICE candidates queued for a peer as one event"""
+        task = self.ice_flush_tasks.pop(peer_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        candidates = self.pending_ice.pop(peer_id, None)
+        if candidates:
+            await self.channel_layer.group_send(
+                call_group_name(peer_id),
+                {
+                    'type': 'ice_candidates',
+                    'candidates': candidates,
+                }
+            )
+
+    async def flush_all_ice(self):
+        for peer_id in list(self.pending_ice):
+            await self.flush_ice(peer_id)
+
+    async def can_ring(self, user_id):
+        """Whether user_id has a socket open that can receive calls"""
+        user_id = self.parse_user_id(user_id)
+        if user_id is None:
+            return False
+        return user_id in await database_sync_to_async(get_online_user_ids)([user_id], can_call=True)
+
+    async def expire_unanswered_call(self):
+        # Stops the ring on time even if nobody heartbeats in the meantime
+        await asyncio.sleep(getattr(settings, 'CALL_RING_TIMEOUT', 45) + 1)
+        await database_sync_to_async(sweep_expired_calls)(force=True)
+
+    def start_ring_timeout(self):
+        self.cancel_ring_timeout()
+        self.ring_timeout_task = asyncio.ensure_future(self.expire_unanswered_call())
+
+    def cancel_ring_timeout(self):
+        if self.ring_timeout_task is not None:
+            self.ring_timeout_task.cancel()
+            self.ring_timeout_task = None
+
+    async def call_heartbeat(self):
+        await database_sync_to_async(call_heartbeat)(self.user_id)
+
+    async def call_signaling_closed(self):
+        """End this user's call once their last call-capable socket is gone"""
+        self.cancel_ring_timeout()
+        await self.flush_all_ice()
+        if await self.can_ring(self.user_id):
+            return
+        session = await database_sync_to_async(call_ended)(self.user_id)
+        if session is not None:
+            await self.channel_layer.group_send(
+                call_group_name(session.peer_of(self.user_id)),
+                {
+                    'type': 'call_end',
+                    'reason': 'disconnected',
+                }
+            )
+
+    async def receive_call(self, data):
         message_type = data.get('type')
 
         if message_type == 'call-offer':
-            # Forward call offer to the recipient
-            recipient_id = data.get('recipient_id')
+            # Forward call offer to the recipient, unless nobody would hear it ring
+            recipient_id = self.parse_user_id(data.get('recipient_id'))
+            if recipient_id is None or not await self.can_ring(recipient_id):
+                await self.send_frame('call', {
+                    'type': 'call-unavailable',
+                    'recipient_id': data.get('recipient_id'),
+                })
+                return
+            session = await database_sync_to_async(call_offered)(self.user_id, recipient_id)
+            if session is None:
+                await self.send_frame('call', {
+                    'type': 'call-busy',
+                    'recipient_id': recipient_id,
+                })
+                return
+            if session.state == RINGING:
+                self.start_ring_timeout()
+            await self.flush_ice(recipient_id)
             await self.channel_layer.group_send(
-                f'call_{recipient_id}',
+                call_group_name(recipient_id),
                 {
                     'type': 'call_offer',
+                    'call_id': session.call_id,
                     'offer': data.get('offer'),
                     'caller_id': self.user_id,
                     'caller_name': data.get('caller_name'),
@@ -43,9 +274,20 @@ class CallConsumer(AsyncWebsocketConsumer):
             )
         elif message_type == 'call-answer':
             # Forward call answer to the caller
-            caller_id = data.get('caller_id')
+            caller_id = self.parse_user_id(data.get('caller_id'))
+            if caller_id is None:
+                return
+            session = await database_sync_to_async(call_answered)(self.user_id, caller_id)
+            if session is None:
+                # The call was cancelled or timed out before the answer arrived
+                await self.send_frame('call', {
+                    'type': 'call-end',
+                    'reason': 'not-found',
+                })
+                return
+            await self.flush_ice(caller_id)
             await self.channel_layer.group_send(
-                f'call_{caller_id}',
+                call_group_name(caller_id),
                 {
                     'type': 'call_answer',
                     'answer': data.get('answer'),
@@ -53,19 +295,20 @@ class CallConsumer(AsyncWebsocketConsumer):
             )
         elif message_type == 'ice-candidate':
             # Forward ICE candidate to the peer
-            peer_id = data.get('peer_id')
-            await self.channel_layer.group_send(
-                f'call_{peer_id}',
-                {
-                    'type': 'ice_candidate',
-                    'candidate': data.get('candidate'),
-                }
-            )
+            peer_id = self.parse_user_id(data.get('peer_id'))
+            if peer_id is None or not await self.in_call_with(peer_id):
+                return
+            await self.relay_ice_candidate(peer_id, data.get('candidate'))
         elif message_type == 'call-end':
             # Notify peer that call ended
-            peer_id = data.get('peer_id')
+            peer_id = self.parse_user_id(data.get('peer_id'))
+            if peer_id is None or not await self.in_call_with(peer_id):
+                return
+            self.cancel_ring_timeout()
+            await database_sync_to_async(call_ended)(self.user_id, peer_id)
+            await self.flush_ice(peer_id)
             await self.channel_layer.group_send(
-                f'call_{peer_id}',
+                call_group_name(peer_id),
                 {
                     'type': 'call_end',
                 }
@@ -73,29 +316,241 @@ class CallConsumer(AsyncWebsocketConsumer):
 
     # Receive call offer from room group
     async def call_offer(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send_frame('call', {
             'type': 'call-offer',
+            'call_id': event['call_id'],
             'offer': event['offer'],
             'caller_id': event['caller_id'],
             'caller_name': event['caller_name'],
-        }))
+        })
 
     # Receive call answer from room group
     async def call_answer(self, event):
-        await self.send(text_data=json.dumps({
+        self.cancel_ring_timeout()
+        await self.send_frame('call', {
             'type': 'call-answer',
             'answer': event['answer'],
-        }))
+        })
 
     # Receive ICE candidate from room group
     async def ice_candidate(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send_frame('call', {
             'type': 'ice-candidate',
             'candidate': event['candidate'],
-        }))
+        })
 
-    # Receive call end notification from room group
+    # Receive a batch of ICE candidates; clients still get one frame per candidate
+    async def ice_candidates(self, event):
+        for candidate in event['candidates']:
+            await self.send_frame('call', {
+                'type': 'ice-candidate',
+                'candidate': candidate,
+            })
+
+    # Receive call end notification from room group (or from an expired session)
     async def call_end(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'call-end',
-        }))
+        self.cancel_ring_timeout()
+        frame = {'type': 'call-end'}
+        if 'reason' in event:
+            frame['reason'] = event['reason']
+        await self.send_frame('call', frame)
+
+
+def _is_chat_partner(user_id, other_id):
+    """Whether the users have a conversation or an accepted connection"""
+    user1_id, user2_id = Conversation.ordered_pair(user_id, other_id)
+    if Conversation.objects.filter(user1_id=user1_id, user2_id=user2_id).exists():
+        return True
+    return Connection.objects.filter(
+        Q(from_user_id=user_id, to_user_id=other_id) | Q(from_user_id=other_id, to_user_id=user_id),
+        status='accepted',
+    ).exists()
+
+
+class ChatEventsMixin:
+    """Pushes new messages, read receipts and typing indicators"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chat_partners = set()
+
+    async def is_chat_partner(self, other_id):
+        # Remember partners so a stream of typing frames costs one lookup
+        if other_id not in self.chat_partners:
+            if not await database_sync_to_async(_is_chat_partner)(self.user_id, other_id):
+                return False
+            self.chat_partners.add(other_id)
+        return True
+
+    async def receive_chat(self, data):
+        if data.get('type') == 'typing':
+            # Typing indicators only go to users this user is talking to
+            recipient_id = self.parse_user_id(data.get('recipient_id'))
+            if recipient_id is None or recipient_id == self.user_id or not await self.is_chat_partner(recipient_id):
+                return
+            await self.channel_layer.group_send(
+                chat_group_name(recipient_id),
+                {
+                    'type': 'chat.typing',
+                    'user_id': self.user_id,
+                    'is_typing': bool(data.get('is_typing', True)),
+                }
+            )
+
+    # New message for this user (sent or received)
+    async def chat_message(self, event):
+        await self.send_frame('chat', {
+            'type': 'message',
+            'message': event['message'],
+        })
+
+    # The other participant read this user's messages
+    async def chat_read(self, event):
+        await self.send_frame('chat', {
+            'type': 'read',
+            'reader_id': event['reader_id'],
+            'last_read_id': event['last_read_id'],
+        })
+
+    # The other participant is typing
+    async def chat_typing(self, event):
+        await self.send_frame('chat', {
+            'type': 'typing',
+            'user_id': event['user_id'],
+            'is_typing': event['is_typing'],
+        })
+
+
+class NotificationMixin:
+    """Pushes notification events (e.g. connection requests) to the user"""
+
+    async def notification_event(self, event):
+        await self.send_frame('notifications', event['payload'])
+
+
+class CallConsumer(CallSignalingMixin, PresenceMixin, UserConsumer):
+    async def connect(self):
+        # The group is bound to the user authenticated by TokenAuthMiddleware;
+        # the id in the URL is kept for existing clients and must agree with it
+        self.user_id = self.scope['user'].id
+        if self.scope['url_route']['kwargs'].get('user_id') != str(self.user_id):
+            await self.close()
+            return
+        self.room_group_name = call_group_name(self.user_id)
+
+        # Join room group
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+
+        await self.accept()
+        await self.presence_join()
+
+    async def disconnect(self, close_code):
+        # Leave room group
+        if hasattr(self, 'room_group_name'):
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
+            )
+            await self.presence_leave()
+            await self.call_signaling_closed()
+
+    # Receive message from WebSocket
+    async def receive(self, text_data=None, bytes_data=None):
+        data = self.parse_frame(text_data)
+        if data is None:
+            return
+
+        if data.get('type') == 'heartbeat':
+            await self.presence_heartbeat()
+            await self.call_heartbeat()
+        else:
+            await self.receive_call(data)
+
+
+class ChatConsumer(ChatEventsMixin, PresenceMixin, UserConsumer):
+    """
+    Pushes new messages, read receipts, typing events and contacts'
+    presence to a user. Clients connect to ws/chat/?token=<auth token>.
+    """
+
+    async def connect(self):
+        self.user_id = self.scope['user'].id
+        self.room_group_name = chat_group_name(self.user_id)
+
+        # Join the user's chat group
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+
+        await self.accept()
+        await self.presence_join()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'room_group_name'):
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
+            )
+            await self.presence_leave()
+
+    # Receive typing indicators and heartbeats from WebSocket
+    async def receive(self, text_data=None, bytes_data=None):
+        data = self.parse_frame(text_data)
+        if data is None:
+            return
+
+        if data.get('type') == 'heartbeat':
+            await self.presence_heartbeat()
+        else:
+            await self.receive_chat(data)
+
+
+class RealtimeConsumer(CallSignalingMixin, ChatEventsMixin, NotificationMixin, PresenceMixin, UserConsumer):
+    """
+    One multiplexed socket per browser tab at ws/realtime/?token=<auth token>.
+    Every frame in either direction carries a "channel" ("call", "chat",
+    "notifications" or "presence") next to the feature's own "type".
+    """
+
+    multiplexed = True
+
+    def group_names(self):
+        return [
+            call_group_name(self.user_id),
+            chat_group_name(self.user_id),
+            notification_group_name(self.user_id),
+        ]
+
+    async def connect(self):
+        self.user_id = self.scope['user'].id
+        for group_name in self.group_names():
+            await self.channel_layer.group_add(group_name, self.channel_name)
+
+        await self.accept()
+        await self.presence_join()
+        self.joined = True
+
+    async def disconnect(self, close_code):
+        if getattr(self, 'joined', False):
+            for group_name in self.group_names():
+                await self.channel_layer.group_discard(group_name, self.channel_name)
+            await self.presence_leave()
+            await self.call_signaling_closed()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        data = self.parse_frame(text_data)
+        if data is None:
+            return
+
+        channel = data.get('channel')
+        if channel == 'call':
+            await self.receive_call(data)
+        elif channel == 'chat':
+            await self.receive_chat(data)
+        elif channel == 'presence' and data.get('type') == 'heartbeat':
+            await self.presence_heartbeat()
+            await self.call_heartbeat()
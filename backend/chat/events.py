@@ -0,0 +1,71 @@
+"""
+Helpers for pushing events from synchronous code to the per-user
+channel-layer groups that the consumers in chat/consumers.py subscribe to.
+"""
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def chat_group_name(user_id):
+    return f'chat_{user_id}'
+
+
+def call_group_name(user_id):
+    return f'call_{user_id}'
+
+
+def notification_group_name(user_id):
+    return f'notifications_{user_id}'
+
+
+def publish_to_group(group_name, event):
+    """Send an event to a channel-layer group; never raises"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(group_name, event)
+    except Exception:
+        # Real-time delivery is best effort; clients still catch up over HTTP
+        logger.exception('Failed to publish %s to %s', event.get('type'), group_name)
+
+
+def publish_to_user(user_id, event):
+    """Send an event to every open chat socket of a user; never raises"""
+    publish_to_group(chat_group_name(user_id), event)
+
+
+def publish_on_commit(user_ids, event):
+    """Publish once the surrounding transaction commits, so clients never see rolled-back rows"""
+    def publish():
+        for user_id in user_ids:
+            publish_to_user(user_id, event)
+    transaction.on_commit(publish)
+
+
+def publish_message(message_data, sender_id, receiver_id):
+    # The sender's group is included so their other open tabs stay in sync
+    publish_on_commit({sender_id, receiver_id}, {
+        'type': 'chat.message',
+        'message': message_data,
+    })
+
+
+def publish_read_receipt(reader_id, sender_id, last_read_id):
+    publish_on_commit([sender_id], {
+        'type': 'chat.read',
+        'reader_id': reader_id,
+        'last_read_id': last_read_id,
+    })
+
+
+def send_notification(user_id, payload):
+    """Push a frame to the user's notification channel right away; never raises"""
+    publish_to_group(notification_group_name(user_id), {
+        'type': 'notification.event',
+        'payload': payload,
+    })
@@ -0,0 +1,47 @@
+"""
+Serializer-free builders for the inbox and message history, producing
+exactly what ConversationSerializer and MessageSerializer return (see
+accounts/fast_read.py).
+"""
+from accounts.fast_read import format_datetime, user_detail, user_values_fields
+
+MESSAGE_FIELDS = ('id', 'sender_id', 'receiver_id', 'content', 'created_at', 'is_read')
+CONVERSATION_FIELDS = (
+    'id', 'last_message_at', 'user1_id', 'user2_id', 'user1_unread_count', 'user2_unread_count',
+    *('last_message__' + field for field in MESSAGE_FIELDS),
+    *user_values_fields('user1__'),
+    *user_values_fields('user2__'),
+)
+
+
+def message_row(row, users, prefix=''):
+    """MessageSerializer output for a values() row; `users` maps user id -> user details"""
+    return {
+        'id': row[prefix + 'id'],
+        'sender': users[row[prefix + 'sender_id']],
+        'receiver': users[row[prefix + 'receiver_id']],
+        'content': row[prefix + 'content'],
+        'created_at': format_datetime(row[prefix + 'created_at']),
+        'is_read': row[prefix + 'is_read'],
+    }
+
+
+def message_rows(rows, users):
+    return [message_row(row, users) for row in rows]
+
+
+def conversation_rows(rows, user, urls):
+    """ConversationSerializer output for Conversation values(*CONVERSATION_FIELDS) rows"""
+    inbox = []
+    for row in rows:
+        users = {
+            row['user1_id']: user_detail(row, urls, 'user1__'),
+            row['user2_id']: user_detail(row, urls, 'user2__'),
+        }
+        is_user1 = row['user1_id'] == user.id
+        inbox.append({
+            'user': users[row['user2_id'] if is_user1 else row['user1_id']],
+            'last_message': message_row(row, users, 'last_message__'),
+            'unread_count': row['user1_unread_count'] if is_user1 else row['user2_unread_count'],
+        })
+    return inbox
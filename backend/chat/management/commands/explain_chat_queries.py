@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from accounts.models import User
+from chat.models import Message, Connection, Conversation
+
+
+# Plan fragments that indicate a full table scan on each backend
+SEQUENTIAL_SCAN_MARKERS = {
+    'postgresql': ['Seq Scan'],
+    'sqlite': ['SCAN '],
+}
+
+
+class Command(BaseCommand):
+    help = "Print EXPLAIN plans for the chat views' query shapes and flag sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='User to run the queries as (default: first user)')
+        parser.add_argument('--other-user-id', type=int, help='Conversation partner (default: second user)')
+        parser.add_argument('--analyze', action='store_true', help='Use EXPLAIN ANALYZE (PostgreSQL only)')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        user = self._get_user(options['user_id'], users.first())
+        other = self._get_user(options['other_user_id'], users.exclude(id=user.id).first())
+
+        pair = Q(sender=user, receiver=other) | Q(sender=other, receiver=user)
+        query_shapes = {
+            'get_conversations': Conversation.for_user(user).filter(
+                last_message__isnull=False
+            ).order_by('-last_message_at', '-id'),
+            'get_messages (history)': Message.objects.filter(pair).order_by('created_at', 'id'),
+            'get_messages (mark read)': Message.objects.filter(sender=other, receiver=user, is_read=False),
+            'get_connection_status': Connection.objects.filter(
+                Q(from_user=user, to_user=other) | Q(from_user=other, to_user=user)
+            ),
+            'get_pending_requests': Connection.objects.filter(to_user=user, status='pending'),
+            'get_connected_users': Connection.objects.filter(
+                Q(from_user=user, status='accepted') | Q(to_user=user, status='accepted')
+            ),
+        }
+
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor != 'postgresql':
+                raise CommandError('--analyze is only supported on PostgreSQL')
+            explain_options['analyze'] = True
+
+        markers = SEQUENTIAL_SCAN_MARKERS.get(connection.vendor, [])
+        scans = 0
+        for name, queryset in query_shapes.items():
+            plan = queryset.explain(**explain_options)
+            has_scan = any(marker in line for line in plan.splitlines() for marker in markers)
+            scans += has_scan
+
+            style = self.style.WARNING if has_scan else self.style.SUCCESS
+            self.stdout.write(style(f"{name}: {'SEQUENTIAL SCAN' if has_scan else 'uses indexes'}"))
+            self.stdout.write(plan)
+            self.stdout.write('')
+
+        if scans:
+            self.stdout.write(self.style.WARNING(f'{scans} query shape(s) use a sequential scan'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All query shapes use indexes'))
+
+    def _get_user(self, user_id, default):
+        if user_id is None:
+            if default is None:
+                raise CommandError('At least two users are needed to explain the chat queries')
+            return default
+        try:
+            return User.objects.get(id=user_id)
+        except User.DoesNotExist:
+            raise CommandError(f'User {user_id} not found')
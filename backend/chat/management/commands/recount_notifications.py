@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from chat.notifications import recount_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild notification badge counters and conversations' unread counts from the rows they count"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, action='append', dest='user_ids',
+                            help='Only recount this user (repeatable; default: every user)')
+
+    def handle(self, *args, **options):
+        users = recount_counters(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Recounted notification counters of {users} users'))
@@ -0,0 +1,46 @@
+"""
+Token authentication for WebSocket connections.
+
+Browsers cannot set headers on a WebSocket handshake, so clients pass
+their auth token as ?token=<key> (an "Authorization: Token <key>" header
+also works for other clients). The user is resolved once per connection
+through the same cache as the REST API. Unauthenticated handshakes are
+rejected here, before a consumer is created, so they never join a group
+or take a channel on the channel layer.
+"""
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from accounts.authentication import authenticate_token
+
+
+def get_scope_token(scope):
+    query = parse_qs(scope.get('query_string', b'').decode())
+    token = query.get('token', [None])[0]
+    if token:
+        return token
+
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            keyword, _, key = value.decode().partition(' ')
+            if keyword.lower() == 'token' and key:
+                return key.strip()
+    return None
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    async def __call__(self, scope, receive, send):
+        token = get_scope_token(scope)
+        user = await database_sync_to_async(authenticate_token)(token) if token else None
+
+        if user is None:
+            if scope['type'] == 'websocket':
+                # Wait for the handshake, then refuse it (sent to the client as HTTP 403)
+                await receive()
+                await send({'type': 'websocket.close'})
+                return
+            user = AnonymousUser()
+
+        scope = dict(scope, user=user)
+        return await super().__call__(scope, receive, send)
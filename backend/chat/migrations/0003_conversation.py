@@ -0,0 +1,66 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_conversations(apps, schema_editor):
+    Message = apps.get_model('chat', 'Message')
+    Conversation = apps.get_model('chat', 'Conversation')
+
+    conversations = {}
+    messages = Message.objects.order_by('created_at', 'id').values_list(
+        'id', 'sender_id', 'receiver_id', 'created_at', 'is_read'
+    )
+    for message_id, sender_id, receiver_id, created_at, is_read in messages.iterator():
+        if sender_id == receiver_id:
+            continue
+        user1_id, user2_id = sorted((sender_id, receiver_id))
+        conversation = conversations.setdefault((user1_id, user2_id), Conversation(
+            user1_id=user1_id, user2_id=user2_id
+        ))
+        conversation.last_message_id = message_id
+        conversation.last_message_at = created_at
+        if not is_read:
+            if receiver_id == user1_id:
+                conversation.user1_unread_count += 1
+            else:
+                conversation.user2_unread_count += 1
+
+    Conversation.objects.bulk_create(conversations.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_connection'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('user1_unread_count', models.PositiveIntegerField(default=0)),
+                ('user2_unread_count', models.PositiveIntegerField(default=0)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message')),
+                ('user1', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user2', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user1', '-last_message_at'], name='conversation_user1_recent'), models.Index(fields=['user2', '-last_message_at'], name='conversation_user2_recent')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('user1', 'user2'), name='unique_conversation_pair'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.CheckConstraint(check=models.Q(('user1__lt', models.F('user2'))), name='conversation_pair_ordered'),
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
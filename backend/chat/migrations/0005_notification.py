@@ -0,0 +1,59 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    Message = apps.get_model('chat', 'Message')
+    Connection = apps.get_model('chat', 'Connection')
+    NotificationCounter = apps.get_model('chat', 'NotificationCounter')
+
+    counters = {}
+    unread = Message.objects.filter(is_read=False).exclude(sender_id=models.F('receiver_id'))
+    for user_id, count in unread.values_list('receiver_id').annotate(count=models.Count('id')).order_by():
+        counters.setdefault(user_id, NotificationCounter(user_id=user_id)).unread_messages = count
+    pending = Connection.objects.filter(status='pending')
+    for user_id, count in pending.values_list('to_user_id').annotate(count=models.Count('id')).order_by():
+        counters.setdefault(user_id, NotificationCounter(user_id=user_id)).pending_connection_requests = count
+
+    NotificationCounter.objects.bulk_create(counters.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_message_connection_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_messages', models.PositiveIntegerField(default=0)),
+                ('pending_connection_requests', models.PositiveIntegerField(default=0)),
+                ('unread_notifications', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('message', 'Message'), ('connection_request', 'Connection request'), ('connection_response', 'Connection response')], max_length=30)),
+                ('object_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='notification_user_recent'), models.Index(condition=models.Q(('is_read', False)), fields=['user', 'kind', 'actor'], name='notification_unread_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
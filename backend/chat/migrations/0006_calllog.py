@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_notification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('call_id', models.CharField(max_length=32, unique=True)),
+                ('status', models.CharField(choices=[('completed', 'Completed'), ('missed', 'Missed'), ('declined', 'Declined'), ('cancelled', 'Cancelled'), ('busy', 'Busy')], max_length=10)),
+                ('started_at', models.DateTimeField()),
+                ('answered_at', models.DateTimeField(blank=True, null=True)),
+                ('ended_at', models.DateTimeField()),
+                ('callee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_calls', to=settings.AUTH_USER_MODEL)),
+                ('caller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_calls', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['caller', '-started_at'], name='calllog_caller_recent'), models.Index(fields=['callee', '-started_at'], name='calllog_callee_recent')],
+            },
+        ),
+    ]
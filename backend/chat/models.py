@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from accounts.models import User
 
 
@@ -18,6 +20,13 @@ class Connection(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['from_user', 'to_user']
+        indexes = [
+            # Pending requests: to_user + status
+            models.Index(fields=['to_user', 'status'], name='connection_to_status_idx'),
+            # Accepted connections in either direction
+            models.Index(fields=['from_user'], condition=Q(status='accepted'), name='connection_from_accepted_idx'),
+            models.Index(fields=['to_user'], condition=Q(status='accepted'), name='connection_to_accepted_idx'),
+        ]
 
     def __str__(self):
         return f'{self.from_user.username} -> {self.to_user.username}: {self.status}'
@@ -32,6 +41,186 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # History between two users, queried in both directions
+            models.Index(fields=['sender', 'receiver', 'created_at'], name='message_pair_created_idx'),
+            # Unread messages from sender to receiver
+            models.Index(fields=['receiver', 'sender'], condition=Q(is_read=False), name='message_unread_idx'),
+        ]
 
     def __str__(self):
         return f'{self.sender.username} -> {self.receiver.username}: {self.content[:50]}'
+
+
+class Conversation(models.Model):
+    """
+    Denormalized inbox row for a pair of users, kept in sync with Message
+    so the inbox can be read without aggregating over the message table.
+    The pair is stored ordered (user1.id < user2.id) so each pair has one row.
+    """
+    user1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    user2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    user1_unread_count = models.PositiveIntegerField(default=0)
+    user2_unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user1', 'user2'], name='unique_conversation_pair'),
+            models.CheckConstraint(check=Q(user1__lt=F('user2')), name='conversation_pair_ordered'),
+        ]
+        indexes = [
+            models.Index(fields=['user1', '-last_message_at'], name='conversation_user1_recent'),
+            models.Index(fields=['user2', '-last_message_at'], name='conversation_user2_recent'),
+        ]
+
+    def __str__(self):
+        return f'Conversation {self.user1_id} <-> {self.user2_id}'
+
+    @staticmethod
+    def ordered_pair(user_id, other_id):
+        return (user_id, other_id) if user_id < other_id else (other_id, user_id)
+
+    @staticmethod
+    def unread_field(user_id, other_id):
+        """Name of the unread counter belonging to `user_id` in its pair with `other_id`"""
+        return 'user1_unread_count' if user_id < other_id else 'user2_unread_count'
+
+    @classmethod
+    def for_user(cls, user):
+        return cls.objects.filter(Q(user1=user) | Q(user2=user))
+
+    def other_user(self, user):
+        return self.user2 if self.user1_id == user.id else self.user1
+
+    def unread_count_for(self, user):
+        return getattr(self, self.unread_field(user.id, self.other_user(user).id))
+
+    @classmethod
+    def record_message(cls, message):
+        """Point the pair's conversation at a new message and bump the receiver's unread count"""
+        if message.sender_id == message.receiver_id:
+            return
+
+        user1_id, user2_id = cls.ordered_pair(message.sender_id, message.receiver_id)
+        unread_field = cls.unread_field(message.receiver_id, message.sender_id)
+
+        with transaction.atomic():
+            conversation, _ = cls.objects.get_or_create(user1_id=user1_id, user2_id=user2_id)
+            cls.objects.filter(pk=conversation.pk).update(**{unread_field: F(unread_field) + 1})
+            # Concurrent sends may commit out of order; never move the preview back
+            cls.objects.filter(
+                Q(last_message__isnull=True) | Q(last_message_id__lt=message.id),
+                pk=conversation.pk,
+            ).update(last_message=message, last_message_at=message.created_at)
+
+    @classmethod
+    def mark_read(cls, reader, other_user):
+        """Reset the reader's unread count for their conversation with other_user"""
+        user1_id, user2_id = cls.ordered_pair(reader.id, other_user.id)
+        unread_field = cls.unread_field(reader.id, other_user.id)
+        cls.objects.filter(user1_id=user1_id, user2_id=user2_id).update(**{unread_field: 0})
+
+
+class Notification(models.Model):
+    """
+    A notification shown to `user`. Unread message notifications are
+    coalesced to one row per sender; `object_id` points at the latest
+    message or at the connection the notification is about.
+    """
+    KIND_CHOICES = [
+        ('message', 'Message'),
+        ('connection_request', 'Connection request'),
+        ('connection_response', 'Connection response'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField(null=True, blank=True)
+    data = models.JSONField(default=dict, blank=True)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notification_user_recent'),
+            # Unread notifications of a kind from an actor (coalescing, mark read)
+            models.Index(fields=['user', 'kind', 'actor'], condition=Q(is_read=False), name='notification_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} for {self.user_id}'
+
+
+class NotificationCounter(models.Model):
+    """
+    Per-user badge counts kept in step with the rows they count, so
+    reading them is a single primary-key lookup. unread_messages is the
+    total of the user's Conversation unread counts; recount_counters() in
+    chat/notifications.py rebuilds both from the rows.
+    """
+    COUNT_FIELDS = ('unread_messages', 'pending_connection_requests', 'unread_notifications')
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread_messages = models.PositiveIntegerField(default=0)
+    pending_connection_requests = models.PositiveIntegerField(default=0)
+    unread_notifications = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Notification counts for {self.user_id}'
+
+    @classmethod
+    def adjust(cls, user_id, **deltas):
+        """Add (or subtract) from counters, never going below zero"""
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        with transaction.atomic():
+            cls.objects.get_or_create(user_id=user_id)
+            cls.objects.filter(user_id=user_id).update(**{
+                field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()
+            })
+
+    @classmethod
+    def counts_for(cls, user_id):
+        counts = cls.objects.filter(user_id=user_id).values(*cls.COUNT_FIELDS).first()
+        return counts or {field: 0 for field in cls.COUNT_FIELDS}
+
+
+class CallLog(models.Model):
+    """A finished (or rejected) call, written from chat/calls.py"""
+    STATUS_CHOICES = [
+        ('completed', 'Completed'),
+        ('missed', 'Missed'),
+        ('declined', 'Declined'),
+        ('cancelled', 'Cancelled'),
+        ('busy', 'Busy'),
+    ]
+
+    call_id = models.CharField(max_length=32, unique=True)
+    caller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='outgoing_calls')
+    callee = models.ForeignKey(User, on_delete=models.CASCADE, related_name='incoming_calls')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    started_at = models.DateTimeField()
+    answered_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['caller', '-started_at'], name='calllog_caller_recent'),
+            models.Index(fields=['callee', '-started_at'], name='calllog_callee_recent'),
+        ]
+
+    def __str__(self):
+        return f'Call {self.caller_id} -> {self.callee_id}: {self.status}'
+
+    @property
+    def duration(self):
+        """Seconds the call was connected"""
+        if self.answered_at is None:
+            return 0
+        return (self.ended_at - self.answered_at).total_seconds()
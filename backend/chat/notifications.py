@@ -0,0 +1,208 @@
+"""
+Notifications and the per-user badge counters behind them.
+
+Views call these helpers inside their transaction. Each helper writes the
+Notification row, adjusts NotificationCounter in the same transaction and,
+once it commits, pushes the fresh counts to the user's notification
+channel. Clients read the counters once (GET notifications/counts/) and
+then only apply pushed frames:
+
+    {"type": "notification", "notification": {...}, "counts": {...}}
+    {"type": "counts", "counts": {...}}
+
+The rows are the source of truth: Message.is_read, pending Connections
+and Notification.is_read. Conversation's per-pair unread counts cache the
+first, and unread_messages is their total for the user (self-messages
+count in neither). When rows go away without passing through these
+helpers (account deletion, see chat/signals.py) or the counters drift
+anyway, recount_counters() rebuilds both from the rows; it backs
+`manage.py recount_notifications`.
+"""
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import User
+from .events import send_notification
+from .models import Connection, Conversation, Message, Notification, NotificationCounter
+from .serializers import NotificationSerializer
+
+RECOUNT_BATCH_SIZE = 1000
+
+MESSAGE_PREVIEW_LENGTH = 100
+
+
+def publish_counts(user_id, notification=None):
+    """After commit, push the user's counts, with the notification that changed them if any"""
+    def publish():
+        payload = {'type': 'counts', 'counts': NotificationCounter.counts_for(user_id)}
+        if notification is not None:
+            payload = {'type': 'notification', 'notification': notification, **payload}
+        send_notification(user_id, payload)
+    transaction.on_commit(publish)
+
+
+def _serialize(notification, request):
+    return NotificationSerializer(notification, context={'request': request}).data
+
+
+def notify_message(message, request=None):
+    """A message arrived; unread message notifications are coalesced per sender"""
+    if message.sender_id == message.receiver_id:
+        return
+
+    data = {'message_id': message.id, 'preview': message.content[:MESSAGE_PREVIEW_LENGTH]}
+    unread = Notification.objects.filter(
+        user_id=message.receiver_id, actor_id=message.sender_id, kind='message', is_read=False
+    )
+    with transaction.atomic():
+        created = not unread.update(object_id=message.id, data=data, created_at=timezone.now())
+        if created:
+            Notification.objects.create(
+                user_id=message.receiver_id, actor_id=message.sender_id, kind='message',
+                object_id=message.id, data=data,
+            )
+        NotificationCounter.adjust(
+            message.receiver_id, unread_messages=1, unread_notifications=1 if created else 0
+        )
+
+    notification = unread.select_related('actor').first()
+    publish_counts(message.receiver_id, _serialize(notification, request))
+
+
+def mark_messages_read(reader_id, sender_id, count):
+    """`count` messages from sender_id were just marked read by reader_id"""
+    if reader_id == sender_id:
+        # Messages to oneself were never counted
+        return
+    with transaction.atomic():
+        read_notifications = Notification.objects.filter(
+            user_id=reader_id, actor_id=sender_id, kind='message', is_read=False
+        ).update(is_read=True)
+        NotificationCounter.adjust(
+            reader_id, unread_messages=-count, unread_notifications=-read_notifications
+        )
+    publish_counts(reader_id)
+
+
+def notify_connection_request(connection, request=None):
+    with transaction.atomic():
+        notification = Notification.objects.create(
+            user_id=connection.to_user_id, actor_id=connection.from_user_id,
+            kind='connection_request', object_id=connection.id,
+        )
+        NotificationCounter.adjust(
+            connection.to_user_id, pending_connection_requests=1, unread_notifications=1
+        )
+    publish_counts(connection.to_user_id, _serialize(notification, request))
+
+
+def notify_connection_response(connection, previous_status, request=None):
+    """The recipient accepted or rejected a request; notify the sender and settle the recipient's counts"""
+    with transaction.atomic():
+        # Responding to a request also reads its notification
+        read_notifications = Notification.objects.filter(
+            user_id=connection.to_user_id, kind='connection_request',
+            object_id=connection.id, is_read=False,
+        ).update(is_read=True)
+        NotificationCounter.adjust(
+            connection.to_user_id,
+            pending_connection_requests=-1 if previous_status == 'pending' else 0,
+            unread_notifications=-read_notifications,
+        )
+
+        notification = Notification.objects.create(
+            user_id=connection.from_user_id, actor_id=connection.to_user_id,
+            kind='connection_response', object_id=connection.id,
+            data={'status': connection.status},
+        )
+        NotificationCounter.adjust(connection.from_user_id, unread_notifications=1)
+
+    publish_counts(connection.to_user_id)
+    publish_counts(connection.from_user_id, _serialize(notification, request))
+
+
+def mark_notifications_read(user_id, ids=None):
+    """Mark the user's notifications read (all of them, or only `ids`); returns how many changed"""
+    unread = Notification.objects.filter(user_id=user_id, is_read=False)
+    if ids is not None:
+        unread = unread.filter(id__in=ids)
+    with transaction.atomic():
+        count = unread.update(is_read=True)
+        NotificationCounter.adjust(user_id, unread_notifications=-count)
+    if count:
+        publish_counts(user_id)
+    return count
+
+
+def _unread_from(sender_field, receiver_field):
+    """Subquery counting unread messages between a conversation's users"""
+    return Coalesce(Subquery(
+        Message.objects.filter(
+            sender_id=OuterRef(sender_field), receiver_id=OuterRef(receiver_field), is_read=False
+        ).order_by().values('receiver_id').annotate(count=Count('id')).values('count')
+    ), Value(0))
+
+
+def _counts_by(queryset, field, user_ids, value=None):
+    rows = queryset.filter(**{f'{field}__in': user_ids}).order_by().values(field)
+    rows = rows.annotate(count=value if value is not None else Count('pk'))
+    return {row[field]: row['count'] or 0 for row in rows}
+
+
+def _recount_batch(user_ids):
+    conversations = Conversation.objects.filter(user1_id__in=user_ids) | Conversation.objects.filter(user2_id__in=user_ids)
+    conversations.update(
+        user1_unread_count=_unread_from('user2_id', 'user1_id'),
+        user2_unread_count=_unread_from('user1_id', 'user2_id'),
+    )
+
+    unread_as_user1 = _counts_by(Conversation.objects, 'user1_id', user_ids, Sum('user1_unread_count'))
+    unread_as_user2 = _counts_by(Conversation.objects, 'user2_id', user_ids, Sum('user2_unread_count'))
+    pending = _counts_by(Connection.objects.filter(status='pending'), 'to_user_id', user_ids)
+    notifications = _counts_by(Notification.objects.filter(is_read=False), 'user_id', user_ids)
+
+    NotificationCounter.objects.bulk_create([
+        NotificationCounter(
+            user_id=user_id,
+            unread_messages=unread_as_user1.get(user_id, 0) + unread_as_user2.get(user_id, 0),
+            pending_connection_requests=pending.get(user_id, 0),
+            unread_notifications=notifications.get(user_id, 0),
+        )
+        for user_id in user_ids
+    ], update_conflicts=True, unique_fields=['user'], update_fields=list(NotificationCounter.COUNT_FIELDS))
+
+
+def recount_counters(user_ids=None):
+    """
+    Rebuild the unread counts of the given users' conversations and their
+    NotificationCounters from the rows they count (every user by default).
+    Returns the number of users recounted.
+    """
+    if user_ids is None:
+        user_ids = User.objects.order_by('id').values_list('id', flat=True).iterator()
+    total = 0
+    batch = []
+    for user_id in user_ids:
+        batch.append(user_id)
+        if len(batch) == RECOUNT_BATCH_SIZE:
+            with transaction.atomic():
+                _recount_batch(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        with transaction.atomic():
+            _recount_batch(batch)
+        total += len(batch)
+    return total
+
+
+def recount_and_publish(user_ids):
+    """Recount users whose counted rows changed behind the helpers' back, then push their counts"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    recount_counters(user_ids)
+    for user_id in user_ids:
+        publish_counts(user_id)
@@ -0,0 +1,231 @@
+"""
+Online presence tracking.
+
+Every open WebSocket (a channel name) registers its user as online and
+refreshes that with a heartbeat; a user is online while at least one of
+their connections has heartbeated within PRESENCE_TTL seconds. State is
+kept in Redis when REDIS_URL is set, so all ASGI workers share it, and
+in process memory otherwise (matching InMemoryChannelLayer).
+
+Connections that can ring (the call and multiplexed sockets) register
+with can_call=True. Presence shown to contacts counts every connection,
+but call signaling asks for online(..., can_call=True), so a user whose
+only open socket is the legacy chat one is not offered calls, and their
+call is ended when their last call-capable socket closes.
+
+When a user goes online or offline, a presence diff is pushed to the
+presence group of each accepted connection; consumers relay it to the
+browser, so clients don't poll for who is online.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Q
+
+from .events import publish_to_group
+
+logger = logging.getLogger(__name__)
+
+
+def presence_group_name(user_id):
+    return f'presence_{user_id}'
+
+
+class MemoryPresenceStore:
+    """Process-local presence: user id -> {channel name: (expires at, can call)}"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def _is_online(self, user_id, now, can_call=False):
+        return any(
+            expires_at > now and (callable_ or not can_call)
+            for expires_at, callable_ in self._connections.get(user_id, {}).values()
+        )
+
+    def touch(self, user_id, channel_name, can_call=False):
+        """Register or refresh a connection; returns True if the user just came online"""
+        now = time.time()
+        with self._lock:
+            was_online = self._is_online(user_id, now)
+            self._connections.setdefault(user_id, {})[channel_name] = (now + self.ttl, can_call)
+        return not was_online
+
+    def remove(self, user_id, channel_name):
+        """Drop a connection; returns True if the user just went offline"""
+        now = time.time()
+        with self._lock:
+            was_online = self._is_online(user_id, now)
+            channels = self._connections.get(user_id, {})
+            channels.pop(channel_name, None)
+            if not channels:
+                self._connections.pop(user_id, None)
+            return was_online and not self._is_online(user_id, now)
+
+    def online(self, user_ids, can_call=False):
+        now = time.time()
+        with self._lock:
+            return {user_id for user_id in user_ids if self._is_online(user_id, now, can_call)}
+
+    def expire(self):
+        """Forget connections that stopped heartbeating; returns users now offline"""
+        now = time.time()
+        offline = []
+        with self._lock:
+            for user_id, channels in list(self._connections.items()):
+                for channel_name, (expires_at, _) in list(channels.items()):
+                    if expires_at <= now:
+                        del channels[channel_name]
+                if not channels:
+                    del self._connections[user_id]
+                    offline.append(user_id)
+        return offline
+
+
+class RedisPresenceStore:
+    """
+    Shared presence in Redis: a sorted set per user of channel name ->
+    expiry, a second one holding only call-capable channels, plus one
+    sorted set of online user id -> latest expiry.
+    """
+
+    online_key = 'presence:online'
+
+    def __init__(self, ttl, redis_url):
+        import redis
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(redis_url)
+
+    @staticmethod
+    def _user_key(user_id):
+        return f'presence:user:{user_id}'
+
+    @staticmethod
+    def _call_key(user_id):
+        return f'presence:call:{user_id}'
+
+    def touch(self, user_id, channel_name, can_call=False):
+        now = time.time()
+        previous = self._redis.zscore(self.online_key, user_id)
+        pipe = self._redis.pipeline()
+        pipe.zadd(self._user_key(user_id), {channel_name: now + self.ttl})
+        pipe.expire(self._user_key(user_id), self.ttl * 2)
+        if can_call:
+            pipe.zadd(self._call_key(user_id), {channel_name: now + self.ttl})
+            pipe.expire(self._call_key(user_id), self.ttl * 2)
+        pipe.zadd(self.online_key, {user_id: now + self.ttl})
+        pipe.execute()
+        return previous is None or previous <= now
+
+    def remove(self, user_id, channel_name):
+        now = time.time()
+        key = self._user_key(user_id)
+        pipe = self._redis.pipeline()
+        pipe.zrem(self._call_key(user_id), channel_name)
+        pipe.zrem(key, channel_name)
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.zrange(key, -1, -1, withscores=True)
+        *_, latest = pipe.execute()
+        if latest:
+            # Other connections are still open
+            self._redis.zadd(self.online_key, {user_id: latest[0][1]})
+            return False
+        return bool(self._redis.zrem(self.online_key, user_id))
+
+    def online(self, user_ids, can_call=False):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        now = time.time()
+        if can_call:
+            # Any call-capable channel that has not expired
+            pipe = self._redis.pipeline()
+            for user_id in user_ids:
+                pipe.zcount(self._call_key(user_id), f'({now}', '+inf')
+            return {user_id for user_id, count in zip(user_ids, pipe.execute()) if count}
+        scores = self._redis.zmscore(self.online_key, user_ids)
+        return {user_id for user_id, score in zip(user_ids, scores) if score is not None and score > now}
+
+    def expire(self):
+        now = time.time()
+        expired = self._redis.zrangebyscore(self.online_key, '-inf', now)
+        offline = []
+        for member in expired:
+            # Only the worker whose ZREM succeeds reports the user offline
+            if self._redis.zrem(self.online_key, member):
+                offline.append(int(member))
+        return offline
+
+
+def get_presence_ttl():
+    return getattr(settings, 'PRESENCE_TTL', 90)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_presence_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            redis_url = getattr(settings, 'REDIS_URL', '')
+            if redis_url:
+                _store = RedisPresenceStore(get_presence_ttl(), redis_url)
+            else:
+                _store = MemoryPresenceStore(get_presence_ttl())
+        return _store
+
+
+def get_online_user_ids(user_ids, can_call=False):
+    """The subset of user_ids that is currently online (with a socket that can ring, if can_call)"""
+    return get_presence_store().online(user_ids, can_call)
+
+
+def get_contact_ids(user_id):
+    """Users with an accepted connection to user_id"""
+    from .models import Connection
+    rows = Connection.objects.filter(
+        Q(from_user_id=user_id) | Q(to_user_id=user_id), status='accepted'
+    ).values_list('from_user_id', 'to_user_id')
+    return {to_id if from_id == user_id else from_id for from_id, to_id in rows}
+
+
+def publish_presence(user_id, online):
+    """Push a presence diff for user_id to their contacts' open sockets"""
+    event = {'type': 'presence.update', 'user_id': user_id, 'online': online}
+    for contact_id in get_contact_ids(user_id):
+        publish_to_group(presence_group_name(contact_id), event)
+
+
+_last_sweep = 0.0
+
+
+def sweep_expired_presence():
+    """Report users whose sockets died without disconnecting; throttled to once per TTL/3"""
+    global _last_sweep
+    now = time.time()
+    if now - _last_sweep < get_presence_ttl() / 3:
+        return
+    _last_sweep = now
+    for user_id in get_presence_store().expire():
+        publish_presence(user_id, False)
+
+
+def connection_opened(user_id, channel_name, can_call=False):
+    if get_presence_store().touch(user_id, channel_name, can_call):
+        publish_presence(user_id, True)
+
+
+def connection_heartbeat(user_id, channel_name, can_call=False):
+    connection_opened(user_id, channel_name, can_call)
+    sweep_expired_presence()
+
+
+def connection_closed(user_id, channel_name):
+    if get_presence_store().remove(user_id, channel_name):
+        publish_presence(user_id, False)
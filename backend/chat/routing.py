@@ -3,4 +3,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/call/(?P<user_id>\w+)/$', consumers.CallConsumer.as_asgi()),
+    re_path(r'ws/chat/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/realtime/$', consumers.RealtimeConsumer.as_asgi()),
 ]
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Message, Connection
+from .models import Message, Connection, Notification
 from accounts.serializers import UserDetailSerializer
 
 
@@ -29,3 +29,12 @@ class ConversationSerializer(serializers.Serializer):
     user = UserDetailSerializer()
     last_message = MessageSerializer()
     unread_count = serializers.IntegerField()
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    actor = UserDetailSerializer(read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = ['id', 'actor', 'kind', 'object_id', 'data', 'is_read', 'created_at']
+        read_only_fields = fields
@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from config.view_cache import invalidate_user_cache
+from accounts.models import User
+from .models import Connection, Message, Notification
+from .notifications import recount_and_publish
+
+
+@receiver([post_save, post_delete], sender=Connection)
+def invalidate_connected_users_cache(sender, instance, **kwargs):
+    invalidate_user_cache('connected_users', instance.from_user_id, instance.to_user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_partners_connected_users_cache(sender, instance, created, **kwargs):
+    # A user's details appear in the connected-users list of each of their partners
+    if created:
+        return
+    partner_ids = set()
+    for from_user_id, to_user_id in Connection.objects.filter(
+        Q(from_user=instance) | Q(to_user=instance), status='accepted'
+    ).values_list('from_user_id', 'to_user_id'):
+        partner_ids.add(to_user_id if from_user_id == instance.pk else from_user_id)
+    invalidate_user_cache('connected_users', *partner_ids)
+
+
+@receiver(pre_delete, sender=User)
+def recount_counters_on_user_delete(sender, instance, **kwargs):
+    # The cascade removes unread messages, pending requests and notifications
+    # that other users' counters include; recount those users once it commits
+    affected = set(Message.objects.filter(sender=instance, is_read=False).values_list('receiver_id', flat=True))
+    affected.update(Connection.objects.filter(from_user=instance, status='pending').values_list('to_user_id', flat=True))
+    affected.update(Notification.objects.filter(actor=instance, is_read=False).values_list('user_id', flat=True))
+    affected.discard(instance.pk)
+    if affected:
+        transaction.on_commit(lambda: recount_and_publish(affected))
@@ -1,3 +1,472 @@
-from django.test import TestCase
+import json
+import os
+from unittest import skipUnless
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from accounts.models import User
+from config.asgi import application
+from . import calls
+from .calls import ACTIVE, RINGING, CallStoreBusy, MemoryCallStore, RedisCallStore
+from .consumers import MAX_ICE_BATCH
+from .models import Connection, Message, Conversation, NotificationCounter
+from .notifications import recount_counters
+from .presence import MemoryPresenceStore
+from .views import MAX_BULK_STATUS_USERS
 
-# Create your tests here.
+
+class FastReadPathTests(TestCase):
+    """The values()-based read path must return exactly what the serializers return"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='password',
+            profile_image='profile_images/reader.png'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.partners = [
+            User.objects.create(username=f'partner{i}', email=f'partner{i}@example.com', first_name='Partner',
+                                profile_image='profile_images/partner.png' if i else '')
+            for i in range(3)
+        ]
+        for i, partner in enumerate(self.partners):
+            for n in range(i + 2):
+                sender, receiver = (partner, self.user) if n % 2 else (self.user, partner)
+                message = Message.objects.create(sender=sender, receiver=receiver, content=f'message {n} ✓')
+                Conversation.record_message(message)
+
+    def assertSameOutput(self, url):
+        with override_settings(FAST_READ_PATHS=False):
+            reference = self.client.get(url)
+        fast = self.client.get(url)
+        self.assertEqual(reference.status_code, 200)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, reference.content)
+
+    def test_conversations(self):
+        self.assertSameOutput('/api/messages/conversations/')
+
+    def test_conversations_paginated(self):
+        self.assertSameOutput('/api/messages/conversations/?page_size=2')
+
+    def test_messages(self):
+        partner = self.partners[2]
+        # Opening the conversation marks messages read; compare once that has happened
+        self.client.get(f'/api/messages/conversation/{partner.id}/')
+        self.assertSameOutput(f'/api/messages/conversation/{partner.id}/')
+        self.assertSameOutput(f'/api/messages/conversation/{partner.id}/?limit=2')
+
+
+class PresenceStoreTests(SimpleTestCase):
+    def test_only_call_capable_sockets_can_ring(self):
+        store = MemoryPresenceStore(ttl=60)
+        self.assertTrue(store.touch(1, 'chat-socket'))
+        self.assertEqual(store.online([1]), {1})
+        self.assertEqual(store.online([1], can_call=True), set())
+
+        self.assertFalse(store.touch(1, 'realtime-socket', can_call=True))
+        self.assertEqual(store.online([1], can_call=True), {1})
+
+        # The chat socket keeps the user online, but nothing can ring anymore
+        self.assertFalse(store.remove(1, 'realtime-socket'))
+        self.assertEqual(store.online([1]), {1})
+        self.assertEqual(store.online([1], can_call=True), set())
+
+
+class NotificationCounterTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', email='alice@example.com')
+        self.bob = User.objects.create(username='bob', email='bob@example.com')
+        self.client = APIClient()
+
+    def send(self, sender, receiver, content='hi'):
+        self.client.force_authenticate(sender)
+        response = self.client.post('/api/messages/send/', {'receiver_id': receiver.id, 'content': content})
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def read(self, reader, other):
+        self.client.force_authenticate(reader)
+        self.client.get(f'/api/messages/conversation/{other.id}/')
+
+    def counts(self, user):
+        return NotificationCounter.counts_for(user.id)
+
+    def test_messages_are_counted_until_read(self):
+        self.send(self.alice, self.bob)
+        self.send(self.alice, self.bob)
+        self.assertEqual(self.counts(self.bob), {
+            'unread_messages': 2, 'pending_connection_requests': 0, 'unread_notifications': 1,
+        })
+        self.read(self.bob, self.alice)
+        self.assertEqual(self.counts(self.bob), {
+            'unread_messages': 0, 'pending_connection_requests': 0, 'unread_notifications': 0,
+        })
+
+    def test_reading_own_messages_does_not_change_counts(self):
+        self.send(self.bob, self.alice)
+        self.send(self.alice, self.alice)
+        self.read(self.alice, self.alice)
+        self.assertEqual(self.counts(self.alice)['unread_messages'], 1)
+
+    def test_deleting_an_account_recounts_other_users(self):
+        self.send(self.alice, self.bob)
+        self.client.force_authenticate(self.alice)
+        self.client.post('/api/messages/connections/send/', {'to_user_id': self.bob.id})
+        self.assertEqual(self.counts(self.bob), {
+            'unread_messages': 1, 'pending_connection_requests': 1, 'unread_notifications': 2,
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.delete()
+        self.assertEqual(self.counts(self.bob), {
+            'unread_messages': 0, 'pending_connection_requests': 0, 'unread_notifications': 0,
+        })
+
+    def test_an_older_message_does_not_replace_the_preview(self):
+        older = Message.objects.create(sender=self.alice, receiver=self.bob, content='first')
+        newer = Message.objects.create(sender=self.alice, receiver=self.bob, content='second')
+        # As if the older send committed last
+        Conversation.record_message(newer)
+        Conversation.record_message(older)
+
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation.last_message_id, newer.id)
+        self.assertEqual(conversation.last_message_at, newer.created_at)
+        self.assertEqual(conversation.unread_count_for(self.bob), 2)
+
+    def test_recount_repairs_drift(self):
+        self.send(self.alice, self.bob)
+        self.send(self.bob, self.alice)
+        expected = {user.id: self.counts(user) for user in (self.alice, self.bob)}
+        NotificationCounter.objects.update(unread_messages=7, unread_notifications=0)
+        Conversation.objects.update(user1_unread_count=5)
+
+        self.assertEqual(recount_counters(), 2)
+        self.assertEqual({user.id: self.counts(user) for user in (self.alice, self.bob)}, expected)
+        conversation = Conversation.objects.get()
+        self.assertEqual((conversation.user1_unread_count, conversation.user2_unread_count), (1, 1))
+
+
+class MessageHistoryTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create(username='alice', email='alice@example.com')
+        self.bob = User.objects.create(username='bob', email='bob@example.com')
+        self.ids = [
+            Message.objects.create(sender=self.alice, receiver=self.bob, content=f'message {n}').id
+            for n in range(7)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def fetch_ids(self, query):
+        response = self.client.get(f'/api/messages/conversation/{self.alice.id}/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [message['id'] for message in response.data]
+
+    def test_limit_returns_the_newest_messages(self):
+        self.assertEqual(self.fetch_ids('limit=3'), self.ids[-3:])
+        self.assertEqual(self.fetch_ids(f'before={self.ids[5]}&limit=2'), self.ids[3:5])
+
+    def test_since_with_limit_pages_forward_without_gaps(self):
+        for fast in (True, False):
+            with self.subTest(fast=fast), override_settings(FAST_READ_PATHS=fast):
+                seen = []
+                since = self.ids[0]
+                while True:
+                    page = self.fetch_ids(f'since={since}&limit=3')
+                    seen += page
+                    if len(page) < 3:
+                        break
+                    since = page[-1]
+                self.assertEqual(seen, self.ids[1:])
+
+
+class ConnectionStatusTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='me', email='me@example.com')
+        self.others = [User.objects.create(username=f'other{n}', email=f'other{n}@example.com') for n in range(5)]
+        Connection.objects.create(from_user=self.user, to_user=self.others[0])
+        Connection.objects.create(from_user=self.others[1], to_user=self.user)
+        Connection.objects.create(from_user=self.user, to_user=self.others[2], status='accepted')
+        Connection.objects.create(from_user=self.others[3], to_user=self.user, status='rejected')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, user_ids):
+        return self.client.get('/api/messages/connections/status/', {'user_ids': user_ids})
+
+    def test_bulk_statuses_match_the_single_user_endpoint(self):
+        response = self.bulk(','.join(str(other.id) for other in self.others))
+        self.assertEqual(response.status_code, 200)
+        statuses = response.json()
+        self.assertEqual(len(statuses), len(self.others))
+        for other in self.others:
+            single = self.client.get(f'/api/messages/connections/status/{other.id}/')
+            self.assertEqual(statuses[str(other.id)], single.json(), other.username)
+
+    def test_bulk_ids_are_deduplicated_and_blanks_ignored(self):
+        statuses = self.bulk(f' {self.others[0].id}, ,{self.others[0].id},').json()
+        self.assertEqual(list(statuses), [str(self.others[0].id)])
+        self.assertEqual(self.bulk('').json(), {})
+
+    def test_malformed_ids_are_rejected(self):
+        for user_ids in ('abc', '1,two', '1;2', '1.5'):
+            with self.subTest(user_ids=user_ids):
+                self.assertEqual(self.bulk(user_ids).status_code, 400)
+
+    def test_at_most_200_ids_per_request(self):
+        first_id = self.others[-1].id + 1
+        ids = range(first_id, first_id + MAX_BULK_STATUS_USERS)
+        response = self.bulk(','.join(map(str, ids)))
+        self.assertEqual(response.status_code, 200)
+        statuses = response.json()
+        self.assertEqual(len(statuses), MAX_BULK_STATUS_USERS)
+        self.assertTrue(all(value == {'status': 'none'} for value in statuses.values()))
+
+        response = self.bulk(','.join(map(str, range(first_id, first_id + MAX_BULK_STATUS_USERS + 1))))
+        self.assertEqual(response.status_code, 400)
+
+
+class CallStoreScenarios:
+    """Session transitions every call store must implement the same way
+
+    Mixed into a test case that defines make_store(ring_timeout, active_ttl).
+    """
+
+    def test_offer_answer_end(self):
+        store = self.make_store()
+        session = store.offer(1, 2)
+        self.assertEqual(session.state, RINGING)
+        # The callee is ringing, so a third user gets a busy rejection
+        self.assertIsNone(store.offer(3, 2))
+        self.assertEqual(store.offer(1, 2).call_id, session.call_id)
+
+        self.assertEqual(store.answer(2, 1).state, ACTIVE)
+        self.assertIsNone(store.end(3))
+        self.assertEqual(store.end(2).call_id, session.call_id)
+        self.assertIsNone(store.current(1))
+        self.assertIsNotNone(store.offer(3, 2))
+
+    def test_unanswered_calls_expire(self):
+        store = self.make_store(ring_timeout=0)
+        session = store.offer(1, 2)
+        self.assertEqual([expired.call_id for expired in store.expire()], [session.call_id])
+        self.assertIsNone(store.answer(2, 1))
+        self.assertEqual(store.expire(), [])
+
+
+class MemoryCallStoreTests(CallStoreScenarios, SimpleTestCase):
+    def make_store(self, ring_timeout=45, active_ttl=120):
+        return MemoryCallStore(ring_timeout, active_ttl)
+
+
+REDIS_TEST_URL = os.environ.get('REDIS_TEST_URL', 'redis://localhost:6379/15')
+
+
+def _redis_available():
+    try:
+        import redis
+        return redis.Redis.from_url(REDIS_TEST_URL, socket_connect_timeout=0.5).ping()
+    except Exception:
+        return False
+
+
+@skipUnless(_redis_available(), f'needs a Redis server at {REDIS_TEST_URL} (set REDIS_TEST_URL)')
+class RedisCallStoreTests(CallStoreScenarios, SimpleTestCase):
+    def make_store(self, ring_timeout=45, active_ttl=120):
+        return RedisCallStore(ring_timeout, active_ttl, REDIS_TEST_URL)
+
+    def tearDown(self):
+        client = self.make_store()._redis
+        keys = list(client.scan_iter('call:*'))
+        if keys:
+            client.delete(*keys)
+
+    def test_offer_times_out_on_a_held_lock(self):
+        store = self.make_store()
+        store.lock_timeout = 0.2
+        with store._redis.lock(store._lock_key(2), timeout=5):
+            with self.assertRaises(CallStoreBusy):
+                store.offer(1, 2)
+            # Users not involved are not held up
+            self.assertIsNotNone(store.offer(3, 4))
+
+
+@override_settings(CALL_SIGNALING_RELAY='direct', CALL_LOG_WRITES='sync')
+class RealtimeSocketTestCase(TransactionTestCase):
+    """Talks to the consumers through the ASGI application, token auth included"""
+
+    def setUp(self):
+        calls._store = MemoryCallStore(45, 120)
+        self.addCleanup(setattr, calls, '_store', None)
+        self.communicators = []
+
+    def make_user(self, username):
+        user = User.objects.create(username=username, email=f'{username}@example.com')
+        return user, Token.objects.create(user=user).key
+
+    async def connect(self, path, headers=None):
+        communicator = WebsocketCommunicator(application, path, headers=headers or [])
+        connected, _ = await communicator.connect()
+        if connected:
+            self.communicators.append(communicator)
+        return communicator, connected
+
+    async def disconnect_all(self):
+        while self.communicators:
+            await self.communicators.pop().disconnect()
+
+    async def open_realtime(self, token):
+        communicator, connected = await self.connect(f'/ws/realtime/?token={token}')
+        self.assertTrue(connected)
+        return communicator
+
+    async def send_call(self, communicator, **frame):
+        await communicator.send_to(text_data=json.dumps({'channel': 'call', **frame}))
+
+    async def receive_call(self, communicator):
+        while True:
+            frame = await communicator.receive_json_from()
+            if frame.get('channel') == 'call':
+                return frame
+
+
+class CallSignalingSocketTests(RealtimeSocketTestCase):
+    def setUp(self):
+        super().setUp()
+        self.caller, self.caller_token = self.make_user('caller')
+        self.callee, self.callee_token = self.make_user('callee')
+        self.intruder, self.intruder_token = self.make_user('intruder')
+
+    async def start_call(self):
+        caller = await self.open_realtime(self.caller_token)
+        callee = await self.open_realtime(self.callee_token)
+        await self.send_call(caller, type='call-offer', recipient_id=self.callee.id, offer={'sdp': 'offer'})
+        self.assertEqual((await self.receive_call(callee))['type'], 'call-offer')
+        await self.send_call(callee, type='call-answer', caller_id=self.caller.id, answer={'sdp': 'answer'})
+        self.assertEqual((await self.receive_call(caller))['type'], 'call-answer')
+        return caller, callee
+
+    async def test_third_party_cannot_end_or_join_a_call(self):
+        caller, callee = await self.start_call()
+        intruder = await self.open_realtime(self.intruder_token)
+
+        await self.send_call(intruder, type='call-end', peer_id=self.callee.id)
+        await self.send_call(intruder, type='ice-candidate', peer_id=self.callee.id, candidate={'c': 1})
+        self.assertTrue(await callee.receive_nothing())
+        self.assertTrue(await caller.receive_nothing())
+        self.assertEqual(calls.get_call_store().current(self.callee.id).state, ACTIVE)
+
+        # The participants themselves still reach each other
+        await self.send_call(caller, type='ice-candidate', peer_id=self.callee.id, candidate={'c': 2})
+        self.assertEqual((await self.receive_call(callee))['candidate'], {'c': 2})
+        await self.send_call(caller, type='call-end', peer_id=self.callee.id)
+        self.assertEqual((await self.receive_call(callee))['type'], 'call-end')
+        self.assertIsNone(calls.get_call_store().current(self.callee.id))
+        await self.disconnect_all()
+
+    async def test_malformed_peer_ids_are_dropped(self):
+        caller, callee = await self.start_call()
+        for frame in (
+            {'type': 'call-end', 'peer_id': 'a b c!'},
+            {'type': 'ice-candidate', 'peer_id': 'a b c!', 'candidate': {}},
+            {'type': 'call-answer', 'caller_id': 'a b c!', 'answer': {}},
+        ):
+            await self.send_call(caller, **frame)
+        self.assertTrue(await callee.receive_nothing())
+
+        # The consumer survived the frames
+        await self.send_call(caller, type='call-end', peer_id=self.callee.id)
+        self.assertEqual((await self.receive_call(callee))['type'], 'call-end')
+        await self.disconnect_all()
+
+
+    @override_settings(WEBSOCKET_RATE_LIMIT=0, WEBSOCKET_RATE_BURST=3)
+    async def test_rate_limit_spares_call_control_frames(self):
+        caller, callee = await self.start_call()
+        for n in range(5):
+            await self.send_call(caller, type='ice-candidate', peer_id=self.callee.id, candidate={'c': n})
+        await self.send_call(caller, type='call-end', peer_id=self.callee.id)
+
+        received = [await self.receive_call(callee) for _ in range(4)]
+        self.assertEqual([frame.get('candidate') for frame in received[:3]], [{'c': 0}, {'c': 1}, {'c': 2}])
+        self.assertEqual(received[3]['type'], 'call-end')
+        self.assertTrue(await callee.receive_nothing())
+        await self.disconnect_all()
+
+    @override_settings(WEBSOCKET_MAX_MESSAGE_SIZE=200)
+    async def test_oversized_frames_are_dropped(self):
+        caller, callee = await self.start_call()
+        await self.send_call(caller, type='ice-candidate', peer_id=self.callee.id, candidate={'c': 'x' * 300})
+        self.assertTrue(await callee.receive_nothing())
+        await self.send_call(caller, type='ice-candidate', peer_id=self.callee.id, candidate={'c': 1})
+        self.assertEqual((await self.receive_call(callee))['candidate'], {'c': 1})
+        await self.disconnect_all()
+
+    @override_settings(CALL_SIGNALING_RELAY='batched', CALL_ICE_BATCH_WINDOW_MS=60000)
+    async def test_batched_ice_is_flushed_before_call_end(self):
+        caller, callee = await self.start_call()
+        for n in range(3):
+            await self.send_call(caller, type='ice-candidate', peer_id=self.callee.id, candidate={'c': n})
+        # Held back until the window closes or another call frame goes out
+        self.assertTrue(await callee.receive_nothing())
+
+        await self.send_call(caller, type='call-end', peer_id=self.callee.id)
+        received = [await self.receive_call(callee) for _ in range(4)]
+        self.assertEqual([frame.get('candidate') for frame in received[:3]], [{'c': 0}, {'c': 1}, {'c': 2}])
+        self.assertEqual(received[3]['type'], 'call-end')
+        await self.disconnect_all()
+
+    @override_settings(CALL_SIGNALING_RELAY='batched', CALL_ICE_BATCH_WINDOW_MS=60000)
+    async def test_full_ice_batch_is_flushed_early(self):
+        caller, callee = await self.start_call()
+        for n in range(MAX_ICE_BATCH):
+            await self.send_call(caller, type='ice-candidate', peer_id=self.callee.id, candidate={'c': n})
+        received = [await self.receive_call(callee) for _ in range(MAX_ICE_BATCH)]
+        self.assertEqual([frame['candidate']['c'] for frame in received], list(range(MAX_ICE_BATCH)))
+        await self.disconnect_all()
+
+
+class SocketAuthTests(RealtimeSocketTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.token = self.make_user('socketuser')
+        self.other, self.other_token = self.make_user('otheruser')
+
+    async def assertRejected(self, path, headers=None):
+        _, connected = await self.connect(path, headers)
+        self.assertFalse(connected)
+
+    async def test_missing_token_is_rejected(self):
+        await self.assertRejected('/ws/realtime/')
+        await self.assertRejected('/ws/chat/')
+        await self.assertRejected(f'/ws/call/{self.user.id}/')
+
+    async def test_bad_token_is_rejected(self):
+        await self.assertRejected('/ws/realtime/?token=not-a-token')
+        await self.assertRejected('/ws/realtime/', headers=[(b'authorization', b'Token not-a-token')])
+
+    async def test_revoked_token_is_rejected(self):
+        communicator, connected = await self.connect(f'/ws/realtime/?token={self.token}')
+        self.assertTrue(connected)
+        await self.disconnect_all()
+
+        await Token.objects.filter(key=self.token).adelete()
+        await self.assertRejected(f'/ws/realtime/?token={self.token}')
+
+    async def test_call_socket_must_match_the_token_user(self):
+        await self.assertRejected(f'/ws/call/{self.other.id}/?token={self.token}')
+        await self.assertRejected(f'/ws/call/abc/?token={self.token}')
+        _, connected = await self.connect(f'/ws/call/{self.user.id}/?token={self.token}')
+        self.assertTrue(connected)
+        await self.disconnect_all()
+
+    async def test_token_in_query_string_or_header_is_accepted(self):
+        _, connected = await self.connect(f'/ws/chat/?token={self.token}')
+        self.assertTrue(connected)
+        _, connected = await self.connect(
+            '/ws/chat/', headers=[(b'authorization', f'Token {self.token}'.encode())]
+        )
+        self.assertTrue(connected)
+        await self.disconnect_all()
@@ -7,8 +7,13 @@ urlpatterns = [
     path('send/', views.send_message, name='send_message'),
     path('connections/send/', views.send_connection_request, name='send_connection_request'),
     path('connections/<int:connection_id>/respond/', views.respond_connection_request, name='respond_connection_request'),
+    path('connections/status/', views.get_connection_statuses, name='get_connection_statuses'),
     path('connections/status/<int:user_id>/', views.get_connection_status, name='get_connection_status'),
+    path('presence/', views.get_presence, name='get_presence'),
     path('connections/pending/', views.get_pending_requests, name='get_pending_requests'),
     path('connections/connected/', views.get_connected_users, name='get_connected_users'),
+    path('notifications/', views.get_notifications, name='get_notifications'),
+    path('notifications/counts/', views.get_notification_counts, name='get_notification_counts'),
+    path('notifications/read/', views.read_notifications, name='read_notifications'),
     path('connections/disconnect/<int:user_id>/', views.disconnect_user, name='disconnect_user'),
 ]
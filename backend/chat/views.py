@@ -1,71 +1,165 @@
-from django.db.models import Q, Max, Count, Subquery, OuterRef
+from django.db import transaction
+from django.db.models import Q, Max
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from .models import Message, Connection
-from .serializers import MessageSerializer, ConversationSerializer, ConnectionSerializer
+from .models import Message, Connection, Conversation, Notification, NotificationCounter
+from .serializers import MessageSerializer, ConversationSerializer, ConnectionSerializer, NotificationSerializer
+from .events import publish_message, publish_read_receipt
+from .notifications import (
+    notify_message, notify_connection_request, notify_connection_response,
+    mark_messages_read, mark_notifications_read,
+)
+from .presence import get_online_user_ids
+from .fast_read import CONVERSATION_FIELDS, MESSAGE_FIELDS, conversation_rows, message_rows
+from accounts.fast_read import fast_read_enabled, user_detail_from_instance
+from accounts.media_urls import MediaURLResolver
 from accounts.models import User
+from accounts.pagination import KeysetPagination
+from config.view_cache import cached_user_response
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_conversations(request):
-    """Get list of all conversations with last message and unread count"""
-    user = request.user
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
 
-    # Get all users the current user has had conversations with
-    conversation_users = User.objects.filter(
-        Q(sent_messages__receiver=user) | Q(received_messages__sender=user)
-    ).distinct()
 
-    conversations = []
-    for other_user in conversation_users:
-        # Get last message between users
-        last_message = Message.objects.filter(
-            Q(sender=user, receiver=other_user) | Q(sender=other_user, receiver=user)
-        ).order_by('-created_at').first()
+class InboxPagination(KeysetPagination):
+    ordering_fields = ('last_message_at', 'id')
 
-        # Count unread messages from other user
-        unread_count = Message.objects.filter(
-            sender=other_user,
-            receiver=user,
-            is_read=False
-        ).count()
 
-        if last_message:
-            conversations.append({
-                'user': other_user,
-                'last_message': last_message,
-                'unread_count': unread_count
-            })
+def _int_param(request, name):
+    value = request.query_params.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
 
-    # Sort by last message time
-    conversations.sort(key=lambda x: x['last_message'].created_at, reverse=True)
 
-    serializer = ConversationSerializer(conversations, many=True, context={'request': request})
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_conversations(request):
+    """Get list of all conversations with last message and unread count"""
+    user = request.user
+
+    # Read straight from the denormalized Conversation rows
+    conversations = Conversation.for_user(user).filter(
+        last_message__isnull=False
+    ).order_by('-last_message_at', '-id')
+    fast = fast_read_enabled()
+    if fast:
+        conversations = conversations.values(*CONVERSATION_FIELDS)
+    else:
+        conversations = conversations.select_related(
+            'user1', 'user2', 'last_message__sender', 'last_message__receiver'
+        )
+
+    # Optional keyset pagination: ?page_size=N&cursor=<next_cursor>
+    paginator = None
+    if InboxPagination.is_requested(request):
+        paginator = InboxPagination()
+        conversations = paginator.paginate_queryset(conversations, request)
+
+    if fast:
+        data = conversation_rows(conversations, user, MediaURLResolver.for_request(request))
+        if paginator:
+            return paginator.get_paginated_response(data)
+        return Response(data)
+
+    inbox = [
+        {
+            'user': conversation.other_user(user),
+            'last_message': conversation.last_message,
+            'unread_count': conversation.unread_count_for(user),
+        }
+        for conversation in conversations
+    ]
+
+    serializer = ConversationSerializer(inbox, many=True, context={'request': request})
+    if paginator:
+        return paginator.get_paginated_response(serializer.data)
     return Response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_messages(request, user_id):
-    """Get all messages between current user and another user"""
+    """
+    Get messages between current user and another user, oldest first.
+
+    Optional query parameters:
+      since=<id>   only messages newer than the given message id (polling deltas)
+      before=<id>  only messages older than the given message id (backfill)
+      limit=<n>    return at most n messages: the most recent ones, or with
+                   `since` the oldest ones, so a client pages forward by
+                   passing the last returned id as the next `since` until a
+                   page comes back shorter than `limit`
+    Without parameters the full history is returned.
+    """
     try:
         other_user = User.objects.get(id=user_id)
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    try:
+        since = _int_param(request, 'since')
+        before = _int_param(request, 'before')
+        limit = _int_param(request, 'limit')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     messages = Message.objects.filter(
         Q(sender=request.user, receiver=other_user) | Q(sender=other_user, receiver=request.user)
-    ).order_by('created_at')
+    )
+    if since is not None:
+        messages = messages.filter(id__gt=since)
+    if before is not None:
+        messages = messages.filter(id__lt=before)
+    if before is not None and limit is None:
+        limit = MESSAGE_PAGE_SIZE
 
     # Mark messages from other user as read
-    Message.objects.filter(
-        sender=other_user,
-        receiver=request.user,
-        is_read=False
-    ).update(is_read=True)
+    with transaction.atomic():
+        unread = Message.objects.filter(
+            sender=other_user,
+            receiver=request.user,
+            is_read=False
+        )
+        last_read_id = unread.aggregate(last_id=Max('id'))['last_id']
+        if last_read_id is not None:
+            read_count = unread.filter(id__lte=last_read_id).update(is_read=True)
+            Conversation.mark_read(request.user, other_user)
+            mark_messages_read(request.user.id, other_user.id, read_count)
+            publish_read_receipt(request.user.id, other_user.id, last_read_id)
+
+    fast = fast_read_enabled()
+    if fast:
+        # Only two users can appear, so their details are built once
+        messages = messages.values(*MESSAGE_FIELDS)
+    else:
+        messages = messages.select_related('sender', 'receiver')
+
+    if limit is not None and since is not None:
+        # Page forward from `since` without skipping anything in between
+        limit = max(1, min(limit, MAX_MESSAGE_PAGE_SIZE))
+        messages = messages.order_by('id')[:limit]
+    elif limit is not None:
+        # Take the newest `limit` messages, then return them oldest first
+        limit = max(1, min(limit, MAX_MESSAGE_PAGE_SIZE))
+        page = messages.order_by('-created_at', '-id')[:limit]
+        messages = list(reversed(page))
+    else:
+        messages = messages.order_by('created_at', 'id')
+
+    if fast:
+        urls = MediaURLResolver.for_request(request)
+        users = {
+            request.user.id: user_detail_from_instance(request.user, urls),
+            other_user.id: user_detail_from_instance(other_user, urls),
+        }
+        return Response(message_rows(messages, users))
 
     serializer = MessageSerializer(messages, many=True, context={'request': request})
     return Response(serializer.data)
@@ -77,7 +171,11 @@ def send_message(request):
     """Send a new message"""
     serializer = MessageSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save(sender=request.user)
+        with transaction.atomic():
+            message = serializer.save(sender=request.user)
+            Conversation.record_message(message)
+            notify_message(message, request)
+            publish_message(serializer.data, message.sender_id, message.receiver_id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -105,7 +203,9 @@ def send_connection_request(request):
         return Response({'error': 'Connection request already exists', 'connection': ConnectionSerializer(existing, context={'request': request}).data}, status=status.HTTP_400_BAD_REQUEST)
 
     # Create new connection request
-    connection = Connection.objects.create(from_user=request.user, to_user=to_user)
+    with transaction.atomic():
+        connection = Connection.objects.create(from_user=request.user, to_user=to_user)
+        notify_connection_request(connection, request)
     return Response(ConnectionSerializer(connection, context={'request': request}).data, status=status.HTTP_201_CREATED)
 
 
@@ -120,6 +220,7 @@ def respond_connection_request(request, connection_id):
     except Connection.DoesNotExist:
         return Response({'error': 'Connection request not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    previous_status = connection.status
     if action == 'accept':
         connection.status = 'accepted'
     elif action == 'reject':
@@ -127,7 +228,10 @@ def respond_connection_request(request, connection_id):
     else:
         return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
 
-    connection.save()
+    with transaction.atomic():
+        connection.save()
+        if connection.status != previous_status:
+            notify_connection_response(connection, previous_status, request)
 
     # Return connection data with both user names
     response_data = ConnectionSerializer(connection, context={'request': request}).data
@@ -162,6 +266,62 @@ def get_connection_status(request, user_id):
     return Response({'status': 'none'})
 
 
+MAX_BULK_STATUS_USERS = 200
+
+
+def _user_ids_param(request):
+    """Parse ?user_ids=1,2,3 into a set; returns (user_ids, error response or None)"""
+    try:
+        user_ids = {
+            int(user_id) for user_id in request.query_params.get('user_ids', '').split(',')
+            if user_id.strip()
+        }
+    except ValueError:
+        return None, Response({'error': 'user_ids must be a comma-separated list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(user_ids) > MAX_BULK_STATUS_USERS:
+        return None, Response({'error': f'At most {MAX_BULK_STATUS_USERS} user_ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+    return user_ids, None
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_connection_statuses(request):
+    """Get connection status with many users at once: ?user_ids=1,2,3"""
+    user_ids, error = _user_ids_param(request)
+    if error:
+        return error
+
+    # Resolve every status with a single query
+    connections = Connection.objects.filter(
+        Q(from_user=request.user, to_user_id__in=user_ids) | Q(from_user_id__in=user_ids, to_user=request.user)
+    ).select_related('from_user', 'to_user')
+
+    statuses = {user_id: {'status': 'none'} for user_id in user_ids}
+    for connection in connections:
+        is_sender = connection.from_user_id == request.user.id
+        other_id = connection.to_user_id if is_sender else connection.from_user_id
+        statuses[other_id] = {
+            'status': connection.status,
+            'is_sender': is_sender,
+            'connection': ConnectionSerializer(connection, context={'request': request}).data
+        }
+
+    return Response(statuses)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_presence(request):
+    """Which of many users are online right now: ?user_ids=1,2,3"""
+    user_ids, error = _user_ids_param(request)
+    if error:
+        return error
+
+    online = get_online_user_ids(user_ids)
+    return Response({user_id: user_id in online for user_id in user_ids})
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_pending_requests(request):
@@ -174,13 +334,17 @@ def get_pending_requests(request):
 @permission_classes([IsAuthenticated])
 def get_connected_users(request):
     """Get all users that are connected with the current user (accepted connections)"""
+    return cached_user_response('connected_users', request, lambda: _connected_users_response(request))
+
+
+def _connected_users_response(request):
     from accounts.serializers import UserSerializer
 
     # Get all accepted connections where user is either sender or receiver
     connections = Connection.objects.filter(
         Q(from_user=request.user, status='accepted') |
         Q(to_user=request.user, status='accepted')
-    )
+    ).select_related('from_user', 'to_user')
 
     # Extract the other user from each connection
     connected_users = []
@@ -218,3 +382,34 @@ def disconnect_user(request, user_id):
         'message': f'Successfully disconnected from {connection_user_name}',
         'user_name': connection_user_name
     }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_notifications(request):
+    """Get the user's notifications, newest first (?page_size=N&cursor=<next_cursor>)"""
+    notifications = Notification.objects.filter(user=request.user).select_related('actor')
+    paginator = KeysetPagination()
+    notifications = paginator.paginate_queryset(notifications, request)
+    serializer = NotificationSerializer(notifications, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_notification_counts(request):
+    """Badge counts (unread messages, pending connection requests, unread notifications)"""
+    return Response(NotificationCounter.counts_for(request.user.id))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def read_notifications(request):
+    """Mark notifications read: {"ids": [1, 2]} for some, no body for all"""
+    ids = request.data.get('ids')
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return Response({'error': 'ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    count = mark_notifications_read(request.user.id, ids)
+    return Response({'marked_read': count, **NotificationCounter.counts_for(request.user.id)})
@@ -0,0 +1,90 @@
+"""
+JSON encoding and decoding with orjson when it is installed, falling back
+to the standard library otherwise (or when settings.FAST_JSON is False).
+
+Used for WebSocket frames (chat/consumers.py) and, through FastJSONRenderer
+and FastJSONParser, as REST_FRAMEWORK's default renderer and parser.
+Output matches DRF's JSONRenderer: compact, UTF-8, non-string dict keys
+converted to strings and anything orjson cannot encode natively (Decimal,
+lazy translation strings, ...) handed to DRF's JSONEncoder.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def use_orjson():
+    return orjson is not None and getattr(settings, 'FAST_JSON', True)
+
+
+def _orjson_options(indent=None):
+    # Datetimes go through DRF's encoder, which formats them differently from orjson
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if indent:
+        options |= orjson.OPT_INDENT_2
+    return options
+
+
+def dumps_bytes(data, indent=None):
+    if use_orjson() and indent in (None, 2):
+        return orjson.dumps(data, default=_encoder.default, option=_orjson_options(indent))
+    return json.dumps(
+        data, cls=JSONEncoder, ensure_ascii=False, indent=indent,
+        separators=None if indent else (',', ':'),
+    ).encode()
+
+
+def dumps(data):
+    """Encode to a str (e.g. a WebSocket text frame)"""
+    return dumps_bytes(data).decode()
+
+
+def loads(data):
+    """Decode str or bytes"""
+    if use_orjson():
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson where possible"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        # orjson only indents by two spaces and has no ASCII-only or spaced-out mode
+        if not use_orjson() or indent not in (None, 2) or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = dumps_bytes(data, indent=indent)
+        # Same escaping as JSONRenderer, for JSON embedded in JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser that decodes with orjson where possible"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if not use_orjson() or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
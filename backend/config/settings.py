@@ -135,6 +135,13 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploaded post media is staged here until the media worker moves it to storage
+MEDIA_STAGING_ROOT = config('MEDIA_STAGING_ROOT', default=str(BASE_DIR / 'media_staging'))
+
+# How queued post media is processed: 'thread' (in-process worker),
+# 'sync' (right after the request commits) or 'external' (manage.py process_media)
+MEDIA_PROCESSING = config('MEDIA_PROCESSING', default='thread')
+
 # IMPORTANT: Media files in production
 # Note: Render uses an ephemeral filesystem, meaning uploaded files are deleted on redeploy.
 # For persistent storage, use cloud storage (AWS S3, Cloudinary, etc.) in production.
@@ -169,10 +176,23 @@ AUTH_USER_MODEL = 'accounts.User'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
+    ],
+    # orjson-backed when installed (see config/fast_json.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'config.fast_json.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'config.fast_json.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
+# Use orjson for REST and WebSocket JSON when installed; False forces the stdlib
+FAST_JSON = config('FAST_JSON', default=True, cast=bool)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
@@ -211,3 +231,70 @@ else:
             'BACKEND': 'channels.layers.InMemoryChannelLayer'
         }
     }
+
+# Django cache: shared Redis when available, otherwise a per-process LRU
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'swapit',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'swapit',
+            'OPTIONS': {
+                'MAX_ENTRIES': config('LOCAL_CACHE_MAX_ENTRIES', default=10000, cast=int),
+            },
+        }
+    }
+
+# Default lifetime of cached per-user API responses (see config/view_cache.py)
+VIEW_CACHE_TIMEOUT = config('VIEW_CACHE_TIMEOUT', default=300, cast=int)
+
+# Cache for authenticated tokens (see accounts/authentication.py)
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': config('TOKEN_AUTH_CACHE_SIZE', default=10000, cast=int),
+    'TTL': config('TOKEN_AUTH_CACHE_TTL', default=60, cast=int),
+    'REDIS_URL': REDIS_URL,
+}
+
+# Seconds a WebSocket stays "online" without a heartbeat (see chat/presence.py)
+PRESENCE_TTL = config('PRESENCE_TTL', default=90, cast=int)
+
+# Per-connection limits on incoming WebSocket frames (see chat/consumers.py)
+WEBSOCKET_MAX_MESSAGE_SIZE = config('WEBSOCKET_MAX_MESSAGE_SIZE', default=65536, cast=int)
+WEBSOCKET_RATE_LIMIT = config('WEBSOCKET_RATE_LIMIT', default=20, cast=int)  # frames per second
+WEBSOCKET_RATE_BURST = config('WEBSOCKET_RATE_BURST', default=100, cast=int)
+
+# 'batched' coalesces ICE candidates per peer over CALL_ICE_BATCH_WINDOW_MS
+# into one channel-layer event, 'direct' relays each candidate on its own
+CALL_SIGNALING_RELAY = config('CALL_SIGNALING_RELAY', default='batched')
+CALL_ICE_BATCH_WINDOW_MS = config('CALL_ICE_BATCH_WINDOW_MS', default=25, cast=int)
+
+# Call sessions (see chat/calls.py): unanswered offers stop ringing after
+# CALL_RING_TIMEOUT seconds; answered calls end CALL_ACTIVE_TTL seconds after
+# the participants' sockets stop heartbeating
+CALL_RING_TIMEOUT = config('CALL_RING_TIMEOUT', default=45, cast=int)
+CALL_ACTIVE_TTL = config('CALL_ACTIVE_TTL', default=120, cast=int)
+# 'thread' writes CallLog rows on a background thread, 'sync' immediately
+CALL_LOG_WRITES = config('CALL_LOG_WRITES', default='thread')
+
+# Precomputed match lists (see accounts/match_store.py)
+MATCH_LIST_SIZE = config('MATCH_LIST_SIZE', default=100, cast=int)
+# 'thread' refreshes affected users in the background, 'sync' right after commit
+MATCH_REFRESH = config('MATCH_REFRESH', default='thread')
+
+# Keyset pagination for list endpoints (opt-in via ?page_size= / ?cursor=)
+KEYSET_PAGE_SIZE = config('KEYSET_PAGE_SIZE', default=50, cast=int)
+KEYSET_MAX_PAGE_SIZE = config('KEYSET_MAX_PAGE_SIZE', default=200, cast=int)
+
+# Build hot list responses (all posts, inbox, message history) from values()
+# rows instead of serializers (see accounts/fast_read.py); same output
+FAST_READ_PATHS = config('FAST_READ_PATHS', default=True, cast=bool)
+
+# storage.url() results kept per process (see accounts/media_urls.py)
+MEDIA_URL_CACHE_SIZE = config('MEDIA_URL_CACHE_SIZE', default=10000, cast=int)
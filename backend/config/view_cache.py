@@ -0,0 +1,63 @@
+"""
+Small helper API for caching per-user API responses in the Django cache.
+
+Each (namespace, user) pair has a version number stored in the cache;
+response keys embed it, so invalidating bumps the version and every
+cached variant (e.g. per request host) is orphaned at once. Signal
+handlers in accounts/signals.py and chat/signals.py call
+invalidate_user_cache() whenever the underlying rows change.
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+
+def _version_key(namespace, user_id):
+    return f'view:{namespace}:user:{user_id}:version'
+
+
+def _get_version(namespace, user_id):
+    key = _version_key(namespace, user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted version never rolls back to a stale one
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _response_key(namespace, request):
+    version = _get_version(namespace, request.user.pk)
+    return f'view:{namespace}:user:{request.user.pk}:v{version}:{request.get_host()}:{request.get_full_path()}'
+
+
+def cached_user_response(namespace, request, build, timeout=None):
+    """
+    Return the cached response of `build()` for the requesting user, or
+    call it and cache the result. Only 200 responses are cached.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'VIEW_CACHE_TIMEOUT', 300)
+
+    key = _response_key(namespace, request)
+    cached = cache.get(key)
+    if cached is not None:
+        data, status_code = cached
+        return Response(data, status=status_code)
+
+    response = build()
+    if response.status_code == 200:
+        cache.set(key, (response.data, response.status_code), timeout)
+    return response
+
+
+def invalidate_user_cache(namespace, *user_ids):
+    """Drop every cached response in `namespace` for the given users"""
+    for user_id in user_ids:
+        key = _version_key(namespace, user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # No version yet means nothing has been cached for this user
+            pass
@@ -1,7 +1,8 @@
 'use client';
 
 import { useEffect, useRef, useState } from 'react';
-import { getWsUrl, getApiUrl } from '@/lib/config';
+import { getApiUrl } from '@/lib/config';
+import { subscribe, sendRealtime } from '@/lib/realtime';
 import WebRTCCall from './WebRTCCall';
 
 interface IncomingCall {
@@ -14,19 +15,27 @@ export default function CallManager() {
   const [incomingCall, setIncomingCall] = useState<IncomingCall | null>(null);
   const [showCallUI, setShowCallUI] = useState(false);
   const [currentUserId, setCurrentUserId] = useState<number | null>(null);
-  const websocketRef = useRef<WebSocket | null>(null);
   const ringtoneRef = useRef<HTMLAudioElement | null>(null);
   const beepIntervalRef = useRef<NodeJS.Timeout | null>(null);
 
   useEffect(() => {
     // Get current user ID
     const userData = localStorage.getItem('user');
+    let unsubscribe: (() => void) | null = null;
     if (userData) {
       const user = JSON.parse(userData);
       setCurrentUserId(user.id);
 
-      // Initialize WebSocket for incoming calls
-      initializeCallListener(user.id);
+      // Listen for incoming calls on the shared realtime socket
+      unsubscribe = subscribe('call', (data) => {
+        if (data.type === 'call-offer') {
+          handleIncomingCall(data);
+        } else if (data.type === 'call-end') {
+          // The caller hung up, or the server gave up ringing
+          stopRingtone();
+          setIncomingCall(null);
+        }
+      });
     }
 
     // Initialize ringtone - fetch active ringtone from backend
@@ -40,9 +49,7 @@ export default function CallManager() {
     }
 
     return () => {
-      if (websocketRef.current) {
-        websocketRef.current.close();
-      }
+      unsubscribe?.();
       stopRingtone();
     };
   }, []);
@@ -88,37 +95,6 @@ export default function CallManager() {
     }
   };
 
-  const initializeCallListener = (userId: number) => {
-    const ws = new WebSocket(getWsUrl(`/ws/call/${userId}/`));
-    websocketRef.current = ws;
-
-    ws.onopen = () => {
-      console.log('Call listener WebSocket connected');
-    };
-
-    ws.onmessage = async (event) => {
-      const data = JSON.parse(event.data);
-
-      if (data.type === 'call-offer') {
-        handleIncomingCall(data);
-      }
-    };
-
-    ws.onerror = (error) => {
-      console.error('Call listener WebSocket error:', error);
-    };
-
-    ws.onclose = () => {
-      console.log('Call listener WebSocket disconnected');
-      // Attempt to reconnect after 3 seconds
-      setTimeout(() => {
-        if (currentUserId) {
-          initializeCallListener(currentUserId);
-        }
-      }, 3000);
-    };
-  };
-
   const handleIncomingCall = (data: any) => {
     const call: IncomingCall = {
       callerId: data.caller_id,
@@ -223,11 +199,11 @@ export default function CallManager() {
     stopRingtone();
 
     // Send rejection message
-    if (websocketRef.current?.readyState === WebSocket.OPEN && incomingCall) {
-      websocketRef.current.send(JSON.stringify({
+    if (incomingCall) {
+      sendRealtime('call', {
         type: 'call-end',
         peer_id: incomingCall.callerId,
-      }));
+      });
     }
 
     setIncomingCall(null);
@@ -5,6 +5,7 @@ import Image from 'next/image';
 import { usePathname, useRouter } from 'next/navigation';
 import { useState, useEffect, useCallback } from 'react';
 import { getApiUrl } from '@/lib/config';
+import { subscribe, onRealtimeOpen, isRealtimeOpen } from '@/lib/realtime';
 
 export default function Sidebar() {
   const pathname = usePathname();
@@ -24,63 +25,19 @@ export default function Sidebar() {
     const lastVisit = localStorage.getItem('lastMatchesVisit');
 
     try {
-      // Fetch all posts
-      const postsResponse = await fetch(getApiUrl('/api/posts/all/'), {
+      // Counted server-side from the stored match list
+      const since = lastVisit ?? new Date(0).toISOString();
+      const response = await fetch(getApiUrl(`/api/matches/count/?since=${encodeURIComponent(since)}`), {
         headers: {
           'Authorization': `Token ${token}`,
         },
       });
 
-      if (postsResponse.ok) {
-        const allPosts = await postsResponse.json();
-
-        // Fetch current user's posts
-        const userPostsResponse = await fetch(getApiUrl('/api/posts/'), {
-          headers: {
-            'Authorization': `Token ${token}`,
-          },
-        });
-
-        if (userPostsResponse.ok) {
-          const userPosts = await userPostsResponse.json();
-
-          // Get my skills
-          const mySkills: string[] = [];
-          const myWantedSkills: string[] = [];
-
-          userPosts.forEach((post: any) => {
-            mySkills.push(...post.skills);
-            myWantedSkills.push(...post.wanted_skills);
-          });
-
-          // Count matches created after last visit
-          const currentUserId = JSON.parse(userData).id;
-          const lastVisitDate = lastVisit ? new Date(lastVisit) : new Date(0);
-          let count = 0;
-          const processedUsers = new Set<number>();
-
-          allPosts.forEach((post: any) => {
-            if (post.user.id === currentUserId || processedUsers.has(post.user.id)) return;
-
-            // Only count if post was created after last visit
-            const postCreated = new Date(post.created_at);
-            if (postCreated <= lastVisitDate) return;
-
-            const theyCanTeachMe = post.skills.filter((skill: string) =>
-              myWantedSkills.some(wantedSkill => wantedSkill.toLowerCase().trim() === skill.toLowerCase().trim())
-            );
-
-            const canTeachThem = post.wanted_skills.filter((skill: string) =>
-              mySkills.some(mySkill => mySkill.toLowerCase().trim() === skill.toLowerCase().trim())
-            );
-
-            if (theyCanTeachMe.length > 0 || canTeachThem.length > 0) {
-              count++;
-              processedUsers.add(post.user.id);
-            }
-          });
-
-          setMatchCount(count);
+      if (response.ok) {
+        const data = await response.json();
+        // null while the match list is still being computed for the first time
+        if (data.count !== null) {
+          setMatchCount(data.count);
         }
       }
     } catch (error) {
@@ -88,63 +45,71 @@ export default function Sidebar() {
     }
   }, []);
 
-  const fetchUnreadMessages = useCallback(async () => {
-    const token = localStorage.getItem('token');
-    if (!token) return;
-
-    try {
-      const response = await fetch(getApiUrl('/api/messages/conversations/'), {
-        headers: {
-          'Authorization': `Token ${token}`,
-        },
-      });
-
-      if (response.ok) {
-        const conversations = await response.json();
-        const totalUnread = conversations.reduce((sum: number, conv: any) => sum + conv.unread_count, 0);
-        setUnreadMessageCount(totalUnread);
-      }
-    } catch (error) {
-      console.error('Error fetching unread messages:', error);
-    }
+  const applyCounts = useCallback((counts: any) => {
+    setUnreadMessageCount(counts.unread_messages);
+    setPendingConnectionCount(counts.pending_connection_requests);
   }, []);
 
-  const fetchPendingConnections = useCallback(async () => {
+  const fetchNotificationCounts = useCallback(async () => {
     const token = localStorage.getItem('token');
     if (!token) return;
 
     try {
-      const response = await fetch(getApiUrl('/api/messages/connections/pending/'), {
+      // Counters are kept server-side, so this is a single row read
+      const response = await fetch(getApiUrl('/api/messages/notifications/counts/'), {
         headers: {
           'Authorization': `Token ${token}`,
         },
       });
 
       if (response.ok) {
-        const pendingRequests = await response.json();
-        setPendingConnectionCount(pendingRequests.length);
+        applyCounts(await response.json());
       }
     } catch (error) {
-      console.error('Error fetching pending connections:', error);
+      console.error('Error fetching notification counts:', error);
     }
-  }, []);
+  }, [applyCounts]);
 
   useEffect(() => {
     fetchMatchCount();
-    fetchUnreadMessages();
-    fetchPendingConnections();
+    if (!isRealtimeOpen()) {
+      fetchNotificationCounts();
+    }
 
-    // Auto-refresh notifications every 30 seconds (reduced from 5 seconds)
+    // Every notification frame carries the current counts; re-read them after a reconnect
+    const unsubscribeOpen = onRealtimeOpen(fetchNotificationCounts);
+    const unsubscribeNotifications = subscribe('notifications', (data) => {
+      if (data.counts) {
+        applyCounts(data.counts);
+      }
+    });
+
+    // Match counts are still polled; notification counts only while the socket is down
     const interval = setInterval(() => {
       fetchMatchCount();
-      fetchUnreadMessages();
-      fetchPendingConnections();
+      if (!isRealtimeOpen()) {
+        fetchNotificationCounts();
+      }
     }, 30000);
 
-    return () => clearInterval(interval);
-  }, [fetchMatchCount, fetchUnreadMessages, fetchPendingConnections, pathname]);
+    return () => {
+      clearInterval(interval);
+      unsubscribeOpen();
+      unsubscribeNotifications();
+    };
+  }, [fetchMatchCount, fetchNotificationCounts, applyCounts, pathname]);
 
   const handleLogout = () => {
+    const token = localStorage.getItem('token');
+    if (token) {
+      // Revoke the token server-side; local logout does not wait for it
+      fetch(getApiUrl('/api/auth/logout/'), {
+        method: 'POST',
+        headers: {
+          'Authorization': `Token ${token}`,
+        },
+      }).catch((error) => console.error('Error logging out:', error));
+    }
     localStorage.removeItem('token');
     localStorage.removeItem('user');
     router.push('/login');
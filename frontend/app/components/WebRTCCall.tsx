@@ -1,7 +1,7 @@
 'use client';
 
 import { useEffect, useRef, useState } from 'react';
-import { getWsUrl } from '@/lib/config';
+import { subscribe, onRealtimeOpen, isRealtimeOpen, sendRealtime } from '@/lib/realtime';
 
 interface WebRTCCallProps {
   currentUserId: number;
@@ -31,7 +31,7 @@ export default function WebRTCCall({
   const localVideoRef = useRef<HTMLVideoElement>(null);
   const remoteVideoRef = useRef<HTMLVideoElement>(null);
   const peerConnectionRef = useRef<RTCPeerConnection | null>(null);
-  const websocketRef = useRef<WebSocket | null>(null);
+  const unsubscribeRef = useRef<(() => void)[]>([]);
   const localStreamRef = useRef<MediaStream | null>(null);
   const iceCandidatesQueue = useRef<RTCIceCandidate[]>([]);
   const wsReadyRef = useRef(false);
@@ -63,11 +63,13 @@ export default function WebRTCCall({
 
   const initializeCall = async () => {
     try {
-      // Create WebSocket connection first
-      const ws = new WebSocket(getWsUrl(`/ws/call/${currentUserId}/`));
-      websocketRef.current = ws;
+      // Signaling goes over the shared realtime socket
+      const unsubscribeMessages = subscribe('call', async (data) => {
+        await handleWebSocketMessage(data);
+      });
 
-      ws.onopen = async () => {
+      let started = false;
+      const unsubscribeOpen = onRealtimeOpen(async () => {
         console.log('WebSocket connected');
         wsReadyRef.current = true;
 
@@ -83,6 +85,10 @@ export default function WebRTCCall({
           }
         }
 
+        // Reconnects only need the queue flushed
+        if (started) return;
+        started = true;
+
         // Get user media after WebSocket is ready
         await setupMediaAndPeerConnection();
 
@@ -90,22 +96,9 @@ export default function WebRTCCall({
         if (!isIncoming) {
           makeCall();
         }
-      };
-
-      ws.onmessage = async (event) => {
-        const data = JSON.parse(event.data);
-        await handleWebSocketMessage(data);
-      };
-
-      ws.onerror = (error) => {
-        console.error('WebSocket error:', error);
-        alert('Connection error. Please try again.');
-        onClose();
-      };
+      });
 
-      ws.onclose = () => {
-        console.log('WebSocket disconnected');
-      };
+      unsubscribeRef.current = [unsubscribeMessages, unsubscribeOpen];
     } catch (error) {
       console.error('Error initializing call:', error);
       alert('Could not initialize call. Please try again.');
@@ -165,7 +158,7 @@ export default function WebRTCCall({
     // Handle ICE candidates
     pc.onicecandidate = (event) => {
       if (event.candidate) {
-        if (wsReadyRef.current && websocketRef.current?.readyState === WebSocket.OPEN) {
+        if (wsReadyRef.current && isRealtimeOpen()) {
           sendWebSocketMessage({
             type: 'ice-candidate',
             candidate: event.candidate,
@@ -222,9 +215,7 @@ export default function WebRTCCall({
   };
 
   const sendWebSocketMessage = (message: any) => {
-    if (websocketRef.current?.readyState === WebSocket.OPEN) {
-      websocketRef.current.send(JSON.stringify(message));
-    } else {
+    if (!sendRealtime('call', message)) {
       console.error('WebSocket not open, cannot send message');
     }
   };
@@ -283,6 +274,14 @@ export default function WebRTCCall({
         cleanup();
         onClose();
         break;
+
+      case 'call-unavailable':
+      case 'call-busy':
+        // The other user is offline or already in a call, so the offer was never delivered
+        setCallStatus('ended');
+        cleanup();
+        onClose();
+        break;
     }
   };
 
@@ -386,10 +385,9 @@ export default function WebRTCCall({
       peerConnectionRef.current.close();
     }
 
-    // Close WebSocket
-    if (websocketRef.current) {
-      websocketRef.current.close();
-    }
+    // Stop listening for signaling
+    unsubscribeRef.current.forEach((unsubscribe) => unsubscribe());
+    unsubscribeRef.current = [];
 
     wsReadyRef.current = false;
   };
@@ -4,6 +4,7 @@ import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import Sidebar from '../components/Sidebar';
 import { getApiUrl } from '@/lib/config';
+import { ConnectionStatus, fetchConnectionStatuses } from '@/lib/connections';
 
 interface User {
   id: number;
@@ -14,15 +15,6 @@ interface User {
   profile_image?: string | null;
 }
 
-interface ConnectionStatus {
-  status: string;
-  is_sender?: boolean;
-  connection?: {
-    id: number;
-    status: string;
-  };
-}
-
 interface ConnectionRequest {
   id: number;
   from_user: User;
@@ -79,7 +71,7 @@ export default function Connect() {
         setUsers(usersList);
 
         // Fetch connection statuses
-        fetchConnectionStatuses(usersList, token);
+        loadConnectionStatuses(usersList, token);
       }
     } catch (error) {
       console.error('Error fetching users:', error);
@@ -88,27 +80,12 @@ export default function Connect() {
     }
   };
 
-  const fetchConnectionStatuses = async (users: User[], token: string) => {
-    const statuses: Record<number, ConnectionStatus> = {};
-
-    for (const user of users) {
-      try {
-        const response = await fetch(getApiUrl(`/api/messages/connection-status/${user.id}/`), {
-          headers: {
-            'Authorization': `Token ${token}`,
-          },
-        });
-
-        if (response.ok) {
-          const data = await response.json();
-          statuses[user.id] = data;
-        }
-      } catch (error) {
-        console.error(`Error fetching connection status for user ${user.id}:`, error);
-      }
+  const loadConnectionStatuses = async (users: User[], token: string) => {
+    try {
+      setConnectionStatuses(await fetchConnectionStatuses(users.map(user => user.id), token));
+    } catch (error) {
+      console.error('Error fetching connection statuses:', error);
     }
-
-    setConnectionStatuses(statuses);
   };
 
   const handleConnect = async (userId: number) => {
@@ -4,6 +4,7 @@ import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import Sidebar from '../components/Sidebar';
 import { getApiUrl } from '@/lib/config';
+import { ConnectionStatus, fetchConnectionStatuses } from '@/lib/connections';
 
 interface User {
   id: number;
@@ -33,15 +34,6 @@ interface Match {
   canTeach: string[];
 }
 
-interface ConnectionStatus {
-  status: string;
-  is_sender?: boolean;
-  connection?: {
-    id: number;
-    status: string;
-  };
-}
-
 export default function Matches() {
   const [matches, setMatches] = useState<Match[]>([]);
   const [loading, setLoading] = useState(true);
@@ -69,42 +61,26 @@ export default function Matches() {
     }
 
     try {
-      // Fetch all posts
-      const postsResponse = await fetch(getApiUrl('/api/posts/all/'), {
+      // Matches are ranked server-side from an inverted skill index
+      const response = await fetch(getApiUrl('/api/matches/'), {
         headers: {
           'Authorization': `Token ${token}`,
         },
       });
 
-      if (postsResponse.ok) {
-        const allPosts: Post[] = await postsResponse.json();
-
-        // Fetch current user's posts to get their skills
-        const userPostsResponse = await fetch(getApiUrl('/api/posts/'), {
-          headers: {
-            'Authorization': `Token ${token}`,
-          },
-        });
-
-        if (userPostsResponse.ok) {
-          const userPosts: Post[] = await userPostsResponse.json();
-
-          // Get current user's skills from their latest post
-          const mySkills: string[] = [];
-          const myWantedSkills: string[] = [];
-
-          userPosts.forEach(post => {
-            mySkills.push(...post.skills);
-            myWantedSkills.push(...post.wanted_skills);
-          });
-
-          // Find matches
-          const foundMatches = findMatches(allPosts, mySkills, myWantedSkills, userData ? JSON.parse(userData).id : 0);
-          setMatches(foundMatches);
-
-          // Fetch connection statuses for all matches
-          fetchConnectionStatuses(foundMatches, token);
-        }
+      if (response.ok) {
+        const data = await response.json();
+        const foundMatches: Match[] = data.map((match: any) => ({
+          user: match.user,
+          post: match.post,
+          matchScore: match.match_score,
+          matchedSkills: match.matched_skills,
+          canTeach: match.can_teach,
+        }));
+        setMatches(foundMatches);
+
+        // Fetch connection statuses for all matches
+        loadConnectionStatuses(foundMatches, token);
       }
     } catch (error) {
       console.error('Error loading matches:', error);
@@ -113,27 +89,12 @@ export default function Matches() {
     }
   };
 
-  const fetchConnectionStatuses = async (matches: Match[], token: string) => {
-    const statuses: Record<number, ConnectionStatus> = {};
-
-    for (const match of matches) {
-      try {
-        const response = await fetch(getApiUrl(`/api/messages/connections/status/${match.user.id}/`), {
-          headers: {
-            'Authorization': `Token ${token}`,
-          },
-        });
-
-        if (response.ok) {
-          const data = await response.json();
-          statuses[match.user.id] = data;
-        }
-      } catch (error) {
-        console.error(`Error fetching connection status for user ${match.user.id}:`, error);
-      }
+  const loadConnectionStatuses = async (matches: Match[], token: string) => {
+    try {
+      setConnectionStatuses(await fetchConnectionStatuses(matches.map(match => match.user.id), token));
+    } catch (error) {
+      console.error('Error fetching connection statuses:', error);
     }
-
-    setConnectionStatuses(statuses);
   };
 
   const handleConnect = async (userId: number) => {
@@ -171,95 +132,6 @@ export default function Matches() {
     }
   };
 
-  const findMatches = (
-    allPosts: Post[],
-    mySkills: string[],
-    myWantedSkills: string[],
-    myUserId: number
-  ): Match[] => {
-    const matchesList: Match[] = [];
-    const processedUsers = new Set<number>();
-
-    // AI-powered matching algorithm
-    allPosts.forEach(post => {
-      // Skip own posts
-      if (post.user.id === myUserId) return;
-
-      // Skip if we already matched with this user (take their best post)
-      if (processedUsers.has(post.user.id)) return;
-
-      // AI Logic 1: Find exact skill matches (case-insensitive)
-      const canTeachThem = post.wanted_skills.filter(skill =>
-        mySkills.some(mySkill => mySkill.toLowerCase().trim() === skill.toLowerCase().trim())
-      );
-
-      const theyCanTeachMe = post.skills.filter(skill =>
-        myWantedSkills.some(wantedSkill => wantedSkill.toLowerCase().trim() === skill.toLowerCase().trim())
-      );
-
-      // AI Logic 2: Find partial/fuzzy matches (contains keyword)
-      const partialMatchesTheyTeach = post.skills.filter(skill =>
-        myWantedSkills.some(wantedSkill => {
-          const skillLower = skill.toLowerCase().trim();
-          const wantedLower = wantedSkill.toLowerCase().trim();
-          return skillLower.includes(wantedLower) || wantedLower.includes(skillLower);
-        }) && !theyCanTeachMe.includes(skill)
-      );
-
-      const partialMatchesITeach = post.wanted_skills.filter(skill =>
-        mySkills.some(mySkill => {
-          const skillLower = skill.toLowerCase().trim();
-          const mySkillLower = mySkill.toLowerCase().trim();
-          return skillLower.includes(mySkillLower) || mySkillLower.includes(skillLower);
-        }) && !canTeachThem.includes(skill)
-      );
-
-      // Combine all matches
-      const allTeachMatches = [...theyCanTeachMe, ...partialMatchesTheyTeach];
-      const allLearnMatches = [...canTeachThem, ...partialMatchesITeach];
-
-      // AI Logic 3: Calculate intelligent match score
-      // Exact matches worth more than partial matches
-      const exactMatchScore = (canTeachThem.length * 2) + (theyCanTeachMe.length * 2);
-      const partialMatchScore = partialMatchesTheyTeach.length + partialMatchesITeach.length;
-      const totalMatchScore = exactMatchScore + partialMatchScore;
-
-      // AI Logic 4: Boost score for mutual skill exchange (bidirectional match)
-      let matchScore = totalMatchScore;
-      if (canTeachThem.length > 0 && theyCanTeachMe.length > 0) {
-        matchScore += 5; // Bonus for mutual exchange
-      }
-
-      // AI Logic 5: Consider availability alignment
-      if (post.availability && post.availability.length > 0) {
-        matchScore += 1; // Bonus for having availability set
-      }
-
-      // Only add if there's any match
-      if (allTeachMatches.length > 0 || allLearnMatches.length > 0) {
-        matchesList.push({
-          user: post.user,
-          post: post,
-          matchScore: matchScore,
-          matchedSkills: [...new Set([...allLearnMatches, ...allTeachMatches])],
-          canTeach: allTeachMatches,
-        });
-
-        processedUsers.add(post.user.id);
-      }
-    });
-
-    // AI Logic 6: Sort by match score (highest compatibility first)
-    return matchesList.sort((a, b) => {
-      // Primary sort: Match score
-      if (b.matchScore !== a.matchScore) {
-        return b.matchScore - a.matchScore;
-      }
-      // Secondary sort: More matched skills
-      return b.matchedSkills.length - a.matchedSkills.length;
-    });
-  };
-
   if (loading) {
     return (
       <div className="min-h-screen bg-gray-50">
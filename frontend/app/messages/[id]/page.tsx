@@ -5,6 +5,7 @@ import { useRouter, useParams } from 'next/navigation';
 import Sidebar from '../../components/Sidebar';
 import WebRTCCall from '../../components/WebRTCCall';
 import { getApiUrl } from '@/lib/config';
+import { subscribe, onRealtimeOpen, isRealtimeOpen } from '@/lib/realtime';
 
 interface User {
   id: number;
@@ -35,17 +36,49 @@ export default function Conversation() {
   const [sending, setSending] = useState(false);
   const [isCallActive, setIsCallActive] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  // Id of the newest message we already have, so polls only fetch new ones
+  const lastMessageIdRef = useRef<number | null>(null);
 
   useEffect(() => {
     const userData = localStorage.getItem('user');
     if (userData) {
       setCurrentUserId(JSON.parse(userData).id);
     }
-    fetchMessages();
+    lastMessageIdRef.current = null;
+    setMessages([]);
+    if (!isRealtimeOpen()) {
+      // Otherwise the open listener below loads them right away
+      fetchMessages();
+    }
+
+    // New messages are pushed over the shared realtime socket
+    const unsubscribe = subscribe('chat', (data) => {
+      if (data.type !== 'message') return;
+      const message: Message = data.message;
+      if (message.sender.id !== userId && message.receiver.id !== userId) return;
+
+      setMessages(prev => prev.some(m => m.id === message.id) ? prev : [...prev, message]);
+      lastMessageIdRef.current = Math.max(lastMessageIdRef.current ?? 0, message.id);
+      if (message.sender.id === userId) {
+        // Let the server mark it as read
+        fetchMessages();
+      }
+    });
 
-    // Auto-refresh messages every 3 seconds
-    const interval = setInterval(fetchMessages, 3000);
-    return () => clearInterval(interval);
+    // Catch up on anything sent while the socket was reconnecting
+    const unsubscribeOpen = onRealtimeOpen(fetchMessages);
+
+    // Fall back to polling only while the socket is not connected
+    const interval = setInterval(() => {
+      if (!isRealtimeOpen()) {
+        fetchMessages();
+      }
+    }, 3000);
+    return () => {
+      clearInterval(interval);
+      unsubscribe();
+      unsubscribeOpen();
+    };
   }, [userId]);
 
   useEffect(() => {
@@ -64,16 +97,28 @@ export default function Conversation() {
     }
 
     try {
-      const response = await fetch(getApiUrl(`/api/messages/conversation/${userId}/`), {
+      const since = lastMessageIdRef.current;
+      const query = since !== null ? `?since=${since}` : '';
+      const response = await fetch(getApiUrl(`/api/messages/conversation/${userId}/${query}`), {
         headers: {
           'Authorization': `Token ${token}`,
         },
       });
 
       if (response.ok) {
-        const data = await response.json();
-        setMessages(data);
+        const data: Message[] = await response.json();
+        if (since === null) {
+          setMessages(data);
+        } else if (data.length > 0) {
+          setMessages(prev => {
+            const known = new Set(prev.map(message => message.id));
+            return [...prev, ...data.filter(message => !known.has(message.id))];
+          });
+        }
         if (data.length > 0) {
+          lastMessageIdRef.current = Math.max(since ?? 0, ...data.map(message => message.id));
+        }
+        if (since === null && data.length > 0) {
           const currentUserData = localStorage.getItem('user');
           const currentId = currentUserData ? JSON.parse(currentUserData).id : null;
           // Determine the other user
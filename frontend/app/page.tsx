@@ -4,6 +4,7 @@ import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import Sidebar from './components/Sidebar';
 import { getApiUrl } from '@/lib/config';
+import { ConnectionStatus, fetchConnectionStatuses } from '@/lib/connections';
 
 interface Post {
   id: number;
@@ -33,15 +34,6 @@ interface Post {
   updated_at: string;
 }
 
-interface ConnectionStatus {
-  status: string;
-  is_sender?: boolean;
-  connection?: {
-    id: number;
-    status: string;
-  };
-}
-
 export default function Home() {
   const [posts, setPosts] = useState<Post[]>([]);
   const [loading, setLoading] = useState(true);
@@ -75,7 +67,7 @@ export default function Home() {
         setPosts(data);
 
         // Fetch connection statuses for all post users
-        fetchConnectionStatuses(data, token);
+        loadConnectionStatuses(data, token);
       } else if (response.status === 401) {
         localStorage.removeItem('token');
         localStorage.removeItem('user');
@@ -88,27 +80,12 @@ export default function Home() {
     }
   };
 
-  const fetchConnectionStatuses = async (posts: Post[], token: string) => {
-    const statuses: Record<number, ConnectionStatus> = {};
-
-    for (const post of posts) {
-      try {
-        const response = await fetch(getApiUrl(`/api/messages/connections/status/${post.user.id}/`), {
-          headers: {
-            'Authorization': `Token ${token}`,
-          },
-        });
-
-        if (response.ok) {
-          const data = await response.json();
-          statuses[post.user.id] = data;
-        }
-      } catch (error) {
-        console.error(`Error fetching connection status for user ${post.user.id}:`, error);
-      }
+  const loadConnectionStatuses = async (posts: Post[], token: string) => {
+    try {
+      setConnectionStatuses(await fetchConnectionStatuses(posts.map(post => post.user.id), token));
+    } catch (error) {
+      console.error('Error fetching connection statuses:', error);
     }
-
-    setConnectionStatuses(statuses);
   };
 
   const handleConnect = async (userId: number) => {
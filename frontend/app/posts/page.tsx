@@ -28,10 +28,14 @@ interface Post {
     video: string;
     uploaded_at: string;
   }>;
+  media_status?: 'ready' | 'processing' | 'failed';
   created_at: string;
   updated_at: string;
 }
 
+// How often posts whose uploads are still being processed are re-fetched
+const MEDIA_POLL_INTERVAL = 3000;
+
 export default function Posts() {
   const [posts, setPosts] = useState<Post[]>([]);
   const [isModalOpen, setIsModalOpen] = useState(false);
@@ -62,6 +66,35 @@ export default function Posts() {
     loadPosts();
   }, []);
 
+  // Uploads are stored in the background; poll posts until their media is ready
+  const processingIds = posts
+    .filter(post => post.media_status === 'processing')
+    .map(post => post.id)
+    .join(',');
+
+  useEffect(() => {
+    if (!processingIds) return;
+
+    const timer = setInterval(async () => {
+      const token = localStorage.getItem('token');
+      try {
+        const refreshed = await Promise.all(processingIds.split(',').map(async (id) => {
+          const response = await fetch(getApiUrl(`/api/posts/${id}/`), {
+            headers: {
+              'Authorization': `Token ${token}`,
+            },
+          });
+          return response.ok ? (await response.json() as Post) : null;
+        }));
+        setPosts(prev => prev.map(post => refreshed.find(p => p && p.id === post.id) || post));
+      } catch (error) {
+        console.error('Error refreshing posts:', error);
+      }
+    }, MEDIA_POLL_INTERVAL);
+
+    return () => clearInterval(timer);
+  }, [processingIds]);
+
   const handleDeletePost = async (id: number) => {
     if (confirm('Are you sure you want to delete this post?')) {
       try {
@@ -359,6 +392,14 @@ export default function Posts() {
                     </div>
                   )}
 
+                  {/* Media still being stored by the upload worker */}
+                  {post.media_status === 'processing' && (
+                    <p className="mb-4 text-sm text-gray-500">Processing media...</p>
+                  )}
+                  {post.media_status === 'failed' && (
+                    <p className="mb-4 text-sm text-red-600">Some media could not be uploaded.</p>
+                  )}
+
                   {/* Images */}
                   {post.images && post.images.length > 0 && (
                     <div className="mb-4">
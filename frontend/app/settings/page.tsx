@@ -305,6 +305,16 @@ export default function Settings() {
   };
 
   const handleLogout = () => {
+    const token = localStorage.getItem('token');
+    if (token) {
+      // Revoke the token server-side; local logout does not wait for it
+      fetch(getApiUrl('/api/auth/logout/'), {
+        method: 'POST',
+        headers: {
+          'Authorization': `Token ${token}`,
+        },
+      }).catch((error) => console.error('Error logging out:', error));
+    }
     localStorage.removeItem('token');
     localStorage.removeItem('user');
     router.push('/login');
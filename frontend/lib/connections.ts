@@ -0,0 +1,36 @@
+// Connection status lookups shared by the feed, connect and matches pages.
+import { getApiUrl } from './config';
+
+export interface ConnectionStatus {
+  status: string;
+  is_sender?: boolean;
+  connection?: {
+    id: number;
+    status: string;
+  };
+}
+
+// The batch status endpoint accepts up to this many user ids per request
+const STATUS_BATCH_SIZE = 200;
+
+export const fetchConnectionStatuses = async (
+  userIds: number[],
+  token: string,
+): Promise<Record<number, ConnectionStatus>> => {
+  const uniqueIds = [...new Set(userIds)];
+  const statuses: Record<number, ConnectionStatus> = {};
+
+  for (let i = 0; i < uniqueIds.length; i += STATUS_BATCH_SIZE) {
+    const batch = uniqueIds.slice(i, i + STATUS_BATCH_SIZE);
+    const response = await fetch(getApiUrl(`/api/messages/connections/status/?user_ids=${batch.join(',')}`), {
+      headers: {
+        'Authorization': `Token ${token}`,
+      },
+    });
+
+    if (response.ok) {
+      Object.assign(statuses, await response.json());
+    }
+  }
+  return statuses;
+};
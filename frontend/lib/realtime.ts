@@ -0,0 +1,111 @@
+// One multiplexed WebSocket per browser tab (ws/realtime/).
+// Features subscribe to a channel instead of opening their own sockets;
+// every frame carries its channel next to the feature's own "type".
+import { getWsUrl } from './config';
+
+export type RealtimeChannel = 'call' | 'chat' | 'notifications' | 'presence';
+type Handler = (data: any) => void;
+
+const HEARTBEAT_INTERVAL = 30000;
+const RECONNECT_DELAY = 3000;
+
+let socket: WebSocket | null = null;
+let heartbeatTimer: ReturnType<typeof setInterval> | null = null;
+let reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+const handlers = new Map<RealtimeChannel, Set<Handler>>();
+const openListeners = new Set<() => void>();
+
+const subscriberCount = () => {
+  let count = 0;
+  handlers.forEach((channelHandlers) => {
+    count += channelHandlers.size;
+  });
+  return count + openListeners.size;
+};
+
+const connect = () => {
+  const token = localStorage.getItem('token');
+  if (!token || socket || reconnectTimer) return;
+
+  const ws = new WebSocket(getWsUrl(`/ws/realtime/?token=${token}`));
+  socket = ws;
+
+  ws.onopen = () => {
+    // Heartbeats keep this user shown as online to their contacts
+    heartbeatTimer = setInterval(() => {
+      sendRealtime('presence', { type: 'heartbeat' });
+    }, HEARTBEAT_INTERVAL);
+    openListeners.forEach((listener) => listener());
+  };
+
+  ws.onmessage = (event) => {
+    const data = JSON.parse(event.data);
+    handlers.get(data.channel)?.forEach((handler) => handler(data));
+  };
+
+  ws.onerror = (error) => {
+    console.error('Realtime WebSocket error:', error);
+  };
+
+  ws.onclose = () => {
+    if (heartbeatTimer) {
+      clearInterval(heartbeatTimer);
+      heartbeatTimer = null;
+    }
+    socket = null;
+    // Reconnect while anything is still listening
+    if (subscriberCount() > 0) {
+      reconnectTimer = setTimeout(() => {
+        reconnectTimer = null;
+        connect();
+      }, RECONNECT_DELAY);
+    }
+  };
+};
+
+const disconnectIfUnused = () => {
+  if (subscriberCount() > 0) return;
+  if (reconnectTimer) {
+    clearTimeout(reconnectTimer);
+    reconnectTimer = null;
+  }
+  socket?.close();
+};
+
+// Receive frames of one channel; returns an unsubscribe function
+export const subscribe = (channel: RealtimeChannel, handler: Handler) => {
+  if (!handlers.has(channel)) {
+    handlers.set(channel, new Set());
+  }
+  handlers.get(channel)!.add(handler);
+  connect();
+
+  return () => {
+    handlers.get(channel)?.delete(handler);
+    disconnectIfUnused();
+  };
+};
+
+// Called every time the socket (re)connects, and right away if it is already open
+export const onRealtimeOpen = (listener: () => void) => {
+  openListeners.add(listener);
+  if (isRealtimeOpen()) {
+    listener();
+  } else {
+    connect();
+  }
+
+  return () => {
+    openListeners.delete(listener);
+    disconnectIfUnused();
+  };
+};
+
+export const isRealtimeOpen = () => socket?.readyState === WebSocket.OPEN;
+
+// Send a frame on a channel; returns false if the socket is not connected
+export const sendRealtime = (channel: RealtimeChannel, message: Record<string, any>) => {
+  if (!socket || socket.readyState !== WebSocket.OPEN) return false;
+  socket.send(JSON.stringify({ ...message, channel }));
+  return true;
+};